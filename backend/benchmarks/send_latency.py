@@ -0,0 +1,107 @@
+"""Benchmark send_message → CLI spawn latency and time-to-first-token.
+
+Boots the real app against a throwaway database and a fake ``claude`` binary
+that emits a short stream-json reply, then drives the chat WebSocket.
+Run from ``backend/``::
+
+    python -m benchmarks.send_latency --runs 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import textwrap
+import uuid
+from pathlib import Path
+
+FAKE_CLI = textwrap.dedent("""\
+    #!{python}
+    import json, sys
+    print(json.dumps({{"type": "assistant", "message": {{"content": [{{"type": "text", "text": "ok"}}]}}}}), flush=True)
+    print(json.dumps({{"type": "result", "result": "ok", "usage": {{"output_tokens": 1}}}}), flush=True)
+""")
+
+
+def _setup_env(tmp: Path) -> None:
+    bin_dir = tmp / "bin"
+    bin_dir.mkdir()
+    cli = bin_dir / "claude"
+    cli.write_text(FAKE_CLI.format(python=sys.executable))
+    cli.chmod(0o755)
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+    os.environ["CASPERBOT_DATABASE_PATH"] = str(tmp / "bench.db")
+    os.environ["CASPERBOT_PROJECTS_DIR"] = str(tmp / "projects")
+    os.environ["CASPERBOT_TEMPLATES_DIR"] = str(tmp / "projects" / ".templates")
+    os.environ["CASPERBOT_AUTH_ENABLED"] = "false"
+
+
+def _pct(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _run(client, ws, project_id: str, prepare: bool) -> str:
+    session_id = str(uuid.uuid4())
+    if prepare:
+        ws.send_json({"type": "prepare", "project_id": project_id})
+        # Give the speculative warm-up a moment, as typing would
+        ws.send_json({"type": "ping"})
+        while ws.receive_json()["type"] != "pong":
+            pass
+    ws.send_json({
+        "type": "send_message",
+        "session_id": session_id,
+        "project_id": project_id,
+        "message": "hello",
+    })
+    while True:
+        event = ws.receive_json()
+        if event.get("session_id") == session_id and event["type"] in (
+            "message_complete", "error",
+        ):
+            break
+    return session_id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        _setup_env(Path(tmp_dir))
+        from fastapi.testclient import TestClient
+
+        from src.main import app
+
+        with TestClient(app) as client:
+            project = client.post(
+                "/api/projects", json={"name": "bench", "use_template": False},
+            ).json()["data"]
+
+            results: dict[str, list[dict]] = {"cold": [], "prepared": []}
+            with client.websocket_connect("/ws/chat") as ws:
+                for i in range(args.runs * 2):
+                    mode = "prepared" if i % 2 else "cold"
+                    sid = _run(client, ws, project["id"], prepare=mode == "prepared")
+                    tasks = client.get("/api/tasks").json()["data"]["tasks"]
+                    results[mode].extend(t for t in tasks if t["session_id"] == sid)
+
+        print(f"{'mode':<10} {'metric':<24} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+        for mode, rows in results.items():
+            for metric in ("send_to_spawn_ms", "time_to_first_token_ms"):
+                values = [r[metric] for r in rows if r[metric] is not None]
+                if not values:
+                    continue
+                print(
+                    f"{mode:<10} {metric:<24} {_pct(values, 0.5):>8.1f} "
+                    f"{_pct(values, 0.95):>8.1f} {statistics.mean(values):>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Benchmark chat WebSocket bytes and latency per encoding.
+
+Replays a synthetic but typical session — prose deltas, thinking, tool calls
+reading and editing source files, a final result — through the real app with
+a fake ``claude`` binary, once per encoding (JSON text frames, MessagePack
+binary frames). For every frame received it reports the payload size and
+what permessage-deflate would put on the wire (same settings uvicorn
+negotiates: raw deflate, 15-bit window, context kept across frames), plus
+send → ``message_complete`` latency and the size of the ``task_replay`` a
+late subscriber gets. Run from ``backend/``::
+
+    python -m benchmarks.ws_bytes --runs 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import textwrap
+import time
+import uuid
+import zlib
+from pathlib import Path
+
+FAKE_CLI = textwrap.dedent("""\
+    #!{python}
+    import os, sys
+    with open(os.environ["WS_BENCH_SESSION"]) as f:
+        for line in f:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+""")
+
+_WORDS = (
+    "the a to of and in is that for it with as on this be are we can file "
+    "function component route state update test build error value return "
+    "config import request response handler session project preview task"
+).split()
+
+
+def _prose(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _session_lines(seed: int) -> list[str]:
+    """stream-json lines for one turn: ~40 text blocks, thinking, 12 tool calls."""
+    rng = random.Random(seed)
+    sources = sorted(Path(__file__).resolve().parent.parent.joinpath("src").rglob("*.py"))
+    sources = [p for p in sources if p.stat().st_size > 2000]
+    lines: list[dict] = []
+
+    def assistant(*blocks: dict) -> None:
+        lines.append({"type": "assistant", "message": {"content": list(blocks)}})
+
+    assistant({"type": "thinking", "thinking": _prose(rng, 120)})
+    for i in range(12):
+        for _ in range(3):
+            assistant({"type": "text", "text": _prose(rng, rng.randint(4, 30)) + " "})
+        path = rng.choice(sources)
+        tool_id = f"toolu_{uuid.uuid4().hex[:24]}"
+        if i % 3 == 2:
+            assistant({"type": "tool_use", "id": tool_id, "name": "Bash",
+                       "input": {"command": "npm run build", "timeout": 120000}})
+            output = "\n".join(
+                f"  ✓ {rng.choice(_WORDS)}/{rng.choice(_WORDS)}.tsx compiled in {rng.randint(5, 900)}ms"
+                for _ in range(rng.randint(20, 120))
+            )
+        else:
+            assistant({"type": "tool_use", "id": tool_id, "name": "Read",
+                       "input": {"file_path": str(path)}})
+            output = path.read_text()
+        assistant({"type": "tool_result", "tool_use_id": tool_id, "content": output})
+    for _ in range(4):
+        assistant({"type": "text", "text": _prose(rng, rng.randint(10, 40)) + " "})
+    lines.append({"type": "result", "result": "done",
+                  "usage": {"input_tokens": 48211, "output_tokens": 2210}})
+    return [json.dumps(line) + "\n" for line in lines]
+
+
+def _setup_env(tmp: Path) -> None:
+    bin_dir = tmp / "bin"
+    bin_dir.mkdir()
+    cli = bin_dir / "claude"
+    cli.write_text(FAKE_CLI.format(python=sys.executable))
+    cli.chmod(0o755)
+    session = tmp / "session.jsonl"
+    session.write_text("".join(_session_lines(seed=7)))
+    os.environ["WS_BENCH_SESSION"] = str(session)
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+    os.environ["CASPERBOT_DATABASE_PATH"] = str(tmp / "bench.db")
+    os.environ["CASPERBOT_PROJECTS_DIR"] = str(tmp / "projects")
+    os.environ["CASPERBOT_TEMPLATES_DIR"] = str(tmp / "projects" / ".templates")
+    os.environ["CASPERBOT_AUTH_ENABLED"] = "false"
+
+
+class _Deflate:
+    """permessage-deflate as negotiated by uvicorn (context takeover on)."""
+
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(wbits=-15)
+
+    def size(self, payload: bytes) -> int:
+        data = self._compressor.compress(payload) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return len(data) - 4  # the trailing 00 00 ff ff is stripped on the wire
+
+
+def _payload(message: dict) -> bytes:
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message["text"].encode()
+
+
+def _decode(payload: bytes, binary: bool) -> dict:
+    if binary:
+        import msgpack
+
+        return msgpack.unpackb(payload)
+    return json.loads(payload)
+
+
+def _run(ws, project_id: str, totals: dict) -> None:
+    session_id = str(uuid.uuid4())
+    deflate = _Deflate()
+    started = time.perf_counter()
+    ws.send_json({
+        "type": "send_message",
+        "session_id": session_id,
+        "project_id": project_id,
+        "message": "refactor the preview service",
+    })
+    decode_seconds = 0.0
+    while True:
+        message = ws.receive()
+        payload = _payload(message)
+        totals["frames"] += 1
+        totals["raw"] += len(payload)
+        totals["deflated"] += deflate.size(payload)
+        t0 = time.perf_counter()
+        event = _decode(payload, message.get("bytes") is not None)
+        decode_seconds += time.perf_counter() - t0
+        if event.get("session_id") == session_id and event["type"] in (
+            "message_complete", "error",
+        ):
+            break
+    totals["latency_ms"].append((time.perf_counter() - started) * 1000)
+    totals["decode_ms"].append(decode_seconds * 1000)
+
+    # A late subscriber (page reload) gets the whole turn in one frame
+    ws.send_json({"type": "subscribe", "session_id": session_id})
+    message = ws.receive()
+    payload = _payload(message)
+    totals["replay_raw"].append(len(payload))
+    totals["replay_deflated"].append(_Deflate().size(payload))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        _setup_env(Path(tmp_dir))
+        from fastapi.testclient import TestClient
+
+        from src.main import app
+        from src.services.chat import transport
+
+        encodings = [transport.JSON]
+        if transport.msgpack is not None:
+            encodings.append(transport.MSGPACK)
+        else:
+            print("msgpack not installed — benchmarking JSON only\n")
+
+        results: dict[str, dict] = {}
+        with TestClient(app) as client:
+            project = client.post(
+                "/api/projects", json={"name": "bench", "use_template": False},
+            ).json()["data"]
+            for encoding in encodings:
+                totals = results[encoding] = {
+                    "frames": 0, "raw": 0, "deflated": 0, "latency_ms": [],
+                    "decode_ms": [], "replay_raw": [], "replay_deflated": [],
+                }
+                with client.websocket_connect("/ws/chat", subprotocols=[encoding]) as ws:
+                    for _ in range(args.runs):
+                        _run(ws, project["id"], totals)
+
+        print(
+            f"{'encoding':<18} {'frames/turn':>11} {'payload KB':>11} {'deflated KB':>12} "
+            f"{'replay KB':>10} {'replay defl.':>12} {'p50 ms':>7} {'decode ms':>10}"
+        )
+        for encoding, t in results.items():
+            print(
+                f"{encoding:<18} {t['frames'] / args.runs:>11.0f} "
+                f"{t['raw'] / args.runs / 1024:>11.1f} "
+                f"{t['deflated'] / args.runs / 1024:>12.1f} "
+                f"{statistics.mean(t['replay_raw']) / 1024:>10.1f} "
+                f"{statistics.mean(t['replay_deflated']) / 1024:>12.1f} "
+                f"{statistics.median(t['latency_ms']):>7.1f} "
+                f"{statistics.median(t['decode_ms']):>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,19 @@
 import asyncio
 import json
 import logging
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 
+from ...core.config import settings
 from ...core.exceptions import ProjectNotFoundError, SessionNotFoundError
 from ...core.security import authenticate_websocket
+from ...core.tracing import tracer
 from ...schemas.chat import ChatMessageType
 from ...services.credentials.credential_service import CredentialService
+from ...services.chat import transport
 from ...services.chat.title_generator import generate_title
 from ...services.projects.project_service import ProjectService
 from ...services.sessions.session_service import SessionService
@@ -25,21 +30,34 @@ async def chat_websocket(websocket: WebSocket, token: str = Query(default="")):
     """WebSocket endpoint for bidirectional chat with Claude.
 
     Protocol:
-    - Client sends JSON: send_message, cancel, subscribe, unsubscribe, or ping
-    - Server sends JSON events: text_delta, thinking_delta, tool_use_start, etc.
+    - Client sends JSON: send_message, prepare, cancel, subscribe, unsubscribe, or ping
+    - Server sends events: text_delta, thinking_delta, tool_use_start, etc. —
+      JSON text frames, or MessagePack binary frames when the client offers
+      the ``casperbot.msgpack`` subprotocol (see ``services.chat.transport``)
     """
     if not await authenticate_websocket(token):
         await websocket.accept()
         await websocket.close(code=1008, reason="Unauthorized")
         return
 
-    await websocket.accept()
+    await websocket.accept(subprotocol=transport.negotiate(websocket))
 
     task_manager: TaskManager = websocket.app.state.task_manager
     session_service: SessionService = websocket.app.state.session_service
     project_service: ProjectService = websocket.app.state.project_service
-    credential_service: CredentialService = websocket.app.state.credential_service
-    message_service: MessageService = websocket.app.state.message_service
+
+    # Results of "prepare" warm-ups on this socket, keyed by project_id
+    prepared: dict[str, dict] = {}
+    # Slow handlers (send/prepare) run as tasks so ping/cancel/subscribe on
+    # this socket are never stuck behind a send's pre-flight
+    prepares: set[asyncio.Task] = set()
+    sends: set[asyncio.Task] = set()
+    sending: set[str] = set()  # session_ids with a send still in pre-flight
+
+    def _spawn(coro, handlers: set[asyncio.Task]) -> None:
+        handler = asyncio.create_task(coro)
+        handlers.add(handler)
+        handler.add_done_callback(handlers.discard)
 
     try:
         while True:
@@ -54,7 +72,7 @@ async def chat_websocket(websocket: WebSocket, token: str = Query(default="")):
             msg_type = data.get("type")
 
             if msg_type == ChatMessageType.PING:
-                await websocket.send_json({"type": "pong"})
+                await transport.send_event(websocket, {"type": "pong"})
 
             elif msg_type == ChatMessageType.SUBSCRIBE:
                 session_id = data.get("session_id")
@@ -65,7 +83,7 @@ async def chat_websocket(websocket: WebSocket, token: str = Query(default="")):
                     replay = task_manager.get_replay(session_id)
                     if replay:
                         events, is_complete = replay
-                        await websocket.send_json({
+                        await transport.send_event(websocket, {
                             "type": "task_replay",
                             "session_id": session_id,
                             "events": events,
@@ -77,6 +95,18 @@ async def chat_websocket(websocket: WebSocket, token: str = Query(default="")):
                 if session_id:
                     await task_manager.unsubscribe(session_id, websocket)
 
+            elif msg_type == ChatMessageType.PREPARE:
+                project_id = data.get("project_id")
+                if project_id:
+                    _spawn(_prepare(
+                        prepared,
+                        project_id=project_id,
+                        session_id=data.get("session_id"),
+                        project_service=project_service,
+                        session_service=session_service,
+                        task_manager=task_manager,
+                    ), prepares)
+
             elif msg_type == ChatMessageType.CANCEL:
                 session_id = data.get("session_id")
                 if session_id:
@@ -84,6 +114,7 @@ async def chat_websocket(websocket: WebSocket, token: str = Query(default="")):
                     # cancelled event is broadcast by task_manager to all subscribers
 
             elif msg_type == ChatMessageType.SEND_MESSAGE:
+                requested_at = time.monotonic()
                 session_id = data.get("session_id", "")
                 project_id = data.get("project_id", "")
                 message = data.get("message", "")
@@ -103,7 +134,7 @@ async def chat_websocket(websocket: WebSocket, token: str = Query(default="")):
                     )
                     continue
 
-                if task_manager.is_task_running(session_id):
+                if session_id in sending or task_manager.is_task_running(session_id):
                     await _send_error(
                         websocket,
                         session_id,
@@ -111,125 +142,272 @@ async def chat_websocket(websocket: WebSocket, token: str = Query(default="")):
                     )
                     continue
 
-                # Validate project exists and resolve path first
-                try:
-                    project = await project_service.get_project(project_id)
-                    project_path = Path(project["path"])
-                except ProjectNotFoundError:
-                    logger.warning(
-                        "Project not found in DB: project_id=%s", project_id
-                    )
-                    await _send_error(
-                        websocket, session_id, "Project not found"
-                    )
-                    continue
-                except Exception as e:
-                    logger.error("Failed to resolve project %s: %s", project_id, e)
-                    await _send_error(
-                        websocket, session_id, "Failed to load project"
-                    )
-                    continue
+                sending.add(session_id)
+                _spawn(_handle_send_message(
+                    websocket,
+                    data,
+                    requested_at=requested_at,
+                    prep=prepared.pop(project_id, None),
+                    sending=sending,
+                ), sends)
 
-                # Determine if this is a new session or continuation
-                is_continuation = False
-                try:
-                    existing = await session_service.get_session(session_id)
-                    # Validate session belongs to this project
-                    if existing["project_id"] != project_id:
-                        await _send_error(
-                            websocket,
-                            session_id,
-                            "Session does not belong to this project",
-                        )
-                        continue
-                    is_continuation = True
+            else:
+                await _send_error(
+                    websocket, None, f"Unknown message type: {msg_type}"
+                )
 
-                    # First real message in a pre-created session — generate a title
-                    if existing.get("message_count", 0) == 0:
-                        asyncio.create_task(
-                            _generate_session_title(
-                                task_manager=task_manager,
-                                websocket=websocket,
-                                session_service=session_service,
-                                credential_service=credential_service,
-                                session_id=session_id,
-                                message=message,
-                            )
-                        )
-                except SessionNotFoundError:
-                    # New session — create it. Wrap in try/except to handle
-                    # the race condition where two messages create the same
-                    # session simultaneously.
-                    try:
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Warm-ups die with the socket. Sends don't: a client that sends and
+        # drops the connection still gets its task started (and its reply
+        # persisted), so let in-flight sends finish before unsubscribing
+        for handler in list(prepares):
+            handler.cancel()
+        if sends:
+            await asyncio.gather(*(asyncio.shield(h) for h in list(sends)), return_exceptions=True)
+        # CRITICAL: don't cancel tasks — just unsubscribe this WebSocket.
+        # Tasks keep running in the background.
+        await task_manager.unsubscribe_all(websocket)
+        transport.close(websocket)
+
+
+async def _handle_send_message(
+    websocket: WebSocket,
+    data: dict,
+    requested_at: float,
+    prep: dict | None,
+    sending: set[str],
+) -> None:
+    """Pre-flight and launch for one send_message, run off the receive loop.
+
+    Project and session lookups run concurrently, and the user message is
+    persisted while the CLI task starts (as soon as the session row exists).
+    Runs to completion even if the socket closes meanwhile.
+    """
+    task_manager: TaskManager = websocket.app.state.task_manager
+    session_service: SessionService = websocket.app.state.session_service
+    project_service: ProjectService = websocket.app.state.project_service
+    credential_service: CredentialService = websocket.app.state.credential_service
+    message_service: MessageService = websocket.app.state.message_service
+
+    session_id = data["session_id"]
+    project_id = data["project_id"]
+    message = data["message"]
+
+    # A fresh "prepare" already validated the project (and maybe the session)
+    if prep and time.monotonic() - prep["at"] > settings.launch_profile_ttl_seconds:
+        prep = None
+
+    with tracer.span(
+        "chat.send_message",
+        session_id=session_id,
+        project_id=project_id,
+        prepared=prep is not None,
+    ):
+        try:
+            async def _lookup_project() -> Path:
+                if prep:
+                    return prep["project_path"]
+                with tracer.span("project.get_project", project_id=project_id):
+                    project = await project_service.get_project(project_id)
+                return Path(project["path"])
+
+            async def _lookup_session() -> dict:
+                if prep and prep["session"] and prep["session"]["id"] == session_id:
+                    return prep["session"]
+                with tracer.span("session.get_session", session_id=session_id):
+                    return await session_service.get_session(session_id)
+
+            project_result, session_result = await asyncio.gather(
+                _lookup_project(), _lookup_session(), return_exceptions=True,
+            )
+
+            # Validate project exists and resolve path first
+            if isinstance(project_result, ProjectNotFoundError):
+                logger.warning("Project not found in DB: project_id=%s", project_id)
+                await _send_error(websocket, session_id, "Project not found")
+                return
+            if isinstance(project_result, BaseException):
+                logger.error("Failed to resolve project %s: %s", project_id, project_result)
+                await _send_error(websocket, session_id, "Failed to load project")
+                return
+            project_path = project_result
+
+            # Determine if this is a new session or continuation
+            generate_title = False
+            if isinstance(session_result, SessionNotFoundError):
+                # New session — create it. Wrap in try/except to handle
+                # the race condition where two messages create the same
+                # session simultaneously.
+                try:
+                    with tracer.span("session.create_session", session_id=session_id):
                         await session_service.create_session(
                             project_id=project_id,
                             name=message[:50],
                             session_id=session_id,
                         )
-                    except Exception:
-                        # Session was likely created by a concurrent request —
-                        # treat as continuation.
-                        logger.info(
-                            "Session %s created concurrently, treating as continuation",
-                            session_id,
-                        )
-                        is_continuation = True
-                    else:
-                        is_continuation = False
-                        await websocket.send_json(
+                except Exception:
+                    # Session was likely created by a concurrent request —
+                    # treat as continuation.
+                    logger.info(
+                        "Session %s created concurrently, treating as continuation",
+                        session_id,
+                    )
+                    is_continuation = True
+                else:
+                    is_continuation = False
+                    generate_title = True
+                    try:
+                        await transport.send_event(
+                            websocket,
                             {
                                 "type": "session_created",
                                 "session_id": session_id,
                                 "project_id": project_id,
                             }
                         )
-                        # Generate a smart title in the background
-                        asyncio.create_task(
-                            _generate_session_title(
-                                task_manager=task_manager,
-                                websocket=websocket,
-                                session_service=session_service,
-                                credential_service=credential_service,
-                                session_id=session_id,
-                                message=message,
-                            )
-                        )
-
-                # Persist user message
-                try:
-                    await message_service.save_message(
-                        session_id=session_id, role="user", content=message
+                    except Exception:
+                        pass  # WebSocket closed — the task still starts
+            elif isinstance(session_result, BaseException):
+                logger.error("Failed to load session %s: %s", session_id, session_result)
+                await _send_error(websocket, session_id, "Failed to load session")
+                return
+            else:
+                # Validate session belongs to this project
+                if session_result["project_id"] != project_id:
+                    await _send_error(
+                        websocket,
+                        session_id,
+                        "Session does not belong to this project",
                     )
-                except Exception:
-                    logger.warning("Failed to persist user message for session %s", session_id, exc_info=True)
-
-                # Start background task (decoupled from this WebSocket)
-                try:
-                    await task_manager.start_task(
+                    return
+                is_continuation = True
+                # First real message in a pre-created session — generate a title
+                generate_title = session_result.get("message_count", 0) == 0
+
+            if generate_title:
+                # Generate a smart title in the background
+                asyncio.create_task(
+                    _generate_session_title(
+                        task_manager=task_manager,
+                        websocket=websocket,
+                        session_service=session_service,
+                        credential_service=credential_service,
                         session_id=session_id,
-                        project_id=project_id,
-                        project_path=project_path,
                         message=message,
-                        is_continuation=is_continuation,
-                        model=data.get("model"),
-                        max_budget_usd=data.get("max_budget_usd"),
                     )
-                    # Auto-subscribe the sender to the task
-                    await task_manager.subscribe(session_id, websocket)
-                except RuntimeError as e:
-                    await _send_error(websocket, session_id, str(e))
+                )
 
-            else:
-                await _send_error(
-                    websocket, None, f"Unknown message type: {msg_type}"
+            # Persist the user message alongside the launch — timestamped now
+            # so it still sorts before the assistant reply
+            saved = asyncio.create_task(
+                _persist_user_message(
+                    message_service,
+                    session_id=session_id,
+                    message=message,
+                    created_at=datetime.now(timezone.utc).isoformat(),
                 )
+            )
 
-    except WebSocketDisconnect:
-        pass
-    finally:
-        # CRITICAL: don't cancel tasks — just unsubscribe this WebSocket.
-        # Tasks keep running in the background.
-        await task_manager.unsubscribe_all(websocket)
+            # Start background task (decoupled from this WebSocket)
+            try:
+                await task_manager.start_task(
+                    session_id=session_id,
+                    project_id=project_id,
+                    project_path=project_path,
+                    message=message,
+                    is_continuation=is_continuation,
+                    model=data.get("model"),
+                    max_budget_usd=data.get("max_budget_usd"),
+                    requested_at=requested_at,
+                    prepared=prep is not None,
+                )
+                # Auto-subscribe the sender to the task
+                await task_manager.subscribe(session_id, websocket)
+            except RuntimeError as e:
+                await _send_error(websocket, session_id, str(e))
+            finally:
+                if not await saved:
+                    await _send_error(
+                        websocket, session_id, "Failed to save your message to the chat history",
+                    )
+        except Exception:
+            logger.exception("send_message failed for session %s", session_id)
+            tracer.current().record_error("send_message failed")
+            try:
+                await _send_error(websocket, session_id, "Failed to send message")
+            except Exception:
+                pass  # WebSocket may be closed
+        finally:
+            sending.discard(session_id)
+
+
+async def _persist_user_message(
+    message_service: MessageService,
+    session_id: str,
+    message: str,
+    created_at: str,
+) -> bool:
+    """Save the user's message; returns whether it was saved."""
+    try:
+        await message_service.save_message(
+            session_id=session_id, role="user", content=message, created_at=created_at,
+        )
+    except Exception:
+        logger.error("Failed to persist user message for session %s", session_id, exc_info=True)
+        return False
+    return True
+
+
+async def _prepare(
+    prepared: dict[str, dict],
+    project_id: str,
+    session_id: str | None,
+    project_service: ProjectService,
+    session_service: SessionService,
+    task_manager: TaskManager,
+) -> None:
+    """Speculatively validate a project/session and precompute the launch profile.
+
+    Failures are silent — the real send repeats every check it couldn't skip.
+    """
+    existing = prepared.get(project_id)
+    if (
+        existing
+        and existing["session_id"] == session_id
+        and time.monotonic() - existing["at"] < settings.launch_profile_ttl_seconds / 2
+    ):
+        return  # Still fresh — avoid redoing work on every focus event
+
+    try:
+        project = await project_service.get_project(project_id)
+    except Exception:
+        logger.debug("prepare: project %s not available", project_id, exc_info=True)
+        return
+
+    session = None
+    if session_id:
+        try:
+            session = await session_service.get_session(session_id)
+        except SessionNotFoundError:
+            session = None  # Draft chat — created on first send
+        except Exception:
+            logger.debug("prepare: session lookup failed for %s", session_id, exc_info=True)
+        if session and session["project_id"] != project_id:
+            return
+
+    try:
+        await task_manager.prepare_launch(project_id)
+    except Exception:
+        logger.debug("prepare: launch profile failed for %s", project_id, exc_info=True)
+
+    prepared[project_id] = {
+        "project_path": Path(project["path"]),
+        "session_id": session_id,
+        "session": session,
+        "at": time.monotonic(),
+    }
 
 
 async def _generate_session_title(
@@ -256,7 +434,7 @@ async def _generate_session_title(
         await task_manager.broadcast_to_task(session_id, event)
         # Also send directly to this websocket in case it's not subscribed yet
         try:
-            await websocket.send_json(event)
+            await transport.send_event(websocket, event)
         except Exception:
             pass  # WebSocket may be closed
     except Exception:
@@ -266,6 +444,6 @@ async def _generate_session_title(
 async def _send_error(
     websocket: WebSocket, session_id: str | None, error: str
 ) -> None:
-    await websocket.send_json(
-        {"type": "error", "session_id": session_id, "error": error}
+    await transport.send_event(
+        websocket, {"type": "error", "session_id": session_id, "error": error}
     )
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Query, Request
+import re
 
+from fastapi import APIRouter, Header, Query, Request, Response
+
+from ...core.exceptions import ToolOutputNotFoundError
 from ...schemas.common import APIResponse
-from ...schemas.messages import MessageListResponse
+from ...schemas.messages import MessageListResponse, ToolProfileResponse
 
 router = APIRouter(prefix="/api/messages", tags=["messages"])
 
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
 
 @router.get("", response_model=APIResponse[MessageListResponse])
 async def list_messages(
@@ -18,3 +23,56 @@ async def list_messages(
     return APIResponse(
         data=MessageListResponse(messages=messages, total=total)
     )
+
+
+@router.get("/tool-profile", response_model=APIResponse[ToolProfileResponse])
+async def tool_profile(request: Request, session_id: str = Query(...)):
+    """Which tools dominate a session's time, from persisted tool timings."""
+    service = request.app.state.message_service
+    tools = await service.tool_profile(session_id)
+    return APIResponse(
+        data=ToolProfileResponse(session_id=session_id, tools=tools)
+    )
+
+
+@router.get("/tool-outputs/{handle}")
+async def get_tool_output(
+    request: Request,
+    handle: str,
+    session_id: str = Query(...),
+    range_header: str | None = Header(None, alias="Range"),
+):
+    """Full text of an offloaded tool output (see ``outputHandle`` in tool_uses).
+
+    Honours a single ``Range: bytes=start-end`` header (206 Partial Content).
+    Offsets are in bytes of the UTF-8 text.
+    """
+    store = request.app.state.tool_output_store
+    headers = {"Accept-Ranges": "bytes"}
+    match = _RANGE_RE.match(range_header.strip()) if range_header else None
+    if match is None or match.groups() == ("", ""):
+        result = await store.read(session_id, handle)
+        if result is None:
+            raise ToolOutputNotFoundError(f"Tool output {handle} not found")
+        data, _ = result
+        return Response(data, media_type="text/plain; charset=utf-8", headers=headers)
+
+    first, last = match.groups()
+    if first:
+        start, end = int(first), int(last) + 1 if last else None
+    else:
+        start, end = -int(last), None  # suffix range: the last N bytes
+    result = await store.read(session_id, handle, start, end)
+    if result is None:
+        raise ToolOutputNotFoundError(f"Tool output {handle} not found")
+    data, size = result
+    if start < 0:
+        start = size - len(data)
+    if not data:
+        return Response(
+            status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"},
+        )
+    headers["Content-Range"] = f"bytes {start}-{start + len(data) - 1}/{size}"
+    return Response(
+        data, status_code=206, media_type="text/plain; charset=utf-8", headers=headers,
+    )
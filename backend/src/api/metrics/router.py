@@ -0,0 +1,38 @@
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from ...core.config import settings
+from ...core.metrics import metrics
+from ...core.security import get_current_user
+
+router = APIRouter(tags=["metrics"])
+
+_bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def require_scrape_access(
+    credentials: HTTPAuthorizationCredentials | None = Depends(_bearer_scheme),
+) -> None:
+    """Accept ``settings.metrics_token`` as a bearer token, else require the usual JWT."""
+    if (
+        settings.metrics_token
+        and credentials is not None
+        and secrets.compare_digest(credentials.credentials, settings.metrics_token)
+    ):
+        return
+    await get_current_user(credentials)
+
+
+@router.get(
+    "/api/metrics",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_scrape_access)],
+)
+async def prometheus_metrics() -> PlainTextResponse:
+    """Tool, spawn and streaming latency metrics in Prometheus text format."""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -3,16 +3,27 @@
 from __future__ import annotations
 
 import asyncio
+import json
 from pathlib import Path
 
 from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
 
 from ...core.database import db
 from ...core.exceptions import ProjectNotFoundError
-from ...schemas.preview import PreviewDetection, PreviewInfo, PreviewLogsResponse
+from ...schemas.preview import (
+    PreviewDetection,
+    PreviewInfo,
+    PreviewLogsResponse,
+    PreviewServiceDetection,
+)
+from ...services.preview.log_filter import LogFilter
 
 router = APIRouter(prefix="/api/preview", tags=["preview"])
 
+_LOG_PAGE_SIZE = 500
+_SSE_KEEPALIVE_SECONDS = 15
+
 
 async def _resolve_project(project_id: str) -> dict:
     """Look up a project by ID, raising 404 if not found."""
@@ -32,24 +43,45 @@ async def detect_preview(project_id: str, request: Request) -> dict:
     svc = request.app.state.preview_service
 
     loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(
-        None, svc.detect, Path(project["path"])
+    services = await loop.run_in_executor(
+        None, svc.detect_services, Path(project["path"])
     )
+    primary = services[0] if services else None
 
     return {
         "success": True,
         "data": PreviewDetection(
-            supported=result.supported,
-            framework=result.framework,
-            needs_install=result.needs_install,
+            supported=primary is not None,
+            framework=primary and primary.framework,
+            needs_install=any(s.needs_install for s in services),
+            subdir=primary and primary.subdir,
+            package_manager=primary and primary.package_manager,
+            services=[
+                PreviewServiceDetection(
+                    subdir=s.subdir,
+                    framework=s.framework,
+                    needs_install=s.needs_install,
+                    package_manager=s.package_manager,
+                    buildable=s.build_output is not None,
+                )
+                for s in services
+            ],
         ).model_dump(),
         "error": None,
     }
 
 
 @router.post("/{project_id}/start")
-async def start_preview(project_id: str, request: Request) -> dict:
-    """Start the dev server for a project."""
+async def start_preview(
+    project_id: str,
+    request: Request,
+    mode: str = Query("dev", pattern="^(dev|production)$"),
+) -> dict:
+    """Start the dev server(s) for a project.
+
+    ``mode=production`` serves static builds instead of dev servers where
+    the framework allows it.
+    """
     project = await _resolve_project(project_id)
     svc = request.app.state.preview_service
 
@@ -57,6 +89,7 @@ async def start_preview(project_id: str, request: Request) -> dict:
         project_id=project_id,
         project_path=Path(project["path"]),
         slug=project["slug"],
+        mode=mode,
     )
 
     return {
@@ -76,10 +109,20 @@ async def stop_preview(project_id: str, request: Request) -> dict:
 
 
 @router.get("/{project_id}/status")
-async def preview_status(project_id: str, request: Request) -> dict:
-    """Get the current preview status for a project."""
+async def preview_status(
+    project_id: str,
+    request: Request,
+    wait: float = Query(0, ge=0, le=60),
+) -> dict:
+    """Get the current preview status for a project.
+
+    With ``wait``, a preview that is still starting is held for up to that
+    many seconds until it becomes ready or fails.
+    """
     project = await _resolve_project(project_id)
     svc = request.app.state.preview_service
+    if wait:
+        await svc.wait_ready(project_id, wait)
     info = await svc.status(project_id, project["slug"])
 
     return {
@@ -93,15 +136,70 @@ async def preview_status(project_id: str, request: Request) -> dict:
 async def preview_logs(
     project_id: str,
     request: Request,
-    since_line: int = Query(0, ge=0),
-) -> dict:
-    """Get dev server log output."""
+    since: int = Query(0, ge=0),
+    wait: float = Query(0, ge=0, le=30),
+    follow: bool = Query(False),
+    level: str | None = Query(None),
+    q: str | None = Query(None),
+):
+    """Dev server log output (including the dependency install before it).
+
+    - ``?since=N`` returns lines from sequence N on; pass back ``next_seq``.
+      Lines older than the in-memory ring are read from the log file.
+    - ``?wait=S`` long-polls up to S seconds when nothing new is available.
+    - ``?follow=true`` streams lines as Server-Sent Events until the server exits.
+    - ``?level=warn|error`` and ``?q=<regex>`` filter lines on the server.
+    """
     await _resolve_project(project_id)
     svc = request.app.state.preview_service
-    lines, total = svc.get_logs(project_id, since_line)
-
+    log_filter = LogFilter(level, q)
+    log = svc.get_log(project_id)
+    if log is None:
+        return {
+            "success": True,
+            "data": PreviewLogsResponse(entries=[], next_seq=since, dropped=0, running=False).model_dump(),
+            "error": None,
+        }
+
+    if follow:
+        return StreamingResponse(
+            _follow_log(log, since, log_filter, request),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    if wait and since >= log.next_seq and not log.closed:
+        await log.wait(since, timeout=wait)
+    entries, dropped = await log.read(since, limit=_LOG_PAGE_SIZE)
+    # next_seq advances past filtered-out lines too
+    next_seq = entries[-1]["seq"] + 1 if entries else max(since, log.first_seq)
     return {
         "success": True,
-        "data": PreviewLogsResponse(logs=lines, total_lines=total).model_dump(),
+        "data": PreviewLogsResponse(
+            entries=log_filter.apply(entries),
+            next_seq=next_seq,
+            dropped=dropped,
+            running=not log.closed,
+        ).model_dump(),
         "error": None,
     }
+
+
+async def _follow_log(log, since: int, log_filter: LogFilter, request: Request):
+    seq = since
+    while True:
+        entries, dropped = await log.read(seq, limit=_LOG_PAGE_SIZE)
+        if dropped:
+            yield f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n"
+        for entry in log_filter.apply(entries):
+            yield f"id: {entry['seq']}\ndata: {json.dumps(entry)}\n\n"
+        seq = entries[-1]["seq"] + 1 if entries else max(seq, log.first_seq)
+        if entries:
+            continue
+        if log.closed:
+            yield "event: end\ndata: {}\n\n"
+            return
+        if await request.is_disconnected():
+            return
+        if not await log.wait(seq, timeout=_SSE_KEEPALIVE_SECONDS):
+            yield ": keepalive\n\n"
@@ -1,19 +1,190 @@
-from fastapi import APIRouter, Request
+import hashlib
+import json
+import time
+
+from fastapi import APIRouter, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
 from ...schemas.common import APIResponse
-from ...schemas.tasks import TaskListResponse
+from ...services.chat.transport import EventStream
+from ...schemas.tasks import TaskListResponse, TaskLogsResponse, TaskToolsResponse
 
 router = APIRouter(prefix="/api/tasks", tags=["tasks"])
 
+_LOG_PAGE_SIZE = 500
+_SSE_KEEPALIVE_SECONDS = 15
+_SSE_POLL_SECONDS = 1.0
+# Remote (other-worker) task changes aren't signalled locally, so a shared
+# bus re-reads the registry this often while long-polling
+_REMOTE_POLL_SECONDS = 1.0
+
+
+def _tasks_etag(tasks: list[dict]) -> str:
+    """ETag over which tasks exist and their status — not their live counters."""
+    state = sorted(
+        (t["session_id"], t["status"], t["started_at"], t["completed_at"] or "", t["worker"] or "")
+        for t in tasks
+    )
+    return '"' + hashlib.sha256(json.dumps(state).encode()).hexdigest()[:16] + '"'
+
 
 @router.get("", response_model=APIResponse[TaskListResponse])
-async def list_tasks(request: Request):
-    """List all active and recently completed background tasks."""
+async def list_tasks(
+    request: Request,
+    response: Response,
+    wait: float = Query(0, ge=0, le=60),
+    if_none_match: str | None = Header(None),
+):
+    """List all active and recently completed background tasks.
+
+    The response carries an ``ETag`` over the task set and statuses. Sent
+    back as ``If-None-Match`` with ``?wait=S``, the request long-polls up to
+    S seconds for a task to start, finish or expire, then answers 304 if
+    nothing did.
+    """
     task_manager = request.app.state.task_manager
-    tasks = task_manager.list_active()
+    tasks = await task_manager.list_all()
+    etag = _tasks_etag(tasks)
+    if wait and if_none_match == etag:
+        deadline = time.monotonic() + wait
+        poll = _REMOTE_POLL_SECONDS if task_manager.shares_tasks else wait
+        while etag == if_none_match and (remaining := deadline - time.monotonic()) > 0:
+            await task_manager.wait_for_change(min(remaining, poll))
+            tasks = await task_manager.list_all()
+            etag = _tasks_etag(tasks)
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return APIResponse(data=TaskListResponse(tasks=tasks, total=len(tasks)))
 
 
+@router.get("/reaper", response_model=APIResponse[dict])
+async def reaper_stats(request: Request):
+    """Report orphaned process groups reclaimed by the reaper."""
+    return APIResponse(data=request.app.state.process_reaper.get_stats())
+
+
+@router.post("/reaper/run", response_model=APIResponse[dict])
+async def run_reaper(request: Request):
+    """Run an orphan-reaping pass now and report what it reclaimed."""
+    stats = await request.app.state.process_reaper.reap()
+    return APIResponse(data=stats)
+
+
+@router.get("/{session_id}/tools", response_model=APIResponse[TaskToolsResponse])
+async def task_tools(session_id: str, request: Request):
+    """Per-call tool timings for a live or recently finished task."""
+    tools = request.app.state.task_manager.get_tool_calls(session_id)
+    if tools is None:
+        return APIResponse(success=False, error="No task found for this session")
+    return APIResponse(data=TaskToolsResponse(**tools))
+
+
+@router.get("/{session_id}/logs")
+async def task_logs(
+    session_id: str,
+    request: Request,
+    since: int = Query(0, ge=0),
+    wait: float = Query(0, ge=0, le=30),
+    follow: bool = Query(False),
+):
+    """Live CLI diagnostics (stderr + non-JSON stdout) for a session.
+
+    - ``?since=N`` returns lines from sequence N on; pass back ``next_seq``.
+    - ``?wait=S`` long-polls up to S seconds when nothing new is available.
+    - ``?follow=true`` streams lines as Server-Sent Events until the process exits.
+    """
+    log = request.app.state.process_manager.get_log(session_id)
+    if log is None:
+        return APIResponse(success=False, error="No logs for this session")
+
+    if follow:
+        return StreamingResponse(
+            _follow_log(log, since, request),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    if wait and since >= log.next_seq and not log.closed:
+        await log.wait(since, timeout=wait)
+    entries, dropped = log.since(since, limit=_LOG_PAGE_SIZE)
+    next_seq = entries[-1]["seq"] + 1 if entries else max(since, log.first_seq)
+    return APIResponse(
+        data=TaskLogsResponse(
+            entries=entries,
+            next_seq=next_seq,
+            dropped=dropped,
+            running=not log.closed,
+        )
+    )
+
+
+async def _follow_log(log, since: int, request: Request):
+    seq = since
+    while True:
+        entries, dropped = log.since(seq, limit=_LOG_PAGE_SIZE)
+        if dropped:
+            yield f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n"
+        for entry in entries:
+            yield f"id: {entry['seq']}\ndata: {json.dumps(entry)}\n\n"
+        seq = entries[-1]["seq"] + 1 if entries else max(seq, log.first_seq)
+        if entries:
+            continue
+        if log.closed:
+            yield "event: end\ndata: {}\n\n"
+            return
+        if await request.is_disconnected():
+            return
+        if not await log.wait(seq, timeout=_SSE_KEEPALIVE_SECONDS):
+            yield ": keepalive\n\n"
+
+
+@router.get("/{session_id}/events")
+async def task_events(
+    session_id: str,
+    request: Request,
+    last_event_id: str | None = Header(None),
+):
+    """A task's chat events as Server-Sent Events — the WebSocket stream over plain HTTP.
+
+    Sends the buffered events, then follows live ones, and ends with an
+    ``end`` event once the task finishes. Reconnecting with ``Last-Event-ID``
+    (EventSource does this itself) resumes after the last event received.
+    """
+    task_manager = request.app.state.task_manager
+    stream = EventStream()
+    task = await task_manager.follow(session_id, stream, last_event_id)
+    if task is None:
+        return APIResponse(success=False, error="No task found for this session")
+    return StreamingResponse(
+        _follow_task(task_manager, task, stream, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _follow_task(task_manager, task, stream: EventStream, request: Request):
+    try:
+        idle = 0.0
+        while True:
+            message = await stream.next(timeout=_SSE_POLL_SECONDS)
+            if message is not None:
+                idle = 0.0
+                yield message
+                continue
+            if task_manager.is_stream_finished(task):
+                yield "event: end\ndata: {}\n\n"
+                return
+            if await request.is_disconnected():
+                return
+            idle += _SSE_POLL_SECONDS
+            if idle >= _SSE_KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keepalive\n\n"
+    finally:
+        await task_manager.unsubscribe_all(stream)
+
+
 @router.post("/{session_id}/cancel", response_model=APIResponse[dict])
 async def cancel_task(session_id: str, request: Request):
     """Cancel a running background task."""
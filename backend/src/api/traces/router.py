@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Query
+
+from ...core.config import settings
+from ...core.tracing import tracer
+from ...schemas.common import APIResponse
+from ...schemas.traces import TraceListResponse, TraceResponse
+
+router = APIRouter(prefix="/api/traces", tags=["traces"])
+
+
+@router.get("", response_model=APIResponse[TraceListResponse])
+async def list_traces(limit: int = Query(default=50, ge=1, le=500)):
+    """Most recent chat-turn traces, newest first, with their total duration."""
+    return APIResponse(
+        data=TraceListResponse(enabled=settings.tracing_enabled, traces=tracer.recent(limit))
+    )
+
+
+@router.get("/export")
+async def export_traces(trace_id: str | None = Query(default=None)) -> dict:
+    """Dump buffered spans as OTLP/JSON for loading into an OpenTelemetry viewer."""
+    return tracer.export(trace_id)
+
+
+@router.get("/{trace_id}", response_model=APIResponse[TraceResponse])
+async def get_trace(trace_id: str):
+    """All spans of one trace, ordered by start time."""
+    spans = tracer.get(trace_id)
+    if spans is None:
+        return APIResponse(success=False, error="Trace not found")
+    return APIResponse(data=TraceResponse(trace_id=trace_id, spans=spans))
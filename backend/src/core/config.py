@@ -28,11 +28,32 @@ class Settings(BaseSettings):
     default_model: str = "sonnet"
     max_budget_usd: float = 5.0
     fallback_model: str = "haiku"
-    process_timeout_seconds: int = 1200
+    process_timeout_seconds: int = 1200  # total wall-clock limit per CLI run (0 = none)
+    process_idle_timeout_seconds: int = 600  # kill if the CLI prints nothing for this long (0 = none)
+    launch_profile_ttl_seconds: int = 60  # how long a "prepare" warm-up stays valid
+    message_checkpoint_seconds: float = 5.0  # persist in-flight assistant output this often
+    message_checkpoint_bytes: int = 8192  # ...or after this many new characters
+    # Detached tasks: each CLI runs under a small supervisor that spools its
+    # stream-json to disk, so a backend restart reattaches instead of killing it
+    detached_tasks: bool = False
+    task_spool_dir: Path = Path(__file__).resolve().parent.parent.parent / "data" / "spool"
+    # Tool outputs larger than this are stored on disk and streamed/persisted
+    # as a head+tail preview plus a handle, fetched in full on demand
+    tool_output_inline_bytes: int = 32768
+    tool_output_preview_bytes: int = 4096
+    tool_output_cache_bytes: int = 64 * 1024 * 1024  # recent offloaded outputs kept in memory
+    tool_output_dir: Path = Path(__file__).resolve().parent.parent.parent / "data" / "tool_outputs"
 
     # Background tasks
     max_concurrent_tasks: int = 5
     task_buffer_ttl_seconds: int = 3600  # 1 hour — keep completed buffers for replay
+    process_reaper_interval_seconds: int = 300  # sweep for orphaned process groups
+    # Task bus: "local" keeps tasks in this process; "sqlite" shares the task
+    # registry and event stream through the database so several uvicorn
+    # workers can subscribe to, replay and cancel each other's tasks
+    task_bus: str = "local"
+    task_bus_poll_seconds: float = 0.1
+    worker_heartbeat_seconds: int = 5  # a worker silent for 3x this is presumed dead
 
     # Auth
     auth_enabled: bool = True
@@ -56,7 +77,59 @@ class Settings(BaseSettings):
     preview_caddy_admin_url: str = "http://localhost:2019"
     preview_domain: str = "casperbot.net"
     preview_caddy_listen_port: int = 9000
+    # Idle time is measured from the last proxied traffic on the preview's port.
+    # Idle previews are frozen (SIGSTOP, thawed on the next request; 0 = never),
+    # then stopped; over the memory budget (0 = none) the least recently used
+    # are stopped early.
     preview_auto_stop_minutes: int = 60
+    preview_freeze_idle_minutes: int = 10
+    preview_memory_budget_mb: int = 0
+    # A starting dev server that neither logs its ready banner nor accepts
+    # connections within this long is reported as failed
+    preview_ready_timeout_seconds: int = 120
+    # While an agent turn edits a project, its dev servers' file watchers are
+    # paused (SIGSTOP) and catch up on every change at once when it ends — for
+    # at most preview_agent_pause_max_seconds, however long the turn runs
+    preview_pause_during_agent_turns: bool = True
+    preview_agent_pause_max_seconds: int = 60
+    # node_modules trees keyed by lockfile hash, hard-linked into projects,
+    # and the package managers' shared download caches
+    preview_install_cache_dir: Path = Path(__file__).resolve().parent.parent.parent / "data" / "install_cache"
+    preview_install_cache_entries: int = 20
+    preview_package_cache_dir: Path = Path(__file__).resolve().parent.parent.parent / "data" / "package_cache"
+    # Preview logs beyond the in-memory ring, per project (current run only)
+    preview_log_dir: Path = Path(__file__).resolve().parent.parent.parent / "data" / "preview_logs"
+    preview_log_file_bytes: int = 1024 * 1024
+    preview_log_file_backups: int = 4
+    # Production previews: static builds keyed by source hash, served by Caddy
+    preview_build_cache_dir: Path = Path(__file__).resolve().parent.parent.parent / "data" / "build_cache"
+    preview_build_cache_entries: int = 20
+    preview_build_timeout_seconds: int = 300
+
+    # Resource limits for spawned CLI tasks and preview dev servers (0 = unlimited).
+    # Applied through a cgroup v2 child of ``cgroup_root`` when it is writable,
+    # otherwise best-effort via setrlimit/nice in the child process (open files and
+    # CPU only — memory is not limited without a cgroup).
+    resource_limits_enabled: bool = True
+    cgroup_root: Path = Path("/sys/fs/cgroup/casperbot")
+    task_memory_max_mb: int = 0
+    task_cpu_weight: int = 0  # cgroup cpu.weight, 1-10000 (100 = kernel default)
+    task_pids_max: int = 0
+    task_open_files_max: int = 0
+    preview_memory_max_mb: int = 0
+    preview_cpu_weight: int = 0
+    preview_pids_max: int = 0
+    preview_open_files_max: int = 0
+
+    # Tracing — spans for each stage of a chat turn, kept in memory and served
+    # from /api/traces; optionally appended as OTLP-style JSON lines to a file
+    tracing_enabled: bool = False
+    trace_buffer_size: int = 200  # recent traces kept in memory
+    trace_export_path: Path | None = None
+
+    # Prometheus scraping: /api/metrics also accepts this static bearer token,
+    # since scrapers can't log in for a JWT ("" = JWT only)
+    metrics_token: str = ""
 
     def get_cors_origins(self) -> list[str]:
         v = self.cors_origins.strip()
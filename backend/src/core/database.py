@@ -77,6 +77,8 @@ class Database:
         self._connection = await aiosqlite.connect(str(settings.database_path))
         self._connection.row_factory = aiosqlite.Row
         await self._connection.execute("PRAGMA journal_mode=WAL")
+        # Several workers may share the file — wait on locks instead of failing
+        await self._connection.execute("PRAGMA busy_timeout=5000")
         await self._connection.execute("PRAGMA foreign_keys=ON")
         await self._connection.executescript(SCHEMA_SQL)
         await self._connection.commit()
@@ -128,6 +130,17 @@ class Database:
         except Exception:
             pass
 
+        # Migration: add status column to messages for checkpointed replies
+        # complete = final, partial = streaming checkpoint, interrupted = backend
+        # died before the reply finished
+        try:
+            await self._connection.execute(
+                "ALTER TABLE messages ADD COLUMN status TEXT NOT NULL DEFAULT 'complete'"
+            )
+            await self._connection.commit()
+        except Exception:
+            pass  # Column already exists
+
         # Migration: create settings table for global app settings
         await self._connection.executescript("""
             CREATE TABLE IF NOT EXISTS settings (
@@ -187,6 +200,98 @@ class Database:
         """)
         await self._connection.commit()
 
+        # Migration: preview port reservations outlive the dev server — pid is
+        # set while it runs, last_used_at picks reservations to reclaim
+        for column in ("pid INTEGER DEFAULT NULL", "last_used_at REAL NOT NULL DEFAULT 0"):
+            try:
+                await self._connection.execute(f"ALTER TABLE previews ADD COLUMN {column}")
+                await self._connection.commit()
+            except Exception:
+                pass  # Column already exists
+
+        # Migration: one port reservation per preview service — monorepo
+        # previews run a dev server per subdirectory. The primary service
+        # keeps service = '', so existing reservations carry over
+        async with self._connection.execute("PRAGMA table_info(previews)") as cur:
+            preview_columns = {row["name"] for row in await cur.fetchall()}
+        if "service" not in preview_columns:
+            await self._connection.executescript("""
+                BEGIN;
+                CREATE TABLE previews_new (
+                    project_id    TEXT NOT NULL,
+                    service       TEXT NOT NULL DEFAULT '',
+                    port          INTEGER NOT NULL UNIQUE,
+                    framework     TEXT NOT NULL,
+                    start_cmd     TEXT NOT NULL,
+                    pid           INTEGER DEFAULT NULL,
+                    last_used_at  REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (project_id, service),
+                    FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
+                );
+                INSERT INTO previews_new (project_id, port, framework, start_cmd, pid, last_used_at)
+                    SELECT project_id, port, framework, start_cmd, pid, last_used_at FROM previews;
+                DROP TABLE previews;
+                ALTER TABLE previews_new RENAME TO previews;
+                COMMIT;
+            """)
+
+        # Migration: create process_groups table so orphaned subprocess trees
+        # can be found and reaped after a backend crash
+        await self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS process_groups (
+                pgid        INTEGER PRIMARY KEY,
+                kind        TEXT NOT NULL,
+                owner_id    TEXT NOT NULL,
+                command     TEXT NOT NULL DEFAULT '',
+                started_at  TEXT NOT NULL
+            );
+        """)
+        await self._connection.commit()
+
+        # Migration: record which worker spawned each process group, so one
+        # worker's reaper never kills another live worker's processes
+        try:
+            await self._connection.execute(
+                "ALTER TABLE process_groups ADD COLUMN worker_id TEXT NOT NULL DEFAULT ''"
+            )
+            await self._connection.commit()
+        except Exception:
+            pass  # Column already exists
+
+        # Migration: cross-worker task registry, event log and command queue
+        # (used by the "sqlite" task bus; workers heartbeat in every mode)
+        await self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS task_workers (
+                worker_id     TEXT PRIMARY KEY,
+                pid           INTEGER NOT NULL,
+                heartbeat_at  REAL NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS task_registry (
+                session_id    TEXT PRIMARY KEY,
+                project_id    TEXT NOT NULL,
+                owner_worker  TEXT NOT NULL,
+                status        TEXT NOT NULL,
+                started_at    TEXT NOT NULL,
+                completed_at  TEXT DEFAULT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS task_events (
+                session_id  TEXT NOT NULL,
+                seq         INTEGER NOT NULL,
+                event       TEXT NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            );
+
+            CREATE TABLE IF NOT EXISTS task_commands (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                worker_id   TEXT NOT NULL,
+                session_id  TEXT NOT NULL,
+                command     TEXT NOT NULL
+            );
+        """)
+        await self._connection.commit()
+
     async def disconnect(self) -> None:
         if self._connection:
             await self._connection.close()
@@ -26,6 +26,10 @@ class SessionBusyError(CasperBotError):
     status_code = 409
 
 
+class ToolOutputNotFoundError(CasperBotError):
+    status_code = 404
+
+
 class CredentialNotFoundError(CasperBotError):
     status_code = 404
 
@@ -78,6 +82,10 @@ class PreviewNotSupportedError(CasperBotError):
     status_code = 422
 
 
+class InvalidLogFilterError(CasperBotError):
+    status_code = 400
+
+
 def register_exception_handlers(app: FastAPI) -> None:
     @app.exception_handler(CasperBotError)
     async def casperbot_error_handler(
@@ -0,0 +1,188 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Deliberately tiny — no client library. Observations are a bisect plus a few
+integer increments, so recording from the task event loop costs next to
+nothing; all formatting happens when ``/api/metrics`` is scraped.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+from collections import deque
+from typing import Callable
+
+# Seconds — covers sub-10ms file reads up to multi-minute builds
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+RATE_BUCKETS = (1, 5, 10, 20, 40, 60, 80, 100, 150, 200)
+
+# Recent samples kept per label set for p50/p95
+_RESERVOIR_SIZE = 512
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time — nothing to update in hot paths."""
+
+    def __init__(
+        self, name: str, help: str, collect: Callable[[], dict[tuple[str, ...], float]],
+        labels: tuple[str, ...] = (),
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._collect = collect
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self._collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class _Series:
+    __slots__ = ("buckets", "count", "sum", "recent")
+
+    def __init__(self, n_buckets: int) -> None:
+        self.buckets = [0] * n_buckets
+        self.count = 0
+        self.sum = 0.0
+        self.recent: deque[float] = deque(maxlen=_RESERVOIR_SIZE)
+
+
+class Histogram:
+    """Cumulative-bucket histogram plus p50/p95 over recent samples.
+
+    Quantiles are rendered as a separate ``<name>_quantile`` gauge since the
+    Prometheus histogram type has no quantile lines of its own.
+    """
+
+    def __init__(
+        self, name: str, help: str, buckets: tuple[float, ...],
+        labels: tuple[str, ...] = (),
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._bounds = buckets
+        self._series: dict[tuple[str, ...], _Series] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = _Series(len(self._bounds))
+        index = bisect.bisect_left(self._bounds, value)
+        if index < len(series.buckets):
+            series.buckets[index] += 1
+        series.count += 1
+        series.sum += value
+        series.recent.append(value)
+
+    def quantiles(self, *label_values: str) -> dict[str, float] | None:
+        series = self._series.get(label_values)
+        if not series or not series.recent:
+            return None
+        ordered = sorted(series.recent)
+        return {
+            "p50": ordered[int(0.50 * (len(ordered) - 1))],
+            "p95": ordered[int(0.95 * (len(ordered) - 1))],
+        }
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        quantile_lines: list[str] = []
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self._bounds, series.buckets):
+                cumulative += count
+                le = _format_labels(self.labels, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labels, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {series.count}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+            for q, value in zip(("0.5", "0.95"), self.quantiles(*key).values()):
+                q_labels = _format_labels(self.labels, key, f'quantile="{q}"')
+                quantile_lines.append(f"{self.name}_quantile{q_labels} {_format_value(value)}")
+        if quantile_lines:
+            lines.append(
+                f"# HELP {self.name}_quantile {self.help} "
+                f"(p50/p95 of the last {_RESERVOIR_SIZE} samples)"
+            )
+            lines.append(f"# TYPE {self.name}_quantile gauge")
+            lines.extend(quantile_lines)
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(
+        self, name: str, help: str, buckets: tuple[float, ...] = DURATION_BUCKETS,
+        labels: tuple[str, ...] = (),
+    ) -> Histogram:
+        return self._register(Histogram(name, help, buckets, labels))
+
+    def gauge(
+        self, name: str, help: str, collect: Callable[[], dict[tuple[str, ...], float]],
+        labels: tuple[str, ...] = (),
+    ) -> Gauge:
+        """Register (or replace) a scrape-time gauge."""
+        metric = Gauge(name, help, collect, labels)
+        self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+
+metrics = MetricsRegistry()
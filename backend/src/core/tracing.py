@@ -0,0 +1,251 @@
+"""Lightweight tracing for the chat request lifecycle.
+
+Spans follow the OpenTelemetry data model (128-bit trace IDs, 64-bit span
+IDs, parent links, nanosecond timestamps, attributes, status) and export as
+OTLP/JSON, so a dump can be loaded into any OTel-aware viewer. Finished
+traces are kept in a bounded in-memory buffer served by ``/api/traces``;
+no collector is needed.
+
+The current span propagates through ``contextvars``, so it follows
+``asyncio.create_task`` and ``asyncio.gather`` automatically. With
+``settings.tracing_enabled`` off, every call returns a shared no-op span.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextvars import ContextVar, Token
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_SERVICE_NAME = "casperbot-backend"
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns",
+        "attributes", "error", "_tracer", "_token",
+    )
+
+    def __init__(
+        self, tracer: Tracer, name: str, parent: Span | None, attributes: dict,
+    ) -> None:
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes = attributes
+        self.error: str | None = None
+        self._token: Token | None = None
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def add(self, key: str, amount: float) -> None:
+        """Accumulate into a numeric attribute — for per-event costs too fine for spans."""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def record_error(self, error: BaseException | str) -> None:
+        self.error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self._tracer._finish(self)
+
+    # Context manager: makes the span current for the enclosed block
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None and self.error is None:
+            self.record_error(exc)
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+        self.end()
+
+    def to_dict(self) -> dict:
+        end_ns = self.end_ns or time.time_ns()
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_ns / 1e9,
+            "duration_ms": round((end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [
+                {"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()
+            ],
+            "status": (
+                {"code": 2, "message": self.error} if self.error else {"code": 1}
+            ),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    """Stand-in when tracing is disabled — every method is a no-op."""
+
+    __slots__ = ()
+    trace_id = span_id = None
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def add(self, key: str, amount: float) -> None:
+        pass
+
+    def record_error(self, error) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> _NoopSpan:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Tracer:
+    def __init__(self) -> None:
+        # trace_id → finished spans, oldest trace first
+        self._traces: OrderedDict[str, list[Span]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.tracing_enabled
+
+    def span(self, name: str, **attributes) -> Span | _NoopSpan:
+        """Span to use as a context manager; it becomes the current span inside.
+
+        Don't hold one open across ``yield`` in an async generator — the
+        consumer would inherit it as its current span. Use
+        :meth:`start_span` there instead.
+        """
+        if not settings.tracing_enabled:
+            return _NOOP
+        return Span(self, name, _current_span.get(), attributes)
+
+    def start_span(self, name: str, **attributes) -> Span | _NoopSpan:
+        """Child of the current span that is *not* made current; call ``end()``."""
+        return self.span(name, **attributes)
+
+    def current(self) -> Span | _NoopSpan:
+        return _current_span.get() or _NOOP
+
+    # -- Reading --
+
+    def recent(self, limit: int = 50) -> list[dict]:
+        """Summaries of the most recent traces, newest first."""
+        result = []
+        for trace_id in reversed(self._traces):
+            spans = self._traces[trace_id]
+            root = next((s for s in spans if s.parent_id is None), spans[0])
+            start = min(s.start_ns for s in spans)
+            end = max(s.end_ns or s.start_ns for s in spans)
+            result.append({
+                "trace_id": trace_id,
+                "root": root.name,
+                "session_id": root.attributes.get("session_id"),
+                "start_time": start / 1e9,
+                "duration_ms": round((end - start) / 1e6, 3),
+                "span_count": len(spans),
+                "errors": sum(1 for s in spans if s.error),
+            })
+            if len(result) >= limit:
+                break
+        return result
+
+    def get(self, trace_id: str) -> list[dict] | None:
+        spans = self._traces.get(trace_id)
+        if spans is None:
+            return None
+        return [s.to_dict() for s in sorted(spans, key=lambda s: s.start_ns)]
+
+    def export(self, trace_id: str | None = None) -> dict:
+        """OTLP/JSON ``ExportTraceServiceRequest`` for one or all buffered traces."""
+        if trace_id is not None:
+            spans = list(self._traces.get(trace_id, []))
+        else:
+            spans = [s for trace in self._traces.values() for s in trace]
+        return _otlp_envelope(spans)
+
+    # -- Internal --
+
+    def _finish(self, span: Span) -> None:
+        trace = self._traces.get(span.trace_id)
+        if trace is None:
+            trace = self._traces[span.trace_id] = []
+            while len(self._traces) > settings.trace_buffer_size:
+                self._traces.popitem(last=False)
+        trace.append(span)
+        if settings.trace_export_path is not None:
+            self._append_to_file(span)
+
+    @staticmethod
+    def _append_to_file(span: Span) -> None:
+        try:
+            with open(settings.trace_export_path, "a") as f:
+                f.write(json.dumps(_otlp_envelope([span]), default=str) + "\n")
+        except OSError:
+            logger.warning("Failed to write trace to %s", settings.trace_export_path, exc_info=True)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_envelope(spans: list[Span]) -> dict:
+    return {
+        "resourceSpans": [{
+            "resource": {
+                "attributes": [{"key": "service.name", "value": {"stringValue": _SERVICE_NAME}}],
+            },
+            "scopeSpans": [{
+                "scope": {"name": "casperbot"},
+                "spans": [s.to_otlp() for s in spans],
+            }],
+        }],
+    }
+
+
+tracer = Tracer()
@@ -0,0 +1,42 @@
+"""Identity and liveness of backend worker processes.
+
+Each uvicorn worker gets a unique ID and heartbeats into ``task_workers``
+(see ``TaskBus``). Anything that must distinguish "mine", "another live
+worker's" and "left behind by a dead worker" keys off these.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import time
+import uuid
+
+from .config import settings
+from .database import db
+
+_worker_id: str | None = None
+_worker_pid: int | None = None
+
+
+def worker_id() -> str:
+    """Stable for the life of this process; a forked child gets a new one."""
+    global _worker_id, _worker_pid
+    if _worker_pid != os.getpid():
+        _worker_pid = os.getpid()
+        _worker_id = f"{socket.gethostname()}:{_worker_pid}:{uuid.uuid4().hex[:6]}"
+    return _worker_id
+
+
+def heartbeat_cutoff() -> float:
+    return time.time() - 3 * settings.worker_heartbeat_seconds
+
+
+async def live_workers() -> set[str]:
+    """IDs of workers that have heartbeated recently (always includes this one)."""
+    async with db.conn.execute(
+        "SELECT worker_id FROM task_workers WHERE heartbeat_at > ?", (heartbeat_cutoff(),)
+    ) as cur:
+        alive = {row["worker_id"] for row in await cur.fetchall()}
+    alive.add(worker_id())
+    return alive
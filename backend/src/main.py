@@ -104,6 +104,7 @@ async def lifespan(app: FastAPI):
     from .services.sessions.session_service import SessionService
     from .services.projects.project_service import ProjectService
     from .services.messages.message_service import MessageService
+    from .services.messages.tool_output_store import ToolOutputStore
     from .services.claude.process_manager import ProcessManager
     from .services.tasks.task_manager import TaskManager
     from .services.credentials.credential_service import CredentialService
@@ -111,33 +112,50 @@ async def lifespan(app: FastAPI):
     from .services.mcps.mcp_service import McpService
     from .services.claude_md.claude_md_service import ClaudeMdService
     from .services.github.github_service import GitHubService
+    from .services.preview.build_cache import BuildCache
     from .services.preview.caddy_client import CaddyClient
+    from .services.preview.install_cache import InstallCache
+    from .services.preview.port_allocator import PortAllocator
     from .services.preview.preview_service import PreviewService
+    from .services.processes.process_reaper import ProcessReaper
+    from .services.tasks.task_bus import create_task_bus
 
     app.state.session_service = SessionService()
     app.state.project_service = ProjectService()
     app.state.message_service = MessageService()
+    app.state.tool_output_store = ToolOutputStore()
     app.state.credential_service = CredentialService()
     app.state.command_service = CommandService()
     app.state.mcp_service = McpService()
     app.state.claude_md_service = ClaudeMdService()
     app.state.github_service = GitHubService()
+    app.state.process_reaper = ProcessReaper()
     app.state.process_manager = ProcessManager(
-        app.state.session_service, app.state.credential_service
+        app.state.session_service,
+        app.state.credential_service,
+        app.state.process_reaper,
+    )
+    caddy = CaddyClient(
+        admin_url=settings.preview_caddy_admin_url,
+        listen_port=settings.preview_caddy_listen_port,
+        domain=settings.preview_domain,
+    )
+    app.state.preview_service = PreviewService(
+        caddy, app.state.process_reaper, InstallCache(), BuildCache(), PortAllocator(),
     )
     app.state.task_manager = TaskManager(
         process_manager=app.state.process_manager,
         message_service=app.state.message_service,
         session_service=app.state.session_service,
+        task_bus=create_task_bus(),
+        tool_outputs=app.state.tool_output_store,
+        preview_service=app.state.preview_service,
     )
     await app.state.task_manager.startup()
+    # After the task manager: reattached detached runs must be registered
+    # as live before the first reaping pass
+    await app.state.process_reaper.startup()
 
-    caddy = CaddyClient(
-        admin_url=settings.preview_caddy_admin_url,
-        listen_port=settings.preview_caddy_listen_port,
-        domain=settings.preview_domain,
-    )
-    app.state.preview_service = PreviewService(caddy)
     await app.state.preview_service.startup()
 
     yield
@@ -146,6 +164,7 @@ async def lifespan(app: FastAPI):
     await app.state.preview_service.shutdown()
     await app.state.task_manager.shutdown()
     await app.state.process_manager.cleanup_all()
+    await app.state.process_reaper.shutdown()
     await db.disconnect()
 
 
@@ -170,10 +189,12 @@ register_exception_handlers(app)
 from .api.health.router import router as health_router
 from .api.auth.router import router as auth_router
 from .api.github.router import public_router as github_public_router
+from .api.metrics.router import router as metrics_router
 
 app.include_router(health_router)
 app.include_router(auth_router)
 app.include_router(github_public_router)
+app.include_router(metrics_router)  # JWT or the static metrics_token, for scrapers
 
 # Routers — protected (require JWT)
 from .api.projects.router import router as projects_router
@@ -191,6 +212,7 @@ from .api.project_settings.router import router as project_settings_router
 from .api.settings.router import router as settings_router
 from .api.tasks.router import router as tasks_router
 from .api.preview.router import router as preview_router
+from .api.traces.router import router as traces_router
 
 _auth = [Depends(get_current_user)]
 app.include_router(projects_router, dependencies=_auth)
@@ -208,3 +230,4 @@ app.include_router(project_settings_router, dependencies=_auth)
 app.include_router(settings_router, dependencies=_auth)
 app.include_router(tasks_router, dependencies=_auth)
 app.include_router(preview_router, dependencies=_auth)
+app.include_router(traces_router, dependencies=_auth)
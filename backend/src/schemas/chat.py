@@ -13,6 +13,7 @@ class ChatMessageType(str, Enum):
     PING = "ping"
     SUBSCRIBE = "subscribe"
     UNSUBSCRIBE = "unsubscribe"
+    PREPARE = "prepare"
 
 
 class SendMessagePayload(BaseModel):
@@ -24,6 +25,14 @@ class SendMessagePayload(BaseModel):
     max_budget_usd: float | None = None
 
 
+class PreparePayload(BaseModel):
+    """Sent when the composer gains focus so the next send can skip pre-flight."""
+
+    type: Literal["prepare"] = "prepare"
+    project_id: str
+    session_id: str | None = None
+
+
 class CancelPayload(BaseModel):
     type: Literal["cancel"] = "cancel"
     session_id: str
@@ -11,8 +11,24 @@ class MessageInfo(BaseModel):
     usage: dict | None
     cost_usd: float | None
     created_at: str
+    status: str = "complete"  # complete | partial (still streaming) | interrupted
 
 
 class MessageListResponse(BaseModel):
     messages: list[MessageInfo]
     total: int
+
+
+class ToolProfileEntry(BaseModel):
+    tool_name: str
+    count: int
+    error_count: int
+    total_ms: float
+    max_ms: float
+    avg_ms: float
+    share: float  # fraction of all tool time in the session
+
+
+class ToolProfileResponse(BaseModel):
+    session_id: str
+    tools: list[ToolProfileEntry]
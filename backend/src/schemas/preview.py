@@ -1,23 +1,63 @@
 from pydantic import BaseModel
 
 
+class PreviewServiceDetection(BaseModel):
+    subdir: str | None = None  # None for a project run from its root
+    framework: str | None = None
+    needs_install: bool = False
+    package_manager: str | None = None
+    buildable: bool = False  # can be served as a static build (production mode)
+
+
 class PreviewDetection(BaseModel):
     supported: bool
-    framework: str | None = None
+    framework: str | None = None  # of the primary service
     needs_install: bool = False
     subdir: str | None = None
+    package_manager: str | None = None
+    services: list[PreviewServiceDetection] = []  # every service, primary first
+
+
+class PreviewServiceInfo(BaseModel):
+    name: str  # subdirectory, or "" for a project run from its root
+    framework: str | None
+    port: int | None  # None for a static site served by Caddy
+    status: str  # "starting", "ready", "stopped", "error"
+    url: str | None = None
+    error: str | None = None
+    ready_ms: int | None = None
+    frozen: bool = False
+    agent_paused: bool = False  # frozen while an agent turn edits the project
+    build_cache: str | None = None  # static sites: "hit" or "miss"
+    build_ms: int | None = None
 
 
 class PreviewInfo(BaseModel):
     project_id: str
-    port: int
+    mode: str = "dev"  # or "production": static builds served by Caddy where possible
+    port: int | None  # None when the primary service is a static site
     framework: str | None
-    status: str  # "running", "stopped", "error"
+    status: str  # "starting", "ready", "stopped", "error"
     url: str | None = None
     started_at: str | None = None
     error: str | None = None
+    ready_ms: int | None = None  # spawn → serving, once ready
+    frozen: bool = False  # idle, paused until its next request
+    idle_seconds: int | None = None  # since the last proxied traffic
+    resources: dict | None = None  # cgroup accounting while the server runs
+    services: list[PreviewServiceInfo] = []  # one per service; the fields above are the primary's
+
+
+class PreviewLogEntry(BaseModel):
+    seq: int
+    ts: float
+    stream: str  # "install" | "build" | "stdout" (dev server stdout and stderr)
+    line: str
+    level: str  # inferred: "info" | "warn" | "error"
 
 
 class PreviewLogsResponse(BaseModel):
-    logs: list[str]
-    total_lines: int
+    entries: list[PreviewLogEntry]
+    next_seq: int  # pass back as ?since= to continue
+    dropped: int  # lines gone from both the ring and the archive file
+    running: bool
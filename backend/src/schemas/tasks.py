@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 
+from .messages import ToolProfileEntry
+
 
 class TaskInfo(BaseModel):
     session_id: str
@@ -10,8 +12,37 @@ class TaskInfo(BaseModel):
     event_count: int
     subscriber_count: int
     elapsed_seconds: float
+    resources: dict | None = None  # cgroup accounting, once the CLI has exited
+    idle_seconds: float | None = None  # seconds since the CLI last printed (while running)
+    timeout_remaining_seconds: float | None = None
+    timeout_reason: str | None = None  # "timeout" | "idle_timeout"
+    send_to_spawn_ms: float | None = None  # send received → CLI process spawned
+    time_to_first_token_ms: float | None = None  # send received → first streamed content
+    tokens_per_second: float | None = None  # output tokens over first token → completion
+    prepared: bool = False  # whether a "prepare" warm-up preceded the send
+    worker: str | None = None  # ID of the backend worker that owns the task
 
 
 class TaskListResponse(BaseModel):
     tasks: list[TaskInfo]
     total: int
+
+
+class TaskToolsResponse(BaseModel):
+    session_id: str
+    calls: list[dict]  # toolId, toolName, startedAt, completedAt, durationMs / elapsedMs
+    summary: list[ToolProfileEntry]
+
+
+class TaskLogEntry(BaseModel):
+    seq: int
+    ts: float
+    stream: str  # "stderr" | "stdout" (non-JSON lines only)
+    line: str
+
+
+class TaskLogsResponse(BaseModel):
+    entries: list[TaskLogEntry]
+    next_seq: int  # pass back as ?since= to continue
+    dropped: int  # lines evicted from the ring before they could be read
+    running: bool
@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+
+
+class TraceSummary(BaseModel):
+    trace_id: str
+    root: str  # name of the root span, e.g. "chat.send_message"
+    session_id: str | None = None
+    start_time: float  # unix seconds
+    duration_ms: float
+    span_count: int
+    errors: int
+
+
+class TraceListResponse(BaseModel):
+    enabled: bool  # settings.tracing_enabled — nothing is recorded while off
+    traces: list[TraceSummary]
+
+
+class SpanInfo(BaseModel):
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None = None
+    name: str
+    start_time: float
+    duration_ms: float
+    attributes: dict
+    error: str | None = None
+
+
+class TraceResponse(BaseModel):
+    trace_id: str
+    spans: list[SpanInfo]
@@ -0,0 +1,198 @@
+"""Framing and byte accounting for chat events.
+
+The encoding is negotiated per connection through the WebSocket subprotocol
+list offered by the client:
+
+- ``casperbot.json`` (or no subprotocol) — one JSON text frame per event
+- ``casperbot.msgpack`` — one MessagePack binary frame per event
+
+Client → server messages stay JSON text in both modes; they're tiny. The web
+frontend stays on JSON: once deflated, MessagePack frames are only ~1%
+smaller, and ``JSON.parse`` is native (``benchmarks/ws_bytes.py``).
+MessagePack mostly saves decode time for non-browser clients.
+
+Compression happens below this layer: uvicorn negotiates permessage-deflate
+with every browser and keeps the compression context across frames, so the
+session IDs, event types and keys repeated in each delta cost a few bytes
+after the first. Byte counts here are frame payloads *before* that
+compression — what we hand to the socket, not what crosses the wire.
+
+For clients whose proxies break long-lived WebSockets, :class:`EventStream`
+carries the same events as Server-Sent Events (``/api/tasks/{id}/events``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import time
+
+from starlette.websockets import WebSocket
+
+from ...core.metrics import BYTES_BUCKETS, metrics
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover — optional, clients fall back to JSON
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+JSON = "casperbot.json"
+MSGPACK = "casperbot.msgpack"
+
+_SENT_BYTES = metrics.counter(
+    "casperbot_ws_sent_bytes_total",
+    "Chat WebSocket frame payload bytes sent, before permessage-deflate",
+    labels=("encoding",),
+)
+_SENT_FRAMES = metrics.counter(
+    "casperbot_ws_sent_frames_total",
+    "Chat WebSocket frames sent",
+    labels=("encoding",),
+)
+_CONNECTION_BYTES = metrics.histogram(
+    "casperbot_ws_connection_sent_bytes",
+    "Payload bytes sent over a chat WebSocket during its lifetime",
+    buckets=BYTES_BUCKETS + (16777216, 67108864),
+    labels=("encoding",),
+)
+
+_SSE_BYTES = metrics.counter(
+    "casperbot_sse_sent_bytes_total",
+    "Chat Server-Sent Events bytes sent (event streams for tasks)",
+)
+_SSE_EVENTS = metrics.counter(
+    "casperbot_sse_sent_events_total",
+    "Chat Server-Sent Events sent",
+)
+
+_connection_ids = itertools.count(1)
+
+
+class ConnectionStats:
+    __slots__ = ("id", "encoding", "bytes_sent", "frames_sent", "opened_at")
+
+    def __init__(self, encoding: str) -> None:
+        self.id = next(_connection_ids)
+        self.encoding = encoding
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.opened_at = time.monotonic()
+
+
+# Open chat sockets → their stats. Per-connection totals go to the close log
+# and the histogram, not to a per-connection series
+_connections: dict[WebSocket, ConnectionStats] = {}
+
+
+def negotiate(websocket: WebSocket) -> str | None:
+    """Pick this connection's encoding from the offered subprotocols.
+
+    Returns the subprotocol to pass to ``websocket.accept()`` (None when the
+    client offered none of ours) and starts accounting for the connection.
+    """
+    offered = websocket.scope.get("subprotocols") or []
+    if MSGPACK in offered and msgpack is not None:
+        chosen = MSGPACK
+    elif JSON in offered:
+        chosen = JSON
+    else:
+        chosen = None
+    _connections[websocket] = ConnectionStats(chosen or JSON)
+    return chosen
+
+
+def close(websocket: WebSocket) -> None:
+    """Stop accounting for a connection and record its totals."""
+    stats = _connections.pop(websocket, None)
+    if stats is None:
+        return
+    _CONNECTION_BYTES.observe(stats.bytes_sent, stats.encoding)
+    logger.info(
+        "Chat WebSocket %d closed: %d frames, %d bytes (%s) in %.0fs",
+        stats.id, stats.frames_sent, stats.bytes_sent, stats.encoding,
+        time.monotonic() - stats.opened_at,
+    )
+
+
+class EncodedEvent:
+    """An event with its frames cached, so broadcasting encodes it once per encoding.
+
+    ``seq`` is the event's 1-based position in its task's replay buffer, or
+    None for events that aren't buffered (e.g. ``session_renamed``).
+    """
+
+    __slots__ = ("event", "seq", "_frames")
+
+    def __init__(self, event: dict, seq: int | None = None) -> None:
+        self.event = event
+        self.seq = seq
+        self._frames: dict[str, str | bytes] = {}
+
+    def frame(self, encoding: str) -> str | bytes:
+        frame = self._frames.get(encoding)
+        if frame is None:
+            if encoding == MSGPACK:
+                frame = msgpack.packb(self.event, use_bin_type=True)
+            else:
+                frame = json.dumps(self.event, separators=(",", ":"), ensure_ascii=False)
+            self._frames[encoding] = frame
+        return frame
+
+
+class EventStream:
+    """A task subscriber that feeds a Server-Sent Events response.
+
+    It sits in ``BackgroundTask.subscribers`` beside WebSockets and queues
+    what is broadcast. Event IDs are ``<task key>.<seq>``, so a client
+    reconnecting with ``Last-Event-ID`` gets only the buffered events it
+    missed (see ``TaskManager.follow``).
+    """
+
+    def __init__(self) -> None:
+        self.key = ""  # identifies the task (turn) the IDs refer to
+        self._queue: asyncio.Queue[EncodedEvent] = asyncio.Queue()
+
+    def push(self, event: EncodedEvent) -> None:
+        self._queue.put_nowait(event)
+
+    async def next(self, timeout: float) -> str | None:
+        """The next event formatted as an SSE message, or None after *timeout*."""
+        try:
+            event = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        data = event.frame(JSON)
+        if event.seq is None:
+            message = f"data: {data}\n\n"
+        else:
+            message = f"id: {self.key}.{event.seq}\ndata: {data}\n\n"
+        _SSE_BYTES.inc(amount=len(message.encode()))
+        _SSE_EVENTS.inc()
+        return message
+
+
+async def send_event(websocket: WebSocket | EventStream, event: dict | EncodedEvent) -> None:
+    """Send one event in the connection's negotiated encoding."""
+    if not isinstance(event, EncodedEvent):
+        event = EncodedEvent(event)
+    if isinstance(websocket, EventStream):
+        websocket.push(event)
+        return
+    stats = _connections.get(websocket)
+    encoding = stats.encoding if stats else JSON
+    frame = event.frame(encoding)
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+        size = len(frame)
+    else:
+        await websocket.send_text(frame)
+        size = len(frame.encode()) if not frame.isascii() else len(frame)
+    _SENT_BYTES.inc(encoding, amount=size)
+    _SENT_FRAMES.inc(encoding)
+    if stats:
+        stats.bytes_sent += size
+        stats.frames_sent += 1
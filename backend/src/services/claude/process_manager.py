@@ -2,28 +2,61 @@ import asyncio
 import logging
 import os
 import shutil
+import sys
+import time
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import AsyncIterator
 
 from ...core.config import settings
+from ...core.tracing import tracer
+from ...core.worker import worker_id
 from ..credentials.credential_service import CredentialService
+from ..processes.log_buffer import LogRingBuffer
+from ..processes.process_groups import terminate_group
+from ..processes.process_reaper import ProcessReaper
+from ..processes.resource_limits import ResourceSandbox, task_limits
 from ..sessions.session_service import SessionService
 from . import command_translator, stream_parser
+from .spool import SUPERVISOR_SCRIPT, SpooledProcess, SpoolPaths, list_spools
 from .stream_parser import ParsedEvent
 from .system_context import CASPERBOT_SYSTEM_CONTEXT
 
 logger = logging.getLogger(__name__)
 
+# One stream-json line carries a whole tool result, so a large file read or
+# test log easily passes asyncio's 64 KiB default line limit
+_STREAM_LIMIT = 64 * 1024 * 1024
+
 
 @dataclass
 class RunningProcess:
     session_id: str
     project_id: str
-    process: asyncio.subprocess.Process
+    process: asyncio.subprocess.Process | SpooledProcess
     started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
     cancelled: bool = False
+    sandbox: ResourceSandbox | None = None
+    # Watchdog state, in event-loop time (monotonic seconds)
+    last_output_at: float = 0.0
+    deadline: float = float("inf")
+    timeout_reason: str | None = None  # "timeout" | "idle_timeout" once expired
+    watchdog: asyncio.TimerHandle | None = field(default=None, repr=False)
+    kill_task: asyncio.Task | None = field(default=None, repr=False)
+
+
+@dataclass
+class LaunchProfile:
+    """Per-project launch inputs resolved before spawning the CLI."""
+
+    approvals_enabled: bool
+    env: dict[str, str]
+    binary_path: str | None
+    created_at: float = field(default_factory=time.monotonic)
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.created_at > settings.launch_profile_ttl_seconds
 
 
 class ProcessManager:
@@ -33,11 +66,20 @@ class ProcessManager:
         self,
         session_service: SessionService,
         credential_service: CredentialService,
+        process_reaper: ProcessReaper,
     ) -> None:
         self._processes: dict[str, RunningProcess] = {}
+        # Diagnostic output per session (stderr + non-JSON stdout). Outlives the
+        # process so it can be inspected after a failure; TaskManager drops it
+        # together with the task buffer.
+        self._logs: dict[str, LogRingBuffer] = {}
+        self._launch_profiles: dict[str, LaunchProfile] = {}  # project_id → profile
         self._lock = asyncio.Lock()
         self._session_service = session_service
         self._credential_service = credential_service
+        self._process_reaper = process_reaper
+        # Set on shutdown in detached mode: stop reading, leave CLIs running
+        self._detaching = False
 
     @property
     def active_count(self) -> int:
@@ -46,6 +88,93 @@ class ProcessManager:
     def is_session_busy(self, session_id: str) -> bool:
         return session_id in self._processes
 
+    def get_log(self, session_id: str) -> LogRingBuffer | None:
+        return self._logs.get(session_id)
+
+    def drop_log(self, session_id: str) -> None:
+        self._logs.pop(session_id, None)
+
+    def get_timing(self, session_id: str) -> dict | None:
+        """Watchdog timing for a running process, for task status reporting."""
+        running = self._processes.get(session_id)
+        if not running:
+            return None
+        now = asyncio.get_running_loop().time()
+        remaining = running.deadline - now
+        return {
+            "idle_seconds": round(now - running.last_output_at, 1),
+            "timeout_remaining_seconds": (
+                round(remaining, 1) if remaining != float("inf") else None
+            ),
+        }
+
+    # -- Launch profiles --
+
+    async def prepare_launch(self, project_id: str) -> LaunchProfile:
+        """Precompute a project's launch profile ahead of the next send.
+
+        Called speculatively when a chat composer gains focus so the actual
+        ``run_prompt`` can skip the settings/credential lookups. A profile is
+        consumed by one run and expires after ``launch_profile_ttl_seconds``.
+
+        The CLI itself can't be pre-spawned: ``claude -p`` takes the prompt
+        in argv, so there is nothing to warm until the message arrives.
+        """
+        profile = await self._build_launch_profile(project_id)
+        self._launch_profiles[project_id] = profile
+        return profile
+
+    async def _build_launch_profile(self, project_id: str) -> LaunchProfile:
+        """Resolve approvals, the CLI environment and the binary path for a project."""
+        # Resolve effective approvals: project override → global default → False
+        approvals_enabled = False
+        try:
+            from ..project_settings.project_settings_service import ProjectSettingsService
+            ps_svc = ProjectSettingsService()
+            approvals_enabled = await ps_svc.resolve_approvals(project_id)
+        except Exception:
+            logger.debug("Failed to check approvals setting, defaulting to off")
+
+        # Build a clean env — unset CLAUDECODE to avoid nesting detection,
+        # and strip ANTHROPIC_API_KEY so the CLI uses the Claude Code
+        # subscription instead of the user's personal API key.
+        _cli_blocked_keys = {"CLAUDECODE", "ANTHROPIC_API_KEY"}
+        env = {k: v for k, v in os.environ.items() if k not in _cli_blocked_keys}
+
+        # Inject stored credentials as environment variables (excluding
+        # ANTHROPIC_API_KEY — that key is only used server-side for
+        # title generation, never passed to the CLI).
+        # Also respect per-project credential exclusions.
+        try:
+            creds = await self._credential_service.get_decrypted_env_map()
+            # Load per-project exclusions
+            excluded: set[str] = set()
+            try:
+                from ..project_settings.project_settings_service import ProjectSettingsService
+                excluded = set(await ProjectSettingsService().list_excluded_credentials(project_id))
+            except Exception:
+                logger.debug("Failed to load credential exclusions", exc_info=True)
+            for var, val in creds.items():
+                if var != "ANTHROPIC_API_KEY" and var not in excluded:
+                    env[var] = val
+        except Exception:
+            logger.warning("Failed to load credentials for injection", exc_info=True)
+
+        # Inject project-scoped env vars (override global on conflict)
+        try:
+            from ..project_settings.project_settings_service import ProjectSettingsService
+            project_env = await ProjectSettingsService().get_decrypted_env_map(project_id)
+            for var, val in project_env.items():
+                env[var] = val
+        except Exception:
+            logger.debug("Failed to load project env vars", exc_info=True)
+
+        return LaunchProfile(
+            approvals_enabled=approvals_enabled,
+            env=env,
+            binary_path=shutil.which(settings.claude_binary),
+        )
+
     async def run_prompt(
         self,
         session_id: str,
@@ -56,19 +185,23 @@ class ProcessManager:
         is_continuation: bool = False,
         model: str | None = None,
         max_budget_usd: float | None = None,
+        spool_meta: dict | None = None,
     ) -> AsyncIterator[ParsedEvent]:
-        """Spawn a ``claude -p`` process and yield parsed stream events."""
+        """Spawn a ``claude -p`` process and yield parsed stream events.
+
+        ``spool_meta`` is stored alongside a detached run's spool so the
+        caller can pick the run back up after a restart (see :meth:`reattach`).
+        """
 
         prompt = command_translator.translate(message)
 
-        # Resolve effective approvals: project override → global default → False
-        approvals_enabled = False
-        try:
-            from ..project_settings.project_settings_service import ProjectSettingsService
-            ps_svc = ProjectSettingsService()
-            approvals_enabled = await ps_svc.resolve_approvals(project_id)
-        except Exception:
-            logger.debug("Failed to check approvals setting, defaulting to off")
+        # Reuse the profile precomputed by prepare_launch() when the composer
+        # was focused; otherwise resolve approvals/env/binary now
+        profile = self._launch_profiles.pop(project_id, None)
+        if profile is None or profile.is_stale():
+            with tracer.span("cli.launch_profile", project_id=project_id):
+                profile = await self._build_launch_profile(project_id)
+        approvals_enabled = profile.approvals_enabled
 
         cmd = self._build_command(
             session_id=session_id,
@@ -82,8 +215,7 @@ class ProcessManager:
         logger.info("Running CLI command for session %s: %s", session_id, " ".join(cmd))
 
         # Pre-flight: verify the binary exists
-        binary_path = shutil.which(settings.claude_binary)
-        if binary_path is None:
+        if profile.binary_path is None:
             logger.error("Claude CLI binary '%s' not found in PATH", settings.claude_binary)
             yield ParsedEvent(
                 type="error",
@@ -107,54 +239,109 @@ class ProcessManager:
             )
             return
 
-        # Build a clean env — unset CLAUDECODE to avoid nesting detection,
-        # and strip ANTHROPIC_API_KEY so the CLI uses the Claude Code
-        # subscription instead of the user's personal API key.
-        _cli_blocked_keys = {"CLAUDECODE", "ANTHROPIC_API_KEY"}
-        env = {k: v for k, v in os.environ.items() if k not in _cli_blocked_keys}
+        env = dict(profile.env)
 
-        # Inject stored credentials as environment variables (excluding
-        # ANTHROPIC_API_KEY — that key is only used server-side for
-        # title generation, never passed to the CLI).
-        # Also respect per-project credential exclusions.
-        try:
-            creds = await self._credential_service.get_decrypted_env_map()
-            # Load per-project exclusions
-            excluded: set[str] = set()
-            try:
-                from ..project_settings.project_settings_service import ProjectSettingsService
-                excluded = set(await ProjectSettingsService().list_excluded_credentials(project_id))
-            except Exception:
-                logger.debug("Failed to load credential exclusions", exc_info=True)
-            for var, val in creds.items():
-                if var != "ANTHROPIC_API_KEY" and var not in excluded:
-                    env[var] = val
-        except Exception:
-            logger.warning("Failed to load credentials for injection", exc_info=True)
+        log = LogRingBuffer()
+        self._logs[session_id] = log
 
-        # Inject project-scoped env vars (override global on conflict)
+        # Run the CLI — if resume fails silently, retry as a new session
         try:
-            from ..project_settings.project_settings_service import ProjectSettingsService
-            project_env = await ProjectSettingsService().get_decrypted_env_map(project_id)
-            for var, val in project_env.items():
-                env[var] = val
-        except Exception:
-            logger.debug("Failed to load project env vars", exc_info=True)
+            async for event in self._run_cli(
+                cmd=cmd,
+                session_id=session_id,
+                project_id=project_id,
+                project_path=project_path,
+                env=env,
+                is_continuation=is_continuation,
+                prompt=prompt,
+                model=model,
+                max_budget_usd=max_budget_usd,
+                approvals_enabled=approvals_enabled,
+                spool_meta=spool_meta,
+            ):
+                yield event
+        finally:
+            log.close()
+
+    # -- Detached runs --
+
+    def list_detached(self) -> list[dict]:
+        """Spooled runs left by a previous backend process, ready to reattach."""
+        return [m for m in list_spools() if m["session_id"] not in self._processes]
+
+    async def reattach(self, meta: dict) -> AsyncIterator[ParsedEvent]:
+        """Resume streaming a detached run from the start of its spool."""
+        session_id = meta["session_id"]
+        paths = SpoolPaths.for_session(session_id)
+        paths.write_meta({**meta, "worker_id": worker_id()})
+        process = SpooledProcess(paths, meta["pid"])
+        log = LogRingBuffer()
+        self._logs[session_id] = log
+        logger.info(
+            "Reattaching to detached CLI run for session %s (supervisor pid %d)",
+            session_id, meta["pid"],
+        )
+        try:
+            async for event in self._run_cli(
+                cmd=[meta.get("command", settings.claude_binary)],
+                session_id=session_id,
+                project_id=meta["project_id"],
+                project_path=Path(meta["project_path"]),
+                env={},
+                is_continuation=False,
+                prompt="",
+                model=None,
+                max_budget_usd=None,
+                attach=process,
+                started_at=datetime.fromisoformat(meta["started_at"]),
+            ):
+                yield event
+        finally:
+            log.close()
 
-        # Run the CLI — if resume fails silently, retry as a new session
-        async for event in self._run_cli(
-            cmd=cmd,
-            session_id=session_id,
-            project_id=project_id,
-            project_path=project_path,
+    def discard_spool(self, session_id: str) -> None:
+        """Delete a finished run's spool once its output has been persisted."""
+        if not self._detaching:
+            SpoolPaths.for_session(session_id).remove()
+
+    def detach_all(self) -> None:
+        """Leave detached CLI runs running when the backend shuts down."""
+        self._detaching = True
+
+    async def _spawn_detached(
+        self,
+        cmd: list[str],
+        session_id: str,
+        project_id: str,
+        project_path: Path,
+        env: dict[str, str],
+        sandbox: ResourceSandbox,
+        spool_meta: dict | None,
+    ) -> SpooledProcess:
+        """Start the CLI under the spool supervisor in its own session."""
+        paths = SpoolPaths.for_session(session_id)
+        paths.reset()
+        supervisor = await asyncio.create_subprocess_exec(
+            sys.executable, str(SUPERVISOR_SCRIPT), str(paths.prefix), *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=str(project_path),
             env=env,
-            is_continuation=is_continuation,
-            prompt=prompt,
-            model=model,
-            max_budget_usd=max_budget_usd,
-            approvals_enabled=approvals_enabled,
-        ):
-            yield event
+            preexec_fn=sandbox.preexec_fn,
+            start_new_session=True,
+        )
+        paths.write_meta({
+            **(spool_meta or {}),
+            "session_id": session_id,
+            "project_id": project_id,
+            "project_path": str(project_path),
+            "command": cmd[0],
+            "pid": supervisor.pid,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "worker_id": worker_id(),
+        })
+        return SpooledProcess(paths, supervisor.pid, supervisor)
 
     async def _run_cli(
         self,
@@ -168,88 +355,159 @@ class ProcessManager:
         model: str | None,
         max_budget_usd: float | None,
         approvals_enabled: bool = False,
+        spool_meta: dict | None = None,
+        attach: SpooledProcess | None = None,
+        started_at: datetime | None = None,
     ) -> AsyncIterator[ParsedEvent]:
         """Execute the CLI subprocess and stream events.
 
         If a ``--resume`` attempt fails with no output (stale session),
         automatically retries as a brand-new ``--session-id`` invocation.
+        With ``attach``, streams an already-running detached run instead of
+        spawning one; ``started_at`` is then when that run was spawned, and
+        the total timeout counts from it.
         """
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdin=asyncio.subprocess.DEVNULL,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=str(project_path),
-            env=env,
-        )
-
+        sandbox = ResourceSandbox(f"task-{session_id}", task_limits())
+        detached = attach is not None or settings.detached_tasks
+        if attach is not None:
+            sandbox.adopt()
+            process = attach
+        else:
+            sandbox.setup()
+            try:
+                with tracer.span("cli.spawn", session_id=session_id, resume=is_continuation):
+                    if settings.detached_tasks:
+                        process = await self._spawn_detached(
+                            cmd, session_id, project_id, project_path, env, sandbox,
+                            spool_meta,
+                        )
+                    else:
+                        process = await asyncio.create_subprocess_exec(
+                            *cmd,
+                            stdin=asyncio.subprocess.DEVNULL,
+                            stdout=asyncio.subprocess.PIPE,
+                            stderr=asyncio.subprocess.PIPE,
+                            cwd=str(project_path),
+                            env=env,
+                            preexec_fn=sandbox.preexec_fn,
+                            start_new_session=True,
+                            limit=_STREAM_LIMIT,
+                        )
+            except Exception:
+                sandbox.cleanup()
+                raise
         running = RunningProcess(
             session_id=session_id,
             project_id=project_id,
             process=process,
+            sandbox=sandbox,
         )
-
-        async with self._lock:
-            self._processes[session_id] = running
+        if started_at is not None:
+            running.started_at = started_at
+        # Not made current: it stays open across yields to the consumer
+        cli_span = tracer.start_span("cli.process", session_id=session_id, pid=process.pid)
 
         full_text_parts: list[str] = []
-        timeout = settings.process_timeout_seconds
+        log = self._logs.setdefault(session_id, LogRingBuffer())
 
+        # Everything from here on is inside the try, so a caller cancelling or
+        # closing the stream at any point still gets the process group killed
         try:
+            async with self._lock:
+                self._processes[session_id] = running
+            await self._process_reaper.register(process.pid, "task", session_id, cmd[0])
+            if attach is None:
+                # Internal timing event — consumed by TaskManager for send-to-spawn latency
+                yield ParsedEvent(
+                    type="process_spawned",
+                    session_id=session_id,
+                    data={"pid": process.pid, "spawned_at": time.monotonic()},
+                )
+
+            loop = asyncio.get_running_loop()
+            running.last_output_at = loop.time()
+            if settings.process_timeout_seconds > 0:
+                # A reattached run has already used part of its time
+                age = (datetime.now(timezone.utc) - running.started_at).total_seconds()
+                running.deadline = (
+                    running.last_output_at + settings.process_timeout_seconds - max(0.0, age)
+                )
+            self._arm_watchdog(running)
+
             assert process.stdout is not None
 
             # Drain stderr concurrently to prevent pipe buffer deadlock
-            stderr_task = asyncio.create_task(self._drain_stderr(process))
+            stderr_task = asyncio.create_task(self._drain_stderr(process, log))
 
-            # Collect non-JSON stdout lines for diagnostics
-            discarded_lines: list[str] = []
+            # Stdout lines that produced no events (non-JSON goes to the log)
+            unparsed_count = 0
+            line_count = 0
+            parse_seconds = 0.0
 
-            # Stream stdout — check elapsed time each line to enforce timeout
+            # Stream stdout — timeouts are enforced by the watchdog, which
+            # kills the process group and so ends this loop with EOF
             async for line in process.stdout:
                 if running.cancelled:
                     break
-
-                # Check if we've exceeded timeout
-                elapsed = (
-                    datetime.now(timezone.utc) - running.started_at
-                ).total_seconds()
-                if elapsed > timeout:
-                    logger.warning(
-                        "Process for session %s exceeded timeout of %ds",
-                        session_id,
-                        timeout,
-                    )
-                    await self._kill_process(running)
-                    yield ParsedEvent(
-                        type="error",
-                        session_id=session_id,
-                        data={
-                            "error": f"Request timed out after {timeout}s"
-                        },
-                    )
-                    break
+                running.last_output_at = loop.time()
 
                 decoded = line.decode("utf-8", errors="replace").strip()
                 if not decoded:
                     continue
 
+                line_count += 1
+                parse_started = time.perf_counter()
                 events = stream_parser.parse_line(decoded, session_id)
+                parse_seconds += time.perf_counter() - parse_started
                 if events:
                     for event in events:
                         if event.type == "text_delta":
                             full_text_parts.append(event.data.get("text", ""))
                         yield event
                 else:
-                    # Non-JSON output — capture for error diagnostics
-                    if len(discarded_lines) < 100:
-                        discarded_lines.append(decoded)
+                    unparsed_count += 1
+                    if not decoded.startswith("{"):
+                        log.append("stdout", decoded)
 
             await process.wait()
-            stderr_text = await stderr_task
+            await stderr_task
+            cli_span.set_attribute("exit_code", process.returncode)
+            cli_span.set_attribute("stdout_lines", line_count)
+            cli_span.set_attribute("parse_ms", round(parse_seconds * 1000, 3))
+            stderr_text = "\n".join(log.tail(20, stream="stderr"))
+            discarded_lines = log.tail(10, stream="stdout")
+
+            # Resource accounting — consumed by TaskManager, not forwarded to clients
+            resource_usage = sandbox.read_usage()
+            if resource_usage:
+                yield ParsedEvent(
+                    type="resource_usage",
+                    session_id=session_id,
+                    data=resource_usage,
+                )
+
+            if running.kill_task:
+                await running.kill_task
+
+            if running.timeout_reason:
+                cli_span.record_error(running.timeout_reason)
+                if running.timeout_reason == "idle_timeout":
+                    error_msg = (
+                        "Request timed out: no output from the Claude CLI for "
+                        f"{settings.process_idle_timeout_seconds}s"
+                    )
+                else:
+                    error_msg = f"Request timed out after {settings.process_timeout_seconds}s"
+                yield ParsedEvent(
+                    type="error",
+                    session_id=session_id,
+                    data={"error": error_msg, "code": running.timeout_reason},
+                )
 
             # Handle failure
-            if process.returncode != 0 and not running.cancelled:
-                has_output = bool(stderr_text or discarded_lines)
+            elif process.returncode != 0 and not running.cancelled:
+                cli_span.record_error(f"exit code {process.returncode}")
+                has_output = bool(stderr_text or unparsed_count)
 
                 logger.error(
                     "CLI process for session %s failed (exit %d). "
@@ -290,6 +548,11 @@ class ProcessManager:
                     # Remove from active processes before retry
                     async with self._lock:
                         self._processes.pop(session_id, None)
+                    # The retry sets up its own cgroup under the same name —
+                    # free this run's first (the finally below is then a no-op)
+                    if running.watchdog:
+                        running.watchdog.cancel()
+                    sandbox.cleanup()
                     async for event in self._run_cli(
                         cmd=retry_cmd,
                         session_id=session_id,
@@ -301,6 +564,7 @@ class ProcessManager:
                         model=model,
                         max_budget_usd=max_budget_usd,
                         approvals_enabled=approvals_enabled,
+                        spool_meta=spool_meta,
                     ):
                         yield event
                     return
@@ -326,17 +590,29 @@ class ProcessManager:
             # Update session metadata
             full_text = "".join(full_text_parts)
             preview = full_text[:200] if full_text else ""
-            await self._session_service.update_after_message(
-                session_id=session_id,
-                last_message_preview=preview,
-            )
+            with tracer.span("session.update_after_message", session_id=session_id):
+                await self._session_service.update_after_message(
+                    session_id=session_id,
+                    last_message_preview=preview,
+                )
 
-        except asyncio.CancelledError:
-            await self._kill_process(running)
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cancelled, or the consumer closed the stream (aclose)
+            if not (detached and self._detaching):
+                await self._kill_process(running)
             raise
         finally:
+            if running.watchdog:
+                running.watchdog.cancel()
             async with self._lock:
                 self._processes.pop(session_id, None)
+            cli_span.end()
+            # A detached run is left alone on shutdown for the next backend
+            # process to reattach
+            if not (detached and self._detaching):
+                if process.returncode is not None:
+                    await self._process_reaper.release(process.pid)
+                sandbox.cleanup()
 
     async def cancel(self, session_id: str) -> bool:
         async with self._lock:
@@ -349,43 +625,86 @@ class ProcessManager:
         return True
 
     async def cleanup_all(self) -> None:
+        if self._detaching and settings.detached_tasks:
+            return
         async with self._lock:
             session_ids = list(self._processes.keys())
         for sid in session_ids:
             await self.cancel(sid)
 
     @staticmethod
-    async def _drain_stderr(process: asyncio.subprocess.Process) -> str:
-        """Drain stderr concurrently to prevent pipe buffer deadlock."""
+    async def _drain_stderr(
+        process: asyncio.subprocess.Process, log: LogRingBuffer,
+    ) -> None:
+        """Drain stderr line by line into the session log.
+
+        Reads fixed-size chunks rather than ``readline()`` so an unterminated
+        multi-megabyte line can't stall the pipe or blow the reader limit.
+        """
         assert process.stderr is not None
-        chunks: list[bytes] = []
-        total = 0
-        max_bytes = 16384  # 16KB — enough for most CLI error messages
+        partial = b""
+
+        def _emit(raw: bytes) -> None:
+            text = raw.decode("utf-8", errors="replace").rstrip()
+            if text:
+                log.append("stderr", text)
+
         try:
             while True:
                 chunk = await process.stderr.read(4096)
                 if not chunk:
                     break
-                if total < max_bytes:
-                    chunks.append(chunk[: max_bytes - total])
-                total += len(chunk)
+                *lines, partial = (partial + chunk).split(b"\n")
+                for raw in lines:
+                    _emit(raw)
+                if len(partial) > 16384:
+                    _emit(partial)
+                    partial = b""
         except Exception:
             pass
-        return b"".join(chunks).decode("utf-8", errors="replace").strip()
+        if partial:
+            _emit(partial)
 
-    async def _kill_process(self, running: RunningProcess) -> None:
-        proc = running.process
-        if proc.returncode is not None:
+    def _arm_watchdog(self, running: RunningProcess) -> None:
+        """Schedule the next idle/total deadline check via ``loop.call_at``.
+
+        The timer is only re-armed when it fires, so stdout lines just bump
+        ``last_output_at`` instead of rescheduling anything.
+        """
+        due = running.deadline
+        idle_timeout = settings.process_idle_timeout_seconds
+        if idle_timeout > 0:
+            due = min(due, running.last_output_at + idle_timeout)
+        if due == float("inf"):
             return
-        try:
-            proc.terminate()
-            try:
-                await asyncio.wait_for(proc.wait(), timeout=5.0)
-            except asyncio.TimeoutError:
-                proc.kill()
-                await proc.wait()
-        except ProcessLookupError:
-            pass
+        running.watchdog = asyncio.get_running_loop().call_at(
+            due, self._check_watchdog, running
+        )
+
+    def _check_watchdog(self, running: RunningProcess) -> None:
+        if running.cancelled or running.process.returncode is not None:
+            return
+        now = asyncio.get_running_loop().time()
+        idle_timeout = settings.process_idle_timeout_seconds
+        if now >= running.deadline:
+            running.timeout_reason = "timeout"
+        elif idle_timeout > 0 and now - running.last_output_at >= idle_timeout:
+            running.timeout_reason = "idle_timeout"
+        else:
+            self._arm_watchdog(running)
+            return
+
+        logger.warning(
+            "Process for session %s hit %s (idle %.0fs, running %.0fs) — killing process group",
+            running.session_id,
+            running.timeout_reason,
+            now - running.last_output_at,
+            (datetime.now(timezone.utc) - running.started_at).total_seconds(),
+        )
+        running.kill_task = asyncio.create_task(self._kill_process(running))
+
+    async def _kill_process(self, running: RunningProcess) -> None:
+        await terminate_group(running.process, grace_seconds=5.0)
 
     def _build_command(
         self,
@@ -0,0 +1,181 @@
+"""Spool files for detached CLI runs, and a Process-like view over them.
+
+A detached run (``settings.detached_tasks``) writes four files per session
+under ``settings.task_spool_dir``:
+
+- ``<id>.out`` / ``<id>.err`` — the CLI's stdout (stream-json) and stderr
+- ``<id>.json`` — metadata written by the backend (supervisor PID, message ID…)
+- ``<id>.exit`` — the CLI's exit code, written by the supervisor when it ends
+
+:class:`SpooledProcess` exposes the same surface ``ProcessManager`` uses on
+``asyncio.subprocess.Process`` (``pid``, ``returncode``, ``stdout``,
+``stderr``, ``wait()``), so the streaming loop works unchanged whether it
+reads a pipe or tails a spool — including after a backend restart, when the
+supervisor is no longer our child.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from ...core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SUPERVISOR_SCRIPT = Path(__file__).with_name("supervisor.py")
+
+_POLL_SECONDS = 0.05
+
+
+@dataclass(frozen=True)
+class SpoolPaths:
+    prefix: Path
+
+    @classmethod
+    def for_session(cls, session_id: str) -> SpoolPaths:
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", session_id)
+        return cls(settings.task_spool_dir / safe)
+
+    @property
+    def out(self) -> Path:
+        return self.prefix.with_suffix(".out")
+
+    @property
+    def err(self) -> Path:
+        return self.prefix.with_suffix(".err")
+
+    @property
+    def meta(self) -> Path:
+        return self.prefix.with_suffix(".json")
+
+    @property
+    def exit(self) -> Path:
+        return self.prefix.with_suffix(".exit")
+
+    def all(self) -> tuple[Path, ...]:
+        return (self.out, self.err, self.meta, self.exit)
+
+    def reset(self) -> None:
+        settings.task_spool_dir.mkdir(parents=True, exist_ok=True)
+        self.remove()
+        self.out.touch()
+        self.err.touch()
+
+    def remove(self) -> None:
+        for path in self.all():
+            path.unlink(missing_ok=True)
+
+    def write_meta(self, meta: dict) -> None:
+        tmp = self.meta.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.meta)
+
+    def read_exit_code(self) -> int | None:
+        try:
+            return int(self.exit.read_text().strip())
+        except (OSError, ValueError):
+            return None
+
+
+def list_spools() -> list[dict]:
+    """Metadata of every spooled run on disk, oldest first."""
+    if not settings.task_spool_dir.is_dir():
+        return []
+    metas = []
+    for path in sorted(settings.task_spool_dir.glob("*.json"), key=lambda p: p.stat().st_mtime):
+        try:
+            metas.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable spool metadata %s", path)
+    return metas
+
+
+class SpoolReader:
+    """Tails a growing file until *is_done* and EOF are both reached."""
+
+    def __init__(self, path: Path, is_done: Callable[[], bool]) -> None:
+        self._file = open(path, "rb")
+        self._is_done = is_done
+        self._partial = b""
+
+    async def read(self, n: int = -1) -> bytes:
+        while True:
+            data = self._file.read(n)
+            if data:
+                return data
+            if self._is_done():
+                # The writer may have flushed between our read and the check
+                data = self._file.read(n)
+                if not data:
+                    self._file.close()
+                return data
+            await asyncio.sleep(_POLL_SECONDS)
+
+    def __aiter__(self) -> SpoolReader:
+        return self
+
+    async def __anext__(self) -> bytes:
+        while b"\n" not in self._partial:
+            chunk = await self.read(65536) if not self._file.closed else b""
+            if not chunk:
+                if self._partial:
+                    line, self._partial = self._partial, b""
+                    return line
+                raise StopAsyncIteration
+            self._partial += chunk
+        line, _, self._partial = self._partial.partition(b"\n")
+        return line + b"\n"
+
+
+class SpooledProcess:
+    """A supervised CLI run, read back through its spool files."""
+
+    def __init__(
+        self,
+        paths: SpoolPaths,
+        pid: int,
+        child: asyncio.subprocess.Process | None = None,
+    ) -> None:
+        self.paths = paths
+        self.pid = pid  # the supervisor — leader of the run's process group
+        self._child = child  # set when the supervisor was spawned by this process
+        self._returncode: int | None = None
+        self.stdout = SpoolReader(paths.out, lambda: self.returncode is not None)
+        self.stderr = SpoolReader(paths.err, lambda: self.returncode is not None)
+
+    @property
+    def returncode(self) -> int | None:
+        if self._returncode is None:
+            code = self.paths.read_exit_code()
+            if code is None and not self._supervisor_alive():
+                # Killed before it could record an exit code (e.g. SIGKILL)
+                code = self.paths.read_exit_code()
+                if code is None:
+                    code = self._child.returncode if self._child else -1
+            self._returncode = code
+        return self._returncode
+
+    async def wait(self) -> int:
+        while self.returncode is None:
+            await asyncio.sleep(_POLL_SECONDS * 2)
+        if self._child is not None:
+            await self._child.wait()  # reap the supervisor
+        return self._returncode
+
+    def _supervisor_alive(self) -> bool:
+        if self._child is not None:
+            return self._child.returncode is None
+        try:
+            os.kill(self.pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
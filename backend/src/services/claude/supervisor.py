@@ -0,0 +1,42 @@
+"""Detached runner for one Claude CLI process.
+
+Started by ``ProcessManager`` in its own session so it outlives backend
+restarts. Runs the CLI with stdout/stderr appended to spool files and, when
+the CLI exits, records its exit code. Deliberately dependency-free: it is
+executed as a plain script, not imported.
+
+Usage: ``python supervisor.py <spool-prefix> <command> [args...]``
+"""
+
+import os
+import signal
+import subprocess
+import sys
+
+
+def main() -> int:
+    prefix, cmd = sys.argv[1], sys.argv[2:]
+    with open(prefix + ".out", "ab") as out, open(prefix + ".err", "ab") as err:
+        child = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=out, stderr=err)
+
+    def _forward(signum, _frame):
+        try:
+            child.send_signal(signum)
+        except ProcessLookupError:
+            pass
+
+    # Stay alive until the CLI exits so its exit code is always recorded
+    signal.signal(signal.SIGTERM, _forward)
+    signal.signal(signal.SIGINT, _forward)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    code = child.wait()
+    tmp = prefix + ".exit.tmp"
+    with open(tmp, "w") as f:
+        f.write(str(code))
+    os.replace(tmp, prefix + ".exit")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,40 @@ import uuid
 from datetime import datetime, timezone
 
 from ...core.database import db
+from ...core.tracing import tracer
+from ...core.worker import live_workers, worker_id
+
+
+def summarize_tool_uses(tool_uses: list[dict]) -> list[dict]:
+    """Aggregate tool calls by name: count, errors and time spent.
+
+    Returns entries sorted by total duration, largest first, with each
+    tool's share of the summed tool time.
+    """
+    by_name: dict[str, dict] = {}
+    for tu in tool_uses:
+        name = tu.get("toolName") or "unknown"
+        entry = by_name.setdefault(name, {
+            "tool_name": name,
+            "count": 0,
+            "error_count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+        })
+        entry["count"] += 1
+        if tu.get("isError"):
+            entry["error_count"] += 1
+        duration = tu.get("durationMs")
+        if duration is not None:
+            entry["total_ms"] += duration
+            entry["max_ms"] = max(entry["max_ms"], duration)
+
+    grand_total = sum(e["total_ms"] for e in by_name.values())
+    for entry in by_name.values():
+        entry["total_ms"] = round(entry["total_ms"], 1)
+        entry["avg_ms"] = round(entry["total_ms"] / entry["count"], 1)
+        entry["share"] = round(entry["total_ms"] / grand_total, 3) if grand_total else 0.0
+    return sorted(by_name.values(), key=lambda e: e["total_ms"], reverse=True)
 
 
 class MessageService:
@@ -16,27 +50,43 @@ class MessageService:
         usage: dict | None = None,
         cost_usd: float | None = None,
         message_id: str | None = None,
+        created_at: str | None = None,
+        status: str = "complete",
     ) -> dict:
+        """Insert a message, or overwrite it if ``message_id`` already exists.
+
+        Re-saving the same id is how in-flight assistant checkpoints are
+        upserted (``status="partial"``) and later completed.
+        """
         mid = message_id or str(uuid.uuid4())
-        now = datetime.now(timezone.utc).isoformat()
-
-        await db.conn.execute(
-            """INSERT INTO messages
-               (id, session_id, role, content, thinking, tool_uses, usage, cost_usd, created_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                mid,
-                session_id,
-                role,
-                content,
-                thinking,
-                json.dumps(tool_uses or []),
-                json.dumps(usage) if usage else None,
-                cost_usd,
-                now,
-            ),
-        )
-        await db.conn.commit()
+        now = created_at or datetime.now(timezone.utc).isoformat()
+
+        with tracer.span("message.save", session_id=session_id, role=role, status=status):
+            await db.conn.execute(
+                """INSERT INTO messages
+                   (id, session_id, role, content, thinking, tool_uses, usage, cost_usd, created_at, status)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET
+                       content = excluded.content,
+                       thinking = excluded.thinking,
+                       tool_uses = excluded.tool_uses,
+                       usage = excluded.usage,
+                       cost_usd = excluded.cost_usd,
+                       status = excluded.status""",
+                (
+                    mid,
+                    session_id,
+                    role,
+                    content,
+                    thinking,
+                    json.dumps(tool_uses or []),
+                    json.dumps(usage) if usage else None,
+                    cost_usd,
+                    now,
+                    status,
+                ),
+            )
+            await db.conn.commit()
 
         return {
             "id": mid,
@@ -48,14 +98,71 @@ class MessageService:
             "usage": usage,
             "cost_usd": cost_usd,
             "created_at": now,
+            "status": status,
         }
 
+    async def finalize_message(
+        self,
+        message_id: str,
+        usage: dict | None = None,
+        cost_usd: float | None = None,
+    ) -> None:
+        """Mark a checkpointed message complete without rewriting its content."""
+        with tracer.span("message.finalize", message_id=message_id):
+            await db.conn.execute(
+                "UPDATE messages SET status = 'complete', usage = ?, cost_usd = ? WHERE id = ?",
+                (json.dumps(usage) if usage else None, cost_usd, message_id),
+            )
+            await db.conn.commit()
+
+    async def mark_interrupted(self, exclude: set[str] | None = None) -> int:
+        """Flag leftover partial checkpoints as interrupted. Returns how many.
+
+        ``exclude`` holds IDs of messages whose runs are still being streamed
+        (reattached detached tasks). Partial rows of sessions another live
+        worker is running a task for are that worker's in-flight checkpoints
+        and are left alone.
+        """
+        excluded = list(exclude or ())
+        placeholders = ",".join("?" * len(excluded))
+        others = sorted(await live_workers() - {worker_id()})
+        owners = ",".join("?" * len(others))
+        cursor = await db.conn.execute(
+            "UPDATE messages SET status = 'interrupted' WHERE status = 'partial'"
+            + (f" AND id NOT IN ({placeholders})" if excluded else "")
+            + (
+                f""" AND session_id NOT IN (
+                       SELECT session_id FROM task_registry
+                       WHERE status = 'running' AND owner_worker IN ({owners})
+                   )"""
+                if others else ""
+            ),
+            [*excluded, *others],
+        )
+        await db.conn.commit()
+        return cursor.rowcount
+
+    async def tool_profile(self, session_id: str) -> list[dict]:
+        """Per-tool timing summary across a session's persisted assistant messages."""
+        async with db.conn.execute(
+            "SELECT tool_uses FROM messages WHERE session_id = ? AND role = 'assistant'",
+            (session_id,),
+        ) as cursor:
+            rows = await cursor.fetchall()
+        tool_uses: list[dict] = []
+        for row in rows:
+            if row["tool_uses"]:
+                tool_uses.extend(json.loads(row["tool_uses"]))
+        return summarize_tool_uses(tool_uses)
+
     async def list_messages(
         self, session_id: str, offset: int = 0, limit: int = 200
     ) -> tuple[list[dict], int]:
+        # Partial checkpoints belong to a still-running task, whose live
+        # stream/replay is the source of truth until it finalizes
         async with db.conn.execute(
             """SELECT * FROM messages
-               WHERE session_id = ?
+               WHERE session_id = ? AND status != 'partial'
                ORDER BY created_at ASC
                LIMIT ? OFFSET ?""",
             (session_id, limit, offset),
@@ -63,7 +170,7 @@ class MessageService:
             rows = await cursor.fetchall()
 
         async with db.conn.execute(
-            "SELECT COUNT(*) FROM messages WHERE session_id = ?",
+            "SELECT COUNT(*) FROM messages WHERE session_id = ? AND status != 'partial'",
             (session_id,),
         ) as cursor:
             total = (await cursor.fetchone())[0]
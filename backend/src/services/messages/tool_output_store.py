@@ -0,0 +1,125 @@
+"""Out-of-band storage for large tool outputs.
+
+A ``cat`` of a big file or a verbose test run can return megabytes that
+nobody expands. Outputs larger than ``settings.tool_output_inline_bytes``
+are written once to ``settings.tool_output_dir`` and replaced — in the live
+stream, the replay buffer and the persisted ``tool_uses`` — by a head/tail
+preview plus a content handle. The full text is fetched lazily, with HTTP
+range support, from ``GET /api/messages/tool-outputs/{handle}``.
+
+Handles are content hashes scoped to a session, so an identical output
+repeated within a session (re-reading the same file) is stored once.
+Recently offloaded outputs stay in a small in-memory LRU, since the usual
+reader expands a result moments after it streams in.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+
+from ...core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_HANDLE_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _session_dir(session_id: str) -> Path:
+    return settings.tool_output_dir / re.sub(r"[^A-Za-z0-9_.-]", "_", session_id)
+
+
+def make_preview(output: str, size: int) -> str:
+    """Head and tail of *output* — the end of a build or test log matters too."""
+    half = settings.tool_output_preview_bytes // 2
+    data = output.encode("utf-8", "replace")
+    head = data[:half].decode("utf-8", "ignore")
+    tail = data[-half:].decode("utf-8", "ignore")
+    omitted = size - len(head.encode()) - len(tail.encode())
+    return f"{head}\n… [{omitted:,} bytes omitted] …\n{tail}"
+
+
+class ToolOutputStore:
+    def __init__(self) -> None:
+        # (session_id, handle) → UTF-8 bytes, least recently used first
+        self._cache: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+        self._cache_bytes = 0
+
+    async def offload(self, session_id: str, output: str) -> dict | None:
+        """Store *output* if it's large; None when it should stay inline.
+
+        Returns the fields replacing ``output`` in a tool_result event:
+        ``output`` (the preview), ``output_handle`` and ``output_size`` (bytes).
+        The file is on disk before this returns, so the handle is readable by
+        any worker as soon as the event is.
+        """
+        if len(output) <= settings.tool_output_inline_bytes // 4:
+            return None  # can't exceed the limit even at 4 bytes per character
+        data = output.encode("utf-8", "replace")
+        if len(data) <= settings.tool_output_inline_bytes:
+            return None
+
+        handle = hashlib.sha256(data).hexdigest()[:32]
+        path = _session_dir(session_id) / handle
+        await asyncio.to_thread(_write_once, path, data)
+        self._remember((session_id, handle), data)
+        return {
+            "output": make_preview(output, len(data)),
+            "output_handle": handle,
+            "output_size": len(data),
+        }
+
+    async def read(
+        self, session_id: str, handle: str, start: int = 0, end: int | None = None,
+    ) -> tuple[bytes, int] | None:
+        """Bytes ``[start:end]`` of a stored output and its total size, or None.
+
+        Slicing follows Python: a negative *start* counts from the end.
+        """
+        if not _HANDLE_RE.match(handle):
+            return None
+        key = (session_id, handle)
+        data = self._cache.get(key)
+        if data is not None:
+            self._cache.move_to_end(key)
+            return data[start:end], len(data)
+        return await asyncio.to_thread(_read_range, _session_dir(session_id) / handle, start, end)
+
+    def _remember(self, key: tuple[str, str], data: bytes) -> None:
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return
+        if len(data) > settings.tool_output_cache_bytes:
+            return
+        self._cache[key] = data
+        self._cache_bytes += len(data)
+        while self._cache_bytes > settings.tool_output_cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+
+def _write_once(path: Path, data: bytes) -> None:
+    if path.exists():
+        return  # same content already stored for this session
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _read_range(path: Path, start: int, end: int | None) -> tuple[bytes, int] | None:
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if start < 0:
+                start = max(0, size + start)
+            f.seek(start)
+            length = (min(end, size) if end is not None else size) - start
+            return (f.read(length) if length > 0 else b""), size
+    except FileNotFoundError:
+        return None
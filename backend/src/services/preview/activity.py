@@ -0,0 +1,65 @@
+"""Traffic on preview ports, read from the kernel's TCP socket table.
+
+Caddy proxies ``<slug>.<domain>`` to ``localhost:<port>``, so every request
+to a preview arrives as a connection to its port. ``/proc/net/tcp{,6}``
+shows, per port, the connections the dev server holds (Caddy's pooled
+upstream connections, which linger a couple of minutes after the last
+request, and HMR WebSockets while a tab is open) and whether anything is
+waiting to be read — a new connection in the listen backlog or a request on
+an idle connection. The latter is what wakes a frozen preview: it can't
+accept or answer, but the kernel still queues the request for it.
+
+Reading the table is cheap and needs no proxy changes; Caddy's own access
+log can't serve here, since it is written only once a response is sent.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+_TCP_TABLES = ("/proc/net/tcp", "/proc/net/tcp6")
+_ESTABLISHED = "01"
+_LISTEN = "0A"
+
+
+@dataclass
+class PortActivity:
+    connections: int = 0  # established connections accepted by the server
+    pending: bool = False  # a connection or request is waiting to be read
+
+
+def available() -> bool:
+    try:
+        with open(_TCP_TABLES[0]):
+            return True
+    except OSError:
+        return False
+
+
+def sample(ports: set[int]) -> dict[int, PortActivity]:
+    """Activity on each of *ports* (ports with none are omitted)."""
+    result: dict[int, PortActivity] = {}
+    if not ports:
+        return result
+    for table in _TCP_TABLES:
+        try:
+            with open(table) as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 5:
+                continue
+            port = int(fields[1].rpartition(":")[2], 16)
+            if port not in ports:
+                continue
+            state = fields[3]
+            rx_queue = int(fields[4].partition(":")[2], 16)
+            activity = result.setdefault(port, PortActivity())
+            if state == _ESTABLISHED:
+                activity.connections += 1
+            # For a listening socket rx_queue is the accept backlog
+            if rx_queue and state in (_ESTABLISHED, _LISTEN):
+                activity.pending = True
+    return result
@@ -0,0 +1,235 @@
+"""Content-addressed cache of production preview builds.
+
+A production preview serves a service's static build (``vite build``,
+``next build`` with a static export, ...) through Caddy's ``file_server``
+instead of running its dev server. The build output is stored under
+``settings.preview_build_cache_dir/<key>``, where the key hashes the build
+command, the environment it is given and every source file — so a preview
+of sources that were built before (by this project or an identical one)
+starts without building, and Caddy serves straight from the cache entry.
+
+Sources are the regular files in the service directory except
+dependencies, the build output itself and dot-directories (``.git``,
+``.next``, ``.vite``…); dotfiles such as ``.env`` are included, since builds
+read them. FIFOs, sockets and other special files are skipped. File digests
+are remembered by size, mtime and inode, so large unchanged files aren't
+read again on every start and rebuild. Entries in use by a running preview
+are never evicted.
+
+For a monorepo service only its own directory is hashed: a change to the
+workspace root (its lockfile, a shared tsconfig) or to a shared package
+outside the directory doesn't change the key, and the previous build is
+served until the service's own sources change or the cache entry is
+evicted.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from ...core.config import settings
+from ...core.exceptions import PreviewStartError
+from ...core.metrics import metrics
+from ..processes.log_buffer import LogRingBuffer
+from ..processes.process_groups import terminate_group
+
+logger = logging.getLogger(__name__)
+
+_SKIP_DIRS = {"node_modules", "__pycache__", "venv"}
+
+# work_dir → {path: ((size, mtime_ns, inode), sha256 digest)} from its last hash;
+# replaced on every hash, so deleted files don't linger. Least recently hashed
+# directories beyond _DIGEST_DIRS are forgotten (source_key runs in threads)
+_DIGEST_DIRS = 32
+_file_digests: OrderedDict[str, dict[str, tuple[tuple[int, int, int], bytes]]] = OrderedDict()
+_file_digests_lock = threading.Lock()
+
+_BUILDS = metrics.counter(
+    "casperbot_preview_builds_total",
+    "Production preview builds by build-cache result (hit, miss, failed)",
+    labels=("result",),
+)
+_BUILD_SECONDS = metrics.histogram(
+    "casperbot_preview_build_seconds",
+    "Time to provide a production preview's static build, by build-cache result",
+    labels=("result",),
+)
+
+
+class BuildCache:
+    def __init__(self) -> None:
+        self._locks: dict[str, asyncio.Lock] = {}  # one build per key at a time
+        self._refs: dict[str, int] = {}  # key → running previews serving the entry
+
+    async def build(
+        self,
+        work_dir: Path,
+        build_cmd: list[str],
+        output: str,
+        env: dict[str, str],
+        log: LogRingBuffer,
+        prefix: str = "",
+    ) -> tuple[Path, str, str]:
+        """Build *work_dir* into the cache, or find the build already there.
+
+        Returns ``(site root, key, result)`` with result ``hit`` or ``miss``.
+        The entry is held for the caller until ``release(key)``. Raises
+        ``PreviewStartError`` when the build fails, times out or doesn't
+        produce *output*.
+        """
+        started = time.monotonic()
+        try:
+            key = await asyncio.to_thread(source_key, work_dir, build_cmd, output, env)
+            entry = settings.preview_build_cache_dir / key
+            lock = self._locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                if entry.is_dir():
+                    result = "hit"
+                    os.utime(entry)  # recently used, for eviction
+                else:
+                    result = "miss"
+                    log.append("build", f"{prefix}[build] No cached build ({key[:12]}), building")
+                    await _run(build_cmd, work_dir, env, log, prefix)
+                    await asyncio.to_thread(_store, work_dir / output, entry)
+                self._refs[key] = self._refs.get(key, 0) + 1
+        except Exception:
+            _BUILDS.inc("failed")
+            raise
+        elapsed = time.monotonic() - started
+        _BUILDS.inc(result)
+        _BUILD_SECONDS.observe(elapsed, result)
+        log.append("build", f"{prefix}[build] Static build ready in {elapsed:.1f}s (cache {result})")
+        logger.info("Preview build in %s: cache %s, %.1fs", work_dir, result, elapsed)
+        if result == "miss":
+            try:
+                await asyncio.to_thread(_evict, settings.preview_build_cache_entries, set(self._refs))
+            except OSError as exc:
+                logger.warning("Could not evict preview builds: %s", exc)
+        return entry, key, result
+
+    def release(self, key: str) -> None:
+        """A preview stopped serving the entry for *key*."""
+        count = self._refs.get(key, 0) - 1
+        if count > 0:
+            self._refs[key] = count
+        else:
+            self._refs.pop(key, None)
+
+
+def source_key(work_dir: Path, build_cmd: list[str], output: str, env: dict[str, str]) -> str:
+    """Hash of everything a build's output depends on."""
+    digest = hashlib.sha256("\0".join(build_cmd).encode() + b"\0\0")
+    # Only what the preview itself sets varies between otherwise identical builds
+    for name in sorted(k for k in env if k.startswith("PREVIEW_")):
+        digest.update(f"{name}={env[name]}\0".encode())
+    skip = _SKIP_DIRS | {output}
+    with _file_digests_lock:
+        previous = _file_digests.pop(str(work_dir), {})
+    seen: dict[str, tuple[tuple[int, int, int], bytes]] = {}
+    for root, dirs, files in os.walk(work_dir):
+        dirs[:] = sorted(d for d in dirs if d not in skip and not d.startswith("."))
+        rel = os.path.relpath(root, work_dir)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # dangling link, or gone meanwhile
+            if not stat.S_ISREG(st.st_mode):
+                continue  # a FIFO or socket would block the read
+            digest.update(os.path.join(rel, name).encode() + b"\0")
+            signature = (st.st_size, st.st_mtime_ns, st.st_ino)
+            cached = previous.get(path)
+            if cached is None or cached[0] != signature:
+                cached = (signature, _file_digest(path))
+            seen[path] = cached
+            digest.update(cached[1] + b"\0")
+    with _file_digests_lock:
+        _file_digests[str(work_dir)] = seen
+        while len(_file_digests) > _DIGEST_DIRS:
+            _file_digests.popitem(last=False)
+    return digest.hexdigest()[:40]
+
+
+def _file_digest(path: str) -> bytes:
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            file_hash.update(chunk)
+    return file_hash.digest()
+
+
+async def _run(
+    cmd: list[str], work_dir: Path, env: dict[str, str], log: LogRingBuffer, prefix: str,
+) -> None:
+    """Run a build command, appending its output to *log* as it arrives."""
+    log.append("build", f"{prefix}[build] $ {' '.join(cmd)}")
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=str(work_dir),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            env=env,
+            start_new_session=True,
+        )
+    except OSError as exc:
+        raise PreviewStartError(f"Failed to run {cmd[0]}: {exc}")
+
+    async def pump() -> None:
+        assert proc.stdout
+        async for raw_line in proc.stdout:
+            log.append("build", prefix + raw_line.decode("utf-8", errors="replace").rstrip("\n"))
+        await proc.wait()
+
+    try:
+        await asyncio.wait_for(pump(), timeout=settings.preview_build_timeout_seconds)
+    except asyncio.TimeoutError:
+        await terminate_group(proc, grace_seconds=5.0)
+        raise PreviewStartError(f"Build timed out after {settings.preview_build_timeout_seconds}s")
+    except asyncio.CancelledError:
+        await terminate_group(proc, grace_seconds=5.0)
+        raise
+    if proc.returncode != 0:
+        raise PreviewStartError(f"{' '.join(cmd)} failed (exit code {proc.returncode})")
+
+
+def _store(output: Path, entry: Path) -> None:
+    """Copy a fresh build into the cache (atomically, by rename)."""
+    if not output.is_dir():
+        raise PreviewStartError(f"Build finished without producing {output.name}/")
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    tmp = entry.with_name(f"{entry.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    shutil.copytree(output, tmp, symlinks=True)
+    try:
+        os.rename(tmp, entry)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)  # another worker stored it first
+
+
+def _evict(max_entries: int, in_use: set[str]) -> None:
+    """Drop the least recently used entries beyond *max_entries*, except those in use."""
+    root = settings.preview_build_cache_dir
+    entries = sorted(
+        (p for p in root.iterdir() if p.is_dir() and ".tmp-" not in p.name),
+        key=lambda p: p.stat().st_mtime,
+    )
+    excess = len(entries) - max_entries
+    for stale in entries:
+        if excess <= 0:
+            break
+        if stale.name in in_use:
+            continue
+        shutil.rmtree(stale, ignore_errors=True)
+        logger.info("Evicted preview build %s", stale.name)
+        excess -= 1
@@ -1,13 +1,41 @@
-"""Client for Caddy's admin API to manage reverse-proxy routes dynamically."""
+"""Client for Caddy's admin API to manage reverse-proxy routes dynamically.
+
+Each preview is one route in the ``preview`` server, tagged with an ``@id``
+(``casperbot-preview-<slug>``) so it can be added, replaced or deleted on
+its own through the config path API — Caddy only swaps that route instead
+of reloading every server as a full ``/load`` would.
+
+A route either proxies to a dev server's port or — for production
+previews — serves a static build from disk with Caddy's own
+``file_server``: compressed, with long-lived caching for fingerprinted
+assets and revalidation for everything else, falling back to
+``index.html`` for client-side routes. Caddy must be able to read the
+build cache directory.
+
+Route changes are coalesced: callers update the desired route table and wait
+for a flush, which starts after a short debounce and applies the difference
+between what Caddy has and what we want. A burst of preview starts/stops
+becomes a handful of small requests, and a start immediately undone by a
+stop costs none.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from pathlib import Path
 
 import httpx
 
 logger = logging.getLogger(__name__)
 
+_SERVER_NAME = "preview"
+_ROUTE_ID_PREFIX = "casperbot-preview-"
+_DEBOUNCE_SECONDS = 0.05
+_ROUTES_PATH = f"/config/apps/http/servers/{_SERVER_NAME}/routes"
+# Bundler output under these paths has content hashes in its file names
+_IMMUTABLE_PATHS = ["/assets/*", "/_next/static/*", "/static/*"]
+
 
 class CaddyClient:
     """Manages Caddy reverse-proxy config via the admin API (localhost:2019)."""
@@ -16,78 +44,233 @@ class CaddyClient:
         self._admin_url = admin_url.rstrip("/")
         self._listen_port = listen_port
         self._domain = domain
-        self._routes: dict[str, int] = {}  # slug → port
+        # slug → port, or file_server root for a static site
+        self._routes: dict[str, int | str] = {}  # desired
+        self._applied: dict[str, int | str] = {}  # what Caddy has
+        # Applied state is unknown (startup, or after a failed flush): the
+        # next flush replaces the whole route list instead of diffing
+        self._needs_reconcile = True
+        self._version = 0  # bumped on every change to _routes
+        self._flushed_version = 0
+        self._flusher: asyncio.Task | None = None
+        self._client: httpx.AsyncClient | None = None
 
     async def add_route(self, slug: str, port: int) -> None:
         """Register a route: ``slug.domain`` → ``localhost:port``."""
         self._routes[slug] = port
-        await self._push_config()
+        await self._apply()
         logger.info("Caddy route added: %s.%s → localhost:%d", slug, self._domain, port)
 
+    async def add_site(self, slug: str, root: Path) -> None:
+        """Register a static site: ``slug.domain`` → files under *root*."""
+        self._routes[slug] = str(root)
+        await self._apply()
+        logger.info("Caddy site added: %s.%s → %s", slug, self._domain, root)
+
     async def remove_route(self, slug: str) -> None:
         """Remove the route for *slug*."""
         if slug in self._routes:
             del self._routes[slug]
-            await self._push_config()
+            await self._apply()
             logger.info("Caddy route removed: %s.%s", slug, self._domain)
 
+    async def reconcile(self) -> None:
+        """Make Caddy's preview routes match ours, dropping leftovers.
+
+        Called at startup: routes from a previous backend process (whose
+        previews are gone) are removed. Never raises — if Caddy is down the
+        reconcile happens on the next route change instead.
+        """
+        self._needs_reconcile = True
+        try:
+            await self._apply()
+        except Exception as exc:
+            logger.warning("Caddy route reconcile deferred: %s", exc)
+
     async def is_healthy(self) -> bool:
         """Check if Caddy's admin API is reachable."""
         try:
-            async with httpx.AsyncClient(timeout=3) as client:
-                resp = await client.get(f"{self._admin_url}/config/")
-                return resp.status_code in (200, 404)  # 404 = no config yet, still alive
+            resp = await self._http().get("/config/", timeout=3)
+            return resp.status_code in (200, 404)  # 404 = no config yet, still alive
         except Exception:
             return False
 
-    async def _push_config(self) -> None:
-        """Build the full Caddy JSON config and POST /load."""
-        config = self._build_config()
-        try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                resp = await client.post(
-                    f"{self._admin_url}/load",
-                    json=config,
-                    headers={"Content-Type": "application/json"},
+    async def close(self) -> None:
+        if self._flusher and not self._flusher.done():
+            try:
+                await self._flusher
+            except Exception:
+                pass
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # -- Flushing --
+
+    async def _apply(self) -> None:
+        """Wait for a flush covering every route change made so far."""
+        self._version += 1
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+        # Shielded: one caller going away mustn't cancel everyone's flush
+        await asyncio.shield(self._flusher)
+
+    async def _flush_loop(self) -> None:
+        await asyncio.sleep(_DEBOUNCE_SECONDS)  # let concurrent changes pile up
+        while self._flushed_version < self._version:
+            version = self._version
+            try:
+                if self._needs_reconcile:
+                    await self._replace_routes()
+                else:
+                    await self._sync_routes()
+            except httpx.HTTPStatusError as exc:
+                self._needs_reconcile = True
+                logger.error(
+                    "Caddy config update failed (%s): %s",
+                    exc.response.status_code, exc.response.text,
                 )
+                raise
+            except httpx.TransportError:
+                self._needs_reconcile = True
+                logger.warning("Caddy not reachable at %s — route not applied", self._admin_url)
+                raise
+            self._flushed_version = version
+
+    async def _sync_routes(self) -> None:
+        """Apply the difference between the applied and desired route tables."""
+        client = self._http()
+        for slug in [s for s in self._applied if s not in self._routes]:
+            resp = await client.delete(f"/id/{self._route_id(slug)}")
+            if resp.status_code != 404:  # already gone is fine
                 resp.raise_for_status()
-        except httpx.HTTPStatusError as exc:
-            logger.error("Caddy config push failed (%s): %s", exc.response.status_code, exc.response.text)
-            raise
-        except httpx.ConnectError:
-            logger.warning("Caddy not reachable at %s — route not applied", self._admin_url)
-            raise
-
-    def _build_config(self) -> dict:
-        """Build the complete Caddy JSON configuration."""
-        routes = []
-        for slug, port in self._routes.items():
-            routes.append({
-                "match": [{"host": [f"{slug}.{self._domain}"]}],
-                "handle": [
-                    {
-                        "handler": "reverse_proxy",
-                        "upstreams": [{"dial": f"localhost:{port}"}],
-                    }
-                ],
-            })
-
-        if not routes:
-            # Empty config — just keep Caddy running with no routes
-            return {}
+            del self._applied[slug]
+        added = {}
+        for slug, target in list(self._routes.items()):
+            applied = self._applied.get(slug)
+            if applied is None:
+                added[slug] = target
+            elif applied != target:
+                resp = await client.patch(
+                    f"/id/{self._route_id(slug)}", json=self._route(slug, target),
+                )
+                resp.raise_for_status()
+                self._applied[slug] = target
+        if added:
+            # "/..." appends every element of the posted array in one request
+            resp = await client.post(
+                f"{_ROUTES_PATH}/...",
+                json=[self._route(slug, target) for slug, target in added.items()],
+            )
+            resp.raise_for_status()
+            self._applied.update(added)
 
-        return {
-            "apps": {
-                "http": {
-                    "servers": {
-                        "preview": {
-                            "listen": [f":{self._listen_port}"],
-                            "routes": routes,
-                            "automatic_https": {
-                                "disable": True,
-                            },
-                        }
-                    }
+    async def _replace_routes(self) -> None:
+        """Set the preview server's whole route list, creating the server if needed."""
+        client = self._http()
+        desired = dict(self._routes)
+        routes = [self._route(slug, target) for slug, target in desired.items()]
+
+        resp = await client.get(_ROUTES_PATH)
+        existing = resp.json() if resp.status_code == 200 else None
+        if isinstance(existing, list):
+            stale = [
+                r.get("@id", "(untagged)") for r in existing
+                if r.get("@id") not in {self._route_id(s) for s in desired}
+            ]
+            resp = await client.patch(_ROUTES_PATH, json=routes)
+            resp.raise_for_status()
+            if stale:
+                logger.info("Removed %d stale Caddy route(s): %s", len(stale), ", ".join(stale))
+        else:
+            await self._create_server(client, routes)
+        self._applied = desired
+        self._needs_reconcile = False
+
+    async def _create_server(self, client: httpx.AsyncClient, routes: list[dict]) -> None:
+        """Create the preview server (or its route list) under whatever config exists."""
+        value: dict | list = {
+            "listen": [f":{self._listen_port}"],
+            "routes": routes,
+            "automatic_https": {"disable": True},
+        }
+        keys = ["apps", "http", "servers", _SERVER_NAME, "routes"]
+        resp = await client.get("/config/")
+        resp.raise_for_status()
+        node = resp.json()
+        if not isinstance(node, dict):
+            # No config at all yet
+            resp = await client.post(
+                "/load", json={"apps": {"http": {"servers": {_SERVER_NAME: value}}}},
+            )
+            resp.raise_for_status()
+            return
+        # PUT at the shallowest missing path, wrapping the value to fit there
+        depth = 0
+        while depth < 4 and isinstance(node.get(keys[depth]), dict):
+            node = node[keys[depth]]
+            depth += 1
+        if depth == 4:
+            value = routes  # the server exists without a route list
+        else:
+            for key in reversed(keys[depth + 1:4]):
+                value = {key: value}
+        resp = await client.put("/config/" + "/".join(keys[:depth + 1]), json=value)
+        resp.raise_for_status()
+        logger.info("Created Caddy server %r on :%d", _SERVER_NAME, self._listen_port)
+
+    # -- Helpers --
+
+    def _http(self) -> httpx.AsyncClient:
+        """The shared admin API client (keep-alive connections, created lazily)."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self._admin_url,
+                timeout=10,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=2),
+            )
+        return self._client
+
+    @staticmethod
+    def _route_id(slug: str) -> str:
+        return f"{_ROUTE_ID_PREFIX}{slug}"
+
+    def _route(self, slug: str, target: int | str) -> dict:
+        if isinstance(target, int):
+            handle = [
+                {
+                    "handler": "reverse_proxy",
+                    "upstreams": [{"dial": f"localhost:{target}"}],
                 }
-            }
+            ]
+        else:
+            handle = [{"handler": "subroute", "routes": _site_routes(target)}]
+        return {
+            "@id": self._route_id(slug),
+            "match": [{"host": [f"{slug}.{self._domain}"]}],
+            "handle": handle,
         }
+
+
+def _site_routes(root: str) -> list[dict]:
+    """``file_server`` for *root*: compressed, cached, SPA fallback to index.html."""
+    def cache_control(value: str) -> dict:
+        return {"handler": "headers", "response": {"set": {"Cache-Control": [value]}}}
+
+    return [
+        {"handle": [{"handler": "encode", "encodings": {"zstd": {}, "gzip": {}}, "prefer": ["zstd", "gzip"]}]},
+        {
+            "match": [{"path": _IMMUTABLE_PATHS}],
+            "handle": [cache_control("public, max-age=31536000, immutable")],
+        },
+        {
+            "match": [{"not": [{"path": _IMMUTABLE_PATHS}]}],
+            "handle": [cache_control("no-cache")],  # revalidated by ETag / Last-Modified
+        },
+        {
+            # Client-side routes: serve index.html for paths that aren't files
+            "match": [{"file": {"root": root, "try_files": ["{http.request.uri.path}", "/index.html"]}}],
+            "handle": [{"handler": "rewrite", "uri": "{http.matchers.file.relative}"}],
+        },
+        {"handle": [{"handler": "file_server", "root": root, "hide": [".*"]}]},
+    ]
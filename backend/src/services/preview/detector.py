@@ -1,8 +1,32 @@
-"""Auto-detect project framework and generate appropriate start commands."""
+"""Auto-detect project framework and generate appropriate start commands.
+
+A project is one or more services: a single dev server at the root, or —
+for monorepo layouts — one per runnable subdirectory (``frontend/`` and
+``backend/``, say), each started on its own port.
+
+Frameworks that can build a static site (Vite, CRA, statically exported
+Next.js) also get a ``build_cmd`` and the ``build_output`` directory it
+writes, for production previews; plain static projects are served as they
+are (``build_output`` ``"."``).
+
+Detection runs on every project listing, so results are cached per project
+directory. Every path a detection pass looks at — manifests it reads, and
+files or directories whose presence it checks — is recorded with its
+mtime and size (or as missing). Later calls only re-``stat`` those paths:
+an unchanged project costs a handful of ``stat`` calls, and creating,
+editing or deleting any of them re-runs detection.
+"""
 
 from __future__ import annotations
 
+import dataclasses
 import json
+import os
+import re
+import shutil
+import stat
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from pathlib import Path
 
@@ -10,175 +34,310 @@ from pathlib import Path
 @dataclass
 class DetectionResult:
     supported: bool
-    framework: str | None = None  # "nextjs", "vite", "cra", "fastapi", "flask", "static"
+    framework: str | None = None  # "nextjs", "vite", "cra", "node", "fastapi", "flask", "django", "static"
     start_cmd: list[str] = field(default_factory=list)
     install_cmd: list[str] | None = None
     needs_install: bool = False
     port_env: bool = False  # True if port is set via PORT env var instead of CLI flag
     subdir: str | None = None  # Subdirectory containing the framework (e.g. "frontend")
+    package_manager: str | None = None  # "npm", "pnpm", "yarn" or "bun" for Node projects
+    build_cmd: list[str] | None = None  # production build producing build_output
+    build_output: str | None = None  # static site directory, relative to the service's dir
 
 
 # Common subdirectory names to scan for monorepo layouts
 _SUBDIRS = ["frontend", "client", "web", "app", "backend", "server", "api", "src"]
 
+# Lockfile → package manager, checked in order
+_LOCKFILES = [
+    ("pnpm-lock.yaml", "pnpm"),
+    ("yarn.lock", "yarn"),
+    ("bun.lockb", "bun"),
+    ("bun.lock", "bun"),
+    ("package-lock.json", "npm"),
+]
+
+_CACHE_SIZE = 512
+
+# Path → (mtime_ns, size), or None when it doesn't exist
+_Signature = dict[str, "tuple[int, int] | None"]
+
+_cache: OrderedDict[str, tuple[_Signature, list[DetectionResult]]] = OrderedDict()
+_cache_lock = threading.Lock()  # detect() runs in executor threads
+
+
+class _Probe:
+    """Filesystem access for one detection pass, recording what was looked at."""
+
+    def __init__(self) -> None:
+        self.signature: _Signature = {}
+
+    def _stat(self, path: Path) -> os.stat_result | None:
+        try:
+            st = path.stat()
+        except OSError:
+            self.signature[str(path)] = None
+            return None
+        self.signature[str(path)] = (st.st_mtime_ns, st.st_size)
+        return st
+
+    def exists(self, path: Path) -> bool:
+        return self._stat(path) is not None
+
+    def is_dir(self, path: Path) -> bool:
+        st = self._stat(path)
+        return st is not None and stat.S_ISDIR(st.st_mode)
+
+    def read_text(self, path: Path) -> str | None:
+        if self._stat(path) is None:
+            return None
+        try:
+            return path.read_text()
+        except (OSError, UnicodeDecodeError):
+            return None
+
+
+def _unchanged(signature: _Signature) -> bool:
+    for path, expected in signature.items():
+        try:
+            st = os.stat(path)
+        except OSError:
+            current = None
+        else:
+            current = (st.st_mtime_ns, st.st_size)
+        if current != expected:
+            return False
+    return True
+
 
 def detect(project_path: Path) -> DetectionResult:
-    """Scan a project directory and return framework detection results.
+    """Scan a project directory and return its primary service.
 
-    First checks the project root, then scans common subdirectories for
-    monorepo layouts (e.g. ``frontend/``, ``backend/``).
+    That is the root's framework, or else the first runnable subdirectory
+    in ``_SUBDIRS`` order (frontends before backends). ``detect_services``
+    returns every service.
 
     The ``{port}`` placeholder in ``start_cmd`` is substituted at start time.
     """
+    services = detect_services(project_path)
+    return services[0] if services else DetectionResult(supported=False)
+
+
+def detect_services(project_path: Path) -> list[DetectionResult]:
+    """Every runnable service in a project, primary first; empty if none.
+
+    A supported root is the whole project — its scripts are expected to
+    drive any subpackages. Otherwise each supported subdirectory of
+    ``_SUBDIRS`` is a service with ``subdir`` set.
+
+    Results are cached until one of the files they were derived from changes.
+    """
+    key = str(project_path)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and _unchanged(cached[0]):
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+        return [dataclasses.replace(r) for r in cached[1]]
+
+    probe = _Probe()
+    services = _detect(probe, project_path)
+    with _cache_lock:
+        _cache[key] = (probe.signature, services)
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return [dataclasses.replace(r) for r in services]
+
+
+def _detect(probe: _Probe, project_path: Path) -> list[DetectionResult]:
     # Try root first
-    result = _detect_in(project_path)
+    result = _detect_in(probe, project_path)
     if result.supported:
-        return result
+        return [result]
 
     # Scan common subdirectories
+    services = []
     for subdir in _SUBDIRS:
         sub_path = project_path / subdir
-        if sub_path.is_dir():
-            result = _detect_in(sub_path)
+        if probe.is_dir(sub_path):
+            result = _detect_in(probe, sub_path)
             if result.supported:
                 result.subdir = subdir
-                return result
-
-    return DetectionResult(supported=False)
+                services.append(result)
+    return services
 
 
-def _detect_in(scan_path: Path) -> DetectionResult:
+def _detect_in(probe: _Probe, scan_path: Path) -> DetectionResult:
     """Detect framework within a single directory."""
-    pkg_json = scan_path / "package.json"
-
     # --- Node.js projects ---
-    if pkg_json.exists():
+    pkg_text = probe.read_text(scan_path / "package.json")
+    if pkg_text is not None:
         try:
-            pkg = json.loads(pkg_json.read_text())
-        except (json.JSONDecodeError, OSError):
+            pkg = json.loads(pkg_text)
+        except json.JSONDecodeError:
             return DetectionResult(supported=False)
-
-        deps = {
-            *pkg.get("dependencies", {}).keys(),
-            *pkg.get("devDependencies", {}).keys(),
-        }
-        scripts = pkg.get("scripts", {})
-        needs_install = not (scan_path / "node_modules").is_dir()
-        install_cmd = ["npm", "install"] if needs_install else None
-
-        if "next" in deps:
-            return DetectionResult(
-                supported=True,
-                framework="nextjs",
-                start_cmd=["npm", "run", "dev", "--", "-p", "{port}"],
-                install_cmd=install_cmd,
-                needs_install=needs_install,
-            )
-
-        if "vite" in deps:
-            return DetectionResult(
-                supported=True,
-                framework="vite",
-                start_cmd=["npm", "run", "dev", "--", "--port", "{port}"],
-                install_cmd=install_cmd,
-                needs_install=needs_install,
-            )
-
-        if "react-scripts" in deps:
-            return DetectionResult(
-                supported=True,
-                framework="cra",
-                start_cmd=["npm", "start"],
-                install_cmd=install_cmd,
-                needs_install=needs_install,
-                port_env=True,
-            )
-
-        # Generic Node project with a dev or start script
-        if "dev" in scripts:
-            return DetectionResult(
-                supported=True,
-                framework="node",
-                start_cmd=["npm", "run", "dev"],
-                install_cmd=install_cmd,
-                needs_install=needs_install,
-                port_env=True,
-            )
-        if "start" in scripts:
-            return DetectionResult(
-                supported=True,
-                framework="node",
-                start_cmd=["npm", "start"],
-                install_cmd=install_cmd,
-                needs_install=needs_install,
-                port_env=True,
-            )
+        result = _detect_node(probe, scan_path, pkg)
+        if result is not None:
+            return result
 
     # --- Python projects ---
-    requirements = scan_path / "requirements.txt"
-    pyproject = scan_path / "pyproject.toml"
-    req_text = ""
-    if requirements.exists():
-        try:
-            req_text = requirements.read_text().lower()
-        except OSError:
-            pass
-    elif pyproject.exists():
-        try:
-            req_text = pyproject.read_text().lower()
-        except OSError:
-            pass
+    req_text = "\n".join(
+        text.lower()
+        for text in (
+            probe.read_text(scan_path / "requirements.txt"),
+            probe.read_text(scan_path / "pyproject.toml"),
+        )
+        if text
+    )
+
+    if probe.exists(scan_path / "manage.py") and ("django" in req_text or not req_text):
+        return DetectionResult(
+            supported=True,
+            framework="django",
+            start_cmd=["python", "manage.py", "runserver", "127.0.0.1:{port}"],
+        )
 
     if req_text:
         if "fastapi" in req_text:
-            # Try to find the main app module
-            app_module = _find_fastapi_app(scan_path)
-            return DetectionResult(
-                supported=True,
-                framework="fastapi",
-                start_cmd=[
-                    "uvicorn", app_module, "--port", "{port}", "--reload",
-                ],
-            )
+            app_ref, factory = _find_app(probe, scan_path, "FastAPI")
+            cmd = ["uvicorn", app_ref or "main:app", "--port", "{port}", "--reload"]
+            if factory:
+                cmd.append("--factory")
+            return DetectionResult(supported=True, framework="fastapi", start_cmd=cmd)
         if "flask" in req_text:
+            cmd = ["flask"]
+            # Without --app, flask only finds app.py / wsgi.py
+            if not (probe.exists(scan_path / "app.py") or probe.exists(scan_path / "wsgi.py")):
+                app_ref, factory = _find_app(probe, scan_path, "Flask")
+                if app_ref:
+                    cmd += ["--app", f"{app_ref}()" if factory else app_ref]
             return DetectionResult(
                 supported=True,
                 framework="flask",
-                start_cmd=["flask", "run", "--port", "{port}"],
+                start_cmd=[*cmd, "run", "--port", "{port}"],
             )
 
     # --- Static HTML ---
-    if (scan_path / "index.html").exists():
+    if probe.exists(scan_path / "index.html"):
         return DetectionResult(
             supported=True,
             framework="static",
             start_cmd=["python", "-m", "http.server", "{port}"],
+            build_output=".",
         )
 
     return DetectionResult(supported=False)
 
 
-def _find_fastapi_app(project_path: Path) -> str:
-    """Try to locate the FastAPI app entry point."""
-    # Check common patterns
-    for candidate in [
-        "src/main.py",
-        "main.py",
-        "app/main.py",
-        "app.py",
-        "src/app.py",
-    ]:
-        full = project_path / candidate
-        if full.exists():
-            try:
-                content = full.read_text()
-            except OSError:
-                continue
-            if "FastAPI" in content or "fastapi" in content:
-                module = candidate.removesuffix(".py").replace("/", ".")
-                # Try to detect the variable name
-                if "app = FastAPI" in content or "app=FastAPI" in content:
-                    return f"{module}:app"
-                # Default to :app
-                return f"{module}:app"
-    return "main:app"
+def _detect_node(probe: _Probe, scan_path: Path, pkg: dict) -> DetectionResult | None:
+    deps = {
+        *pkg.get("dependencies", {}).keys(),
+        *pkg.get("devDependencies", {}).keys(),
+    }
+    scripts = pkg.get("scripts", {})
+    pm = _package_manager(probe, scan_path, pkg)
+    needs_install = not probe.is_dir(scan_path / "node_modules")
+    common = {
+        "supported": True,
+        "install_cmd": [pm, "install"] if needs_install else None,
+        "needs_install": needs_install,
+        "package_manager": pm,
+    }
+
+    build_cmd = _run_script(pm, "build") if "build" in scripts else None
+
+    if "next" in deps:
+        # Only a static export can be served without `next start`
+        exported = build_cmd is not None and _next_static_export(probe, scan_path)
+        return DetectionResult(
+            framework="nextjs", start_cmd=_run_script(pm, "dev", "-p", "{port}"),
+            build_cmd=build_cmd if exported else None,
+            build_output="out" if exported else None,
+            **common,
+        )
+    if "vite" in deps:
+        return DetectionResult(
+            framework="vite", start_cmd=_run_script(pm, "dev", "--port", "{port}"),
+            build_cmd=build_cmd, build_output="dist" if build_cmd else None, **common,
+        )
+    if "react-scripts" in deps:
+        return DetectionResult(
+            framework="cra", start_cmd=_run_script(pm, "start"), port_env=True,
+            build_cmd=build_cmd, build_output="build" if build_cmd else None, **common,
+        )
+    # Generic Node project with a dev or start script
+    for script in ("dev", "start"):
+        if script in scripts:
+            return DetectionResult(
+                framework="node", start_cmd=_run_script(pm, script), port_env=True, **common,
+            )
+    return None
+
+
+_NEXT_EXPORT_RE = re.compile(r"""output\s*:\s*["']export["']""")
+
+
+def _next_static_export(probe: _Probe, scan_path: Path) -> bool:
+    """Whether next.config sets ``output: "export"`` (``next build`` writes ``out/``)."""
+    for name in ("next.config.js", "next.config.mjs", "next.config.ts"):
+        text = probe.read_text(scan_path / name)
+        if text is not None:
+            return _NEXT_EXPORT_RE.search(text) is not None
+    return False
+
+
+def _package_manager(probe: _Probe, scan_path: Path, pkg: dict) -> str:
+    """The project's package manager, if it's installed here; npm otherwise."""
+    pm = None
+    declared = pkg.get("packageManager")  # corepack: "pnpm@9.1.0"
+    if isinstance(declared, str):
+        pm = declared.partition("@")[0] or None
+    if pm is None:
+        pm = next((m for name, m in _LOCKFILES if probe.exists(scan_path / name)), "npm")
+    if pm not in ("npm", "pnpm", "yarn", "bun") or shutil.which(pm) is None:
+        return "npm"
+    return pm
+
+
+def _run_script(pm: str, script: str, *args: str) -> list[str]:
+    if script == "start" and not args:
+        return [pm, "start"]
+    if pm == "npm" and args:
+        return ["npm", "run", script, "--", *args]  # npm needs -- to forward flags
+    return [pm, "run", script, *args]
+
+
+# Python entrypoints, most specific first
+_APP_CANDIDATES = [
+    "src/main.py",
+    "main.py",
+    "app/main.py",
+    "app.py",
+    "src/app.py",
+    "server.py",
+    "api.py",
+    "app/__init__.py",
+    "wsgi.py",
+    "asgi.py",
+]
+
+
+def _find_app(probe: _Probe, project_path: Path, cls: str) -> tuple[str | None, bool]:
+    """Locate a FastAPI/Flask app: ``("module:attr", is_factory)``, or ``(None, False)``."""
+    assignment = re.compile(rf"^(\w+)\s*(?::[^=]+)?=\s*{cls}\(", re.MULTILINE)
+    factory = re.compile(r"^def (create_app|make_app|get_app)\(", re.MULTILINE)
+    for candidate in _APP_CANDIDATES:
+        content = probe.read_text(project_path / candidate)
+        if not content or cls not in content:
+            continue
+        module = candidate.removesuffix(".py").removesuffix("/__init__").replace("/", ".")
+        match = assignment.search(content)
+        if match:
+            return f"{module}:{match.group(1)}", False
+        match = factory.search(content)
+        if match:
+            return f"{module}:{match.group(1)}", True
+        return f"{module}:app", False
+    return None, False
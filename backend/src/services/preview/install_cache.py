@@ -0,0 +1,255 @@
+"""Shared, content-addressed ``node_modules`` cache for preview installs.
+
+Projects created from the same template or cloned from the same repo share
+a lockfile, so they need byte-identical ``node_modules`` trees. The first
+install for a lockfile runs normally (``npm ci`` / ``pnpm install`` /
+``yarn install`` / ``bun install`` with a frozen lockfile, against a shared
+download cache so even misses mostly avoid the network); the result is then
+stored under ``settings.preview_install_cache_dir/<key>``. Later installs
+with the same key hard-link that tree into the project instead of
+installing — seconds instead of minutes.
+
+The key hashes the lockfile together with the Node version and platform,
+since native modules are built for both. Only directories are created per
+project; files are shared inodes. Packages that rewrite their own files in
+place after install would affect every project using the entry — in
+practice patch-style rewrites happen in ``postinstall``, before the tree is
+stored.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import errno
+import hashlib
+import logging
+import os
+import platform
+import shutil
+import time
+from pathlib import Path
+
+from ...core.config import settings
+from ...core.exceptions import PreviewStartError
+from ...core.metrics import metrics
+from ..processes.log_buffer import LogRingBuffer
+from ..processes.process_groups import terminate_group
+
+logger = logging.getLogger(__name__)
+
+INSTALL_TIMEOUT = 120  # seconds
+
+# Lockfile → frozen install command, in order of preference
+_LOCKFILES: tuple[tuple[str, list[str]], ...] = (
+    ("package-lock.json", ["npm", "ci", "--prefer-offline", "--no-audit", "--no-fund"]),
+    ("npm-shrinkwrap.json", ["npm", "ci", "--prefer-offline", "--no-audit", "--no-fund"]),
+    ("pnpm-lock.yaml", ["pnpm", "install", "--frozen-lockfile", "--prefer-offline"]),
+    ("yarn.lock", ["yarn", "install", "--frozen-lockfile", "--prefer-offline"]),
+    ("bun.lockb", ["bun", "install", "--frozen-lockfile"]),
+    ("bun.lock", ["bun", "install", "--frozen-lockfile"]),
+)
+
+# For projects without a lockfile, or whose lockfile's tool isn't installed
+_NPM_INSTALL = ["npm", "install", "--prefer-offline", "--no-audit", "--no-fund"]
+
+_INSTALLS = metrics.counter(
+    "casperbot_preview_installs_total",
+    "Preview dependency installs by install-cache result (hit, miss, uncached, failed)",
+    labels=("result",),
+)
+_INSTALL_SECONDS = metrics.histogram(
+    "casperbot_preview_install_seconds",
+    "Time to provide a preview's node_modules, by install-cache result",
+    labels=("result",),
+)
+
+
+class InstallCache:
+    def __init__(self) -> None:
+        self._locks: dict[str, asyncio.Lock] = {}  # one install per key at a time
+        self._runtime: str | None = None
+
+    async def install(
+        self, work_dir: Path, fallback_cmd: list[str], log: LogRingBuffer, prefix: str = "",
+    ) -> str:
+        """Provide ``work_dir/node_modules``, streaming progress into *log*.
+
+        Every line is prefixed with *prefix* (the service name, when several
+        install into one log). Returns the cache result: ``hit``, ``miss`` or ``uncached`` (no
+        lockfile — *fallback_cmd* runs — or no tool for it — ``npm install``
+        runs — and nothing is stored). Raises
+        ``PreviewStartError`` when the install fails or times out.
+        """
+        started = time.monotonic()
+        try:
+            result = await self._install(work_dir, fallback_cmd, log, prefix)
+        except Exception:
+            _INSTALLS.inc("failed")
+            raise
+        elapsed = time.monotonic() - started
+        _INSTALLS.inc(result)
+        _INSTALL_SECONDS.observe(elapsed, result)
+        log.append("install", f"{prefix}[install] node_modules ready in {elapsed:.1f}s (cache {result})")
+        logger.info("Preview install in %s: cache %s, %.1fs", work_dir, result, elapsed)
+        return result
+
+    async def _install(
+        self, work_dir: Path, fallback_cmd: list[str], log: LogRingBuffer, prefix: str,
+    ) -> str:
+        lockfile = _find_lockfile(work_dir)
+        if lockfile is None:
+            cmd = _NPM_INSTALL if fallback_cmd[:2] == ["npm", "install"] else fallback_cmd
+            await _run(cmd, work_dir, log, prefix)
+            return "uncached"
+
+        name, cmd = lockfile
+        if shutil.which(cmd[0]) is None:
+            # npm ci needs a package-lock.json, and what npm install resolves
+            # isn't what *name* pins — so nothing is stored under its hash
+            log.append("install", f"{prefix}[install] {cmd[0]} not found, installing with npm")
+            await _run(_NPM_INSTALL, work_dir, log, prefix)
+            return "uncached"
+        key = await self._key(work_dir / name)
+        entry = settings.preview_install_cache_dir / key
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if entry.is_dir():
+                log.append("install", f"{prefix}[install] Linking cached node_modules for {name} ({key[:12]})")
+                await asyncio.to_thread(_link_tree, entry / "node_modules", work_dir / "node_modules")
+                os.utime(entry)  # recently used, for eviction
+                return "hit"
+
+            log.append("install", f"{prefix}[install] No cached node_modules for {name} ({key[:12]}), installing")
+            await _run(cmd, work_dir, log, prefix)
+            try:
+                await asyncio.to_thread(_store, work_dir / "node_modules", entry)
+                await asyncio.to_thread(_evict, settings.preview_install_cache_entries)
+            except OSError as exc:
+                logger.warning("Could not cache node_modules for %s: %s", work_dir, exc)
+            return "miss"
+
+    async def _key(self, lockfile: Path) -> str:
+        if self._runtime is None:
+            self._runtime = f"{await _node_version()}|{platform.system()}|{platform.machine()}"
+        digest = hashlib.sha256(self._runtime.encode())
+        digest.update(lockfile.name.encode() + b"\0")
+        digest.update(await asyncio.to_thread(lockfile.read_bytes))
+        return digest.hexdigest()[:40]
+
+
+def _find_lockfile(work_dir: Path) -> tuple[str, list[str]] | None:
+    for name, cmd in _LOCKFILES:
+        if (work_dir / name).is_file():
+            return name, cmd
+    return None
+
+
+def _install_env() -> dict[str, str]:
+    """Environment for installs: one shared download cache per package manager."""
+    cache = settings.preview_package_cache_dir
+    env = {
+        **os.environ,
+        "npm_config_cache": str(cache / "npm"),
+        "npm_config_store_dir": str(cache / "pnpm"),
+        "YARN_CACHE_FOLDER": str(cache / "yarn"),
+        "BUN_INSTALL_CACHE_DIR": str(cache / "bun"),
+    }
+    env.pop("CLAUDECODE", None)
+    env.pop("ANTHROPIC_API_KEY", None)
+    return env
+
+
+async def _node_version() -> str:
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "node", "--version",
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+        out, _ = await proc.communicate()
+        return out.decode().strip() or "node-unknown"
+    except OSError:
+        return "node-unknown"
+
+
+async def _run(cmd: list[str], work_dir: Path, log: LogRingBuffer, prefix: str) -> None:
+    """Run an install command, appending its output to *log* as it arrives."""
+    log.append("install", f"{prefix}[install] $ {' '.join(cmd)}")
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=str(work_dir),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            env=_install_env(),
+            start_new_session=True,
+        )
+    except OSError as exc:
+        raise PreviewStartError(f"Failed to run {cmd[0]}: {exc}")
+
+    async def pump() -> None:
+        assert proc.stdout
+        async for raw_line in proc.stdout:
+            log.append("install", prefix + raw_line.decode("utf-8", errors="replace").rstrip("\n"))
+        await proc.wait()
+
+    try:
+        await asyncio.wait_for(pump(), timeout=INSTALL_TIMEOUT)
+    except asyncio.TimeoutError:
+        await terminate_group(proc, grace_seconds=5.0)
+        raise PreviewStartError(f"{cmd[0]} install timed out")
+    except asyncio.CancelledError:
+        # Its own session and not with the reaper — it would outlive us
+        await terminate_group(proc, grace_seconds=5.0)
+        raise
+    if proc.returncode != 0:
+        raise PreviewStartError(f"{' '.join(cmd[:2])} failed (exit code {proc.returncode})")
+
+
+def _link_tree(src: Path, dst: Path) -> None:
+    """Recreate *src* at *dst*: new directories, hard-linked files, copied symlinks.
+
+    Falls back to copying files when *src* and *dst* are on different filesystems.
+    """
+    link = os.link
+    for root, dirs, files in os.walk(src):
+        rel = os.path.relpath(root, src)
+        target = dst if rel == "." else dst / rel
+        target.mkdir(parents=True, exist_ok=True)
+        for name in dirs + files:
+            source = os.path.join(root, name)
+            if os.path.islink(source):
+                # Relative links (.bin entries, pnpm's virtual store) stay valid
+                os.symlink(os.readlink(source), target / name)
+            elif name in files:
+                try:
+                    link(source, target / name)
+                except OSError as exc:
+                    if exc.errno != errno.EXDEV:
+                        raise
+                    link = shutil.copy2
+                    link(source, target / name)
+
+
+def _store(node_modules: Path, entry: Path) -> None:
+    """Add a freshly installed tree to the cache (atomically, by rename)."""
+    if not node_modules.is_dir():
+        return
+    tmp = entry.with_name(f"{entry.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    _link_tree(node_modules, tmp / "node_modules")
+    try:
+        os.rename(tmp, entry)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)  # another worker stored it first
+
+
+def _evict(max_entries: int) -> None:
+    """Drop the least recently used entries beyond *max_entries*."""
+    root = settings.preview_install_cache_dir
+    entries = sorted(
+        (p for p in root.iterdir() if p.is_dir() and ".tmp-" not in p.name),
+        key=lambda p: p.stat().st_mtime,
+    )
+    for stale in entries[:max(0, len(entries) - max_entries)]:
+        shutil.rmtree(stale, ignore_errors=True)
+        logger.info("Evicted install cache entry %s", stale.name)
@@ -0,0 +1,59 @@
+"""Server-side filtering of preview log lines by level and pattern.
+
+Dev servers don't emit structured levels, so a line's level is inferred
+from its wording — enough to pull compile errors and warnings out of a
+chatty HMR log without shipping every line to the browser.
+"""
+
+from __future__ import annotations
+
+import re
+
+from ...core.exceptions import InvalidLogFilterError
+
+LEVELS = ("info", "warn", "error")
+
+_ANSI_RE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+_ERROR_RE = re.compile(
+    r"\b(error|errors|err!|fatal|exception|traceback|failed|panic)\b|✘|✖", re.IGNORECASE,
+)
+_WARN_RE = re.compile(r"\b(warn|warning|warnings|deprecated|deprecation)\b|⚠", re.IGNORECASE)
+_MAX_PATTERN_CHARS = 200
+
+
+def level_of(line: str) -> str:
+    if _ERROR_RE.search(line):
+        return "error"
+    if _WARN_RE.search(line):
+        return "warn"
+    return "info"
+
+
+class LogFilter:
+    """Matches log entries at or above *level* whose text contains *pattern* (a regex)."""
+
+    def __init__(self, level: str | None = None, pattern: str | None = None) -> None:
+        if level is not None and level not in LEVELS:
+            raise InvalidLogFilterError(f"level must be one of {', '.join(LEVELS)}")
+        self._min_level = LEVELS.index(level) if level else 0
+        self._pattern = None
+        if pattern:
+            if len(pattern) > _MAX_PATTERN_CHARS:
+                raise InvalidLogFilterError("Filter pattern is too long")
+            try:
+                self._pattern = re.compile(pattern, re.IGNORECASE)
+            except re.error as exc:
+                raise InvalidLogFilterError(f"Invalid filter pattern: {exc}")
+
+    def apply(self, entries: list[dict]) -> list[dict]:
+        """The matching entries, each with its ``level`` added."""
+        result = []
+        for entry in entries:
+            text = _ANSI_RE.sub("", entry["line"])
+            level = level_of(text)
+            if LEVELS.index(level) < self._min_level:
+                continue
+            if self._pattern is not None and not self._pattern.search(text):
+                continue
+            result.append({**entry, "level": level})
+        return result
@@ -0,0 +1,203 @@
+"""Preview port allocation.
+
+Each preview service — a project's primary dev server (``service`` ``''``)
+or another subdirectory of a monorepo — keeps its port across stops and
+restarts (and backend restarts): a reservation in the ``previews`` table
+outlives the dev server, so bookmarks, OAuth redirect URIs and CORS settings
+pointing at ``localhost:<port>`` keep working. Rows with a ``pid`` are
+running; rows without are idle reservations.
+
+Never-reserved ports sit in an in-memory free list built once at startup,
+so allocation is O(1) regardless of how many projects hold ports. Before a
+port is handed out it is bind-tested: something outside CasperBot (or an
+orphaned dev server) may be listening on it. A busy port is set aside for
+a while and the next one tried. When the free list runs dry, the least
+recently used idle reservation of another project is taken over.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import errno
+import logging
+import os
+import socket
+import sqlite3
+import time
+from collections import deque
+
+from ...core.config import settings
+from ...core.database import db
+from ...core.exceptions import PreviewStartError
+
+logger = logging.getLogger(__name__)
+
+_Key = tuple[str, str]  # (project_id, service)
+
+_BUSY_RETRY_SECONDS = 300  # ports found in use by someone else are skipped this long
+
+
+class PortAllocator:
+    def __init__(self) -> None:
+        self._by_key: dict[_Key, int] = {}
+        self._owners: dict[int, _Key] = {}  # port → (project_id, service)
+        self._free: deque[int] = deque()
+        self._busy: dict[int, float] = {}  # port → when it was found in use
+        self._lock = asyncio.Lock()
+
+    async def startup(self) -> None:
+        """Load reservations and reclaim those left by dead preview processes."""
+        lo, hi = settings.preview_port_start, settings.preview_port_end
+        async with db.conn.execute("SELECT project_id, service, port, pid FROM previews") as cur:
+            rows = await cur.fetchall()
+        out_of_range, dead = [], []
+        for row in rows:
+            key = (row["project_id"], row["service"])
+            if not lo <= row["port"] <= hi:
+                out_of_range.append(key)
+                continue
+            self._by_key[key] = row["port"]
+            self._owners[row["port"]] = key
+            if row["pid"] is not None and not _pid_alive(row["pid"]):
+                dead.append(key)
+        if out_of_range:
+            await db.conn.executemany(
+                "DELETE FROM previews WHERE project_id = ? AND service = ?", out_of_range,
+            )
+        if dead:
+            await db.conn.executemany(
+                "UPDATE previews SET pid = NULL WHERE project_id = ? AND service = ?", dead,
+            )
+        await db.conn.commit()
+        self._free = deque(p for p in range(lo, hi + 1) if p not in self._owners)
+        logger.info(
+            "Preview ports: %d reserved, %d free, %d reclaimed from dead processes, "
+            "%d dropped outside %d-%d",
+            len(self._owners), len(self._free), len(dead), len(out_of_range), lo, hi,
+        )
+
+    async def acquire(self, project_id: str, service: str = "") -> int:
+        """The service's port, reserving one if it has none. It is free to bind."""
+        key = (project_id, service)
+        async with self._lock:
+            port = self._by_key.get(key)
+            if port is not None:
+                if await asyncio.to_thread(_can_bind, port):
+                    await self._touch(key)
+                    return port
+                logger.warning(
+                    "Port %d reserved for project %s%s is in use by another process; moving it",
+                    port, project_id, f" ({service})" if service else "",
+                )
+                self._busy[port] = time.monotonic()
+                await self._drop(key)
+
+            for _ in range(settings.preview_port_end - settings.preview_port_start + 1):
+                port = await self._next_candidate(project_id)
+                if not await asyncio.to_thread(_can_bind, port):
+                    self._busy[port] = time.monotonic()
+                    continue
+                try:
+                    await db.conn.execute(
+                        """INSERT INTO previews (project_id, service, port, framework, start_cmd, last_used_at)
+                           VALUES (?, ?, ?, '', '[]', ?)""",
+                        (project_id, service, port, time.time()),
+                    )
+                    await db.conn.commit()
+                except sqlite3.IntegrityError:
+                    continue  # another worker reserved it meanwhile
+                self._by_key[key] = port
+                self._owners[port] = key
+                return port
+            raise PreviewStartError("No available ports in preview range")
+
+    async def mark_running(
+        self, project_id: str, service: str, pid: int, framework: str, start_cmd: str,
+    ) -> None:
+        await db.conn.execute(
+            """UPDATE previews SET pid = ?, framework = ?, start_cmd = ?, last_used_at = ?
+               WHERE project_id = ? AND service = ?""",
+            (pid, framework, start_cmd, time.time(), project_id, service),
+        )
+        await db.conn.commit()
+
+    async def mark_stopped(self, project_id: str) -> None:
+        """The project's dev servers are gone; their ports stay reserved."""
+        await db.conn.execute(
+            "UPDATE previews SET pid = NULL WHERE project_id = ?", (project_id,),
+        )
+        await db.conn.commit()
+
+    async def _next_candidate(self, project_id: str) -> int:
+        if self._free:
+            return self._free.popleft()
+        # Ports found busy a while ago may have been freed since
+        now = time.monotonic()
+        retry = [p for p, t in self._busy.items() if now - t > _BUSY_RETRY_SECONDS]
+        for port in retry:
+            del self._busy[port]
+            self._free.append(port)
+        if self._free:
+            return self._free.popleft()
+        # Take over the least recently used idle reservation — of another
+        # project: this one's idle services are about to start alongside
+        async with db.conn.execute(
+            """SELECT project_id, service FROM previews
+               WHERE pid IS NULL AND project_id != ?
+               ORDER BY last_used_at LIMIT 1""",
+            (project_id,),
+        ) as cur:
+            row = await cur.fetchone()
+        if row is None:
+            raise PreviewStartError("No available ports in preview range")
+        port = await self._drop((row["project_id"], row["service"]))
+        logger.info("Reclaimed port %d from idle project %s", port, row["project_id"])
+        return port
+
+    async def _drop(self, key: _Key) -> int:
+        """Delete a service's reservation; returns the port it held."""
+        port = self._by_key.pop(key)
+        self._owners.pop(port, None)
+        await db.conn.execute(
+            "DELETE FROM previews WHERE project_id = ? AND service = ?", key,
+        )
+        await db.conn.commit()
+        return port
+
+    async def _touch(self, key: _Key) -> None:
+        await db.conn.execute(
+            "UPDATE previews SET last_used_at = ? WHERE project_id = ? AND service = ?",
+            (time.time(), *key),
+        )
+        await db.conn.commit()
+
+
+def _can_bind(port: int) -> bool:
+    """Whether a dev server could listen on *port* on every interface right now."""
+    for family, host in ((socket.AF_INET, "0.0.0.0"), (socket.AF_INET6, "::")):
+        try:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+        except OSError:
+            continue  # no IPv6 on this host
+        with sock:
+            # TIME_WAIT leftovers from a previous run don't block a new server
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if family == socket.AF_INET6:
+                sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+            try:
+                sock.bind((host, port))
+            except OSError as exc:
+                if exc.errno == errno.EADDRNOTAVAIL:
+                    continue
+                return False
+    return True
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by someone else
+    return True
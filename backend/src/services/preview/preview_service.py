@@ -1,4 +1,47 @@
-"""Manage live preview dev-server subprocesses for user projects."""
+"""Manage live preview dev-server subprocesses for user projects.
+
+A preview runs one dev server per service the detector finds: just one for
+most projects, or e.g. ``frontend/`` and ``backend/`` for a monorepo. They
+install and start in parallel, each on its own port and Caddy route — the
+primary service at ``<slug>.<domain>``, the others at
+``<subdir>.<slug>.<domain>`` — and share one log (lines tagged with the
+service) and one readiness gate: the preview is ready once all of them are.
+
+A preview is ``starting`` from spawn until the dev server is known to serve —
+its ready banner shows up in the log or its port accepts a connection (see
+``readiness``) — then ``ready``. It ends up ``error`` if the process exits or
+times out before that, and ``stopped`` if it exits afterwards.
+
+Idle previews are put away in two tiers, by time since their port last saw
+traffic (see ``activity``): after ``preview_freeze_idle_minutes`` the process
+group is frozen with SIGSTOP — no CPU, memory kept — and thawed with SIGCONT
+as soon as a request arrives for it; after ``preview_auto_stop_minutes`` it
+is stopped. When previews together use more than ``preview_memory_budget_mb``,
+the least recently used are stopped early.
+
+While an agent turn runs in a project (``TaskManager`` calls
+``agent_turn_started`` / ``agent_turn_ended``), its dev servers are frozen the
+same way: a turn writes files in bursts, and a watching dev server would
+rebuild after every write, competing with the agent for CPU. File-change
+events queue up in the kernel meanwhile, so when the turn ends the thawed
+watcher sees them all at once and rebuilds — and reloads the page — once.
+A request for the preview during the turn thaws it early, as for idle ones,
+and the pause never lasts longer than ``preview_agent_pause_max_seconds``:
+past that the server resumes and rebuilds as the turn goes on. The cap also
+bounds how many events pile up. Each inotify instance queues at most
+``fs.inotify.max_queued_events`` (16384 by default); beyond that the kernel
+drops events and reports a single overflow, after which chokidar (Vite,
+Next.js, CRA) and watchfiles (uvicorn, Django) may miss changes until the
+next edit to the same files or a restart of the preview.
+
+A production preview (``mode="production"``) builds every service that can
+produce a static site and has Caddy serve the build (see ``build_cache``)
+instead of running its dev server; other services, such as an API, still
+run theirs. Builds are cached by source hash, so an unchanged project starts
+without building. When an agent turn ends the sources are hashed again and
+changed sites rebuilt in the background, the previous build being served
+until the new one is ready.
+"""
 
 from __future__ import annotations
 
@@ -6,71 +49,195 @@ import asyncio
 import json
 import logging
 import os
-from collections import deque
+import re
+import signal
+import time
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 
 from ...core.config import settings
 from ...core.database import db
+from ...core.metrics import metrics
 from ...core.exceptions import (
     PreviewAlreadyRunningError,
     PreviewNotFoundError,
     PreviewNotSupportedError,
     PreviewStartError,
 )
+from ..processes.log_buffer import LogArchive, LogRingBuffer
+from ..processes.process_groups import group_rss_bytes, signal_group, terminate_group
+from ..processes.process_reaper import ProcessReaper
+from ..processes.resource_limits import ResourceSandbox, preview_limits
+from . import activity, readiness
+from .build_cache import BuildCache, source_key
 from .caddy_client import CaddyClient
-from .detector import DetectionResult, detect
+from .detector import DetectionResult, detect, detect_services
+from .install_cache import InstallCache
+from .port_allocator import PortAllocator
 
 logger = logging.getLogger(__name__)
 
-MAX_LOG_LINES = 500
-INSTALL_TIMEOUT = 120  # seconds
+MAX_LOG_LINES = 2000  # in memory; the archive file keeps more
+_IDLE_CHECK_SECONDS = 15
+_WAKE_POLL_SECONDS = 0.1  # how often frozen previews' ports are checked for requests
+# Frameworks whose dev server watches files and rebuilds or reloads on change
+_WATCHING_FRAMEWORKS = {"vite", "nextjs", "cra", "node", "fastapi", "django"}
+
+_READY_SECONDS = metrics.histogram(
+    "casperbot_preview_ready_seconds",
+    "Time from dev server spawn until it serves, by framework and first signal (log or port)",
+    labels=("framework", "signal"),
+)
+_HIBERNATION = metrics.counter(
+    "casperbot_preview_hibernation_total",
+    "Idle preview transitions: freeze, thaw, idle_stop, budget_stop, agent_pause, "
+    "agent_resume, agent_pause_expired",
+    labels=("action",),
+)
 
 
 @dataclass
-class RunningPreview:
+class DevServer:
+    """One service's dev server within a preview."""
+
     project_id: str
-    slug: str
+    name: str  # its subdirectory, or "" when the project runs from its root
+    primary: bool
+    host: str  # Caddy host label: "<slug>", or "<name>.<slug>" for other services
     port: int
     framework: str
     process: asyncio.subprocess.Process
-    log_buffer: deque = field(default_factory=lambda: deque(maxlen=MAX_LOG_LINES))
-    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    sandbox: ResourceSandbox | None = None
+    log_prefix: str = ""  # "[name] " when several services share the log
+    status: str = "starting"  # → "ready" or "error"
+    error: str | None = None
+    ready_ms: int | None = None  # spawn → ready
+    ready_signal: str | None = None  # "log" or "port"
+    spawned_at: float = field(default_factory=time.monotonic)
+    last_active: float = field(default_factory=time.monotonic)  # last traffic on the port
+    frozen: bool = False
+    agent_paused: bool = False  # frozen for the length of an agent turn (capped)
+    paused_at: float = 0.0
+    log_ready: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
     _reader_task: asyncio.Task | None = field(default=None, repr=False)
 
+    @property
+    def service(self) -> str:
+        """Port reservation key: "" for the primary service, else its name."""
+        return "" if self.primary else self.name
+
+    @property
+    def label(self) -> str:
+        return f"{self.project_id} ({self.name})" if self.name else self.project_id
+
+
+@dataclass
+class StaticSite:
+    """A service's static build, served by Caddy (production previews)."""
+
+    project_id: str
+    name: str
+    primary: bool
+    host: str
+    framework: str
+    work_dir: Path
+    detection: DetectionResult  # what to rebuild with
+    root: Path  # the directory Caddy serves
+    env: dict[str, str] = field(default_factory=dict, repr=False)  # the build's
+    log_prefix: str = ""
+    key: str | None = None  # build cache entry; None when the sources are served as they are
+    build_cache: str | None = None  # "hit" or "miss"
+    build_ms: int | None = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.project_id} ({self.name})" if self.name else self.project_id
+
+
+@dataclass
+class RunningPreview:
+    """A project's dev servers, started and stopped together."""
+
+    project_id: str
+    slug: str
+    log_buffer: LogRingBuffer
+    mode: str = "dev"  # or "production"
+    servers: list[DevServer] = field(default_factory=list)  # in detection order, once started
+    sites: list[StaticSite] = field(default_factory=list)  # production builds, likewise
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    status: str = "starting"  # → "ready" once every server is, or "error"
+    error: str | None = None
+    ready_ms: int | None = None  # spawn → the last server ready
+    settled: asyncio.Event = field(default_factory=asyncio.Event, repr=False)  # no longer starting
+    _ready_task: asyncio.Task | None = field(default=None, repr=False)
+    _open_readers: int = field(default=0, repr=False)  # the log closes when this drops to 0
+    _rebuild_task: asyncio.Task | None = field(default=None, repr=False)
+    _rebuild_again: bool = field(default=False, repr=False)  # sources changed mid-rebuild
+
+    @property
+    def primary(self) -> DevServer | StaticSite:
+        return next(s for s in (*self.servers, *self.sites) if s.primary)
+
+    @property
+    def exited(self) -> bool:
+        """Whether the primary dev server has exited (a static primary never does)."""
+        primary = self.primary
+        return isinstance(primary, DevServer) and primary.process.returncode is not None
+
+    @property
+    def last_active(self) -> float:
+        # Static sites cost nothing to keep, so only dev servers go idle
+        return max((s.last_active for s in self.servers), default=time.monotonic())
+
 
 class PreviewService:
     """Lifecycle manager for project preview dev servers."""
 
-    def __init__(self, caddy: CaddyClient) -> None:
+    def __init__(
+        self,
+        caddy: CaddyClient,
+        process_reaper: ProcessReaper,
+        install_cache: InstallCache,
+        build_cache: BuildCache,
+        ports: PortAllocator,
+    ) -> None:
         self._previews: dict[str, RunningPreview] = {}  # project_id → preview
+        # Logs of previews still installing dependencies (not yet in _previews)
+        self._install_logs: dict[str, LogRingBuffer] = {}
+        self._install_cache = install_cache
+        self._build_cache = build_cache
         self._lock = asyncio.Lock()
         self._caddy = caddy
-        self._allocated_ports: set[int] = set()
+        self._process_reaper = process_reaper
+        self._ports = ports
+        self._agent_turns: dict[str, int] = {}  # project_id → agent turns running in it
         self._auto_stop_task: asyncio.Task | None = None
+        self._wake_task: asyncio.Task | None = None
 
     # ------------------------------------------------------------------
     # Lifecycle
     # ------------------------------------------------------------------
 
     async def startup(self) -> None:
-        """Restore port allocations from DB and start auto-stop loop."""
-        async with db.conn.execute("SELECT project_id, port FROM previews") as cur:
-            rows = await cur.fetchall()
-        for row in rows:
-            self._allocated_ports.add(row["port"])
-            logger.info(
-                "Restored port reservation: project %s → port %d",
-                row["project_id"], row["port"],
-            )
+        """Restore port reservations, reconcile Caddy routes, start the idle loops."""
+        await self._ports.startup()
+        # Routes left by a previous process point at previews that are gone
+        await self._caddy.reconcile()
         self._auto_stop_task = asyncio.create_task(self._auto_stop_loop())
+        if (
+            settings.preview_freeze_idle_minutes or settings.preview_pause_during_agent_turns
+        ) and activity.available():
+            self._wake_task = asyncio.create_task(self._wake_loop())
 
     async def shutdown(self) -> None:
-        """Stop all running previews and cancel the auto-stop loop."""
+        """Stop all running previews and cancel the idle loops."""
         if self._auto_stop_task:
             self._auto_stop_task.cancel()
+        if self._wake_task:
+            self._wake_task.cancel()
         await self.cleanup_all()
+        await self._caddy.close()
 
     async def cleanup_all(self) -> None:
         """Kill every running preview subprocess."""
@@ -90,130 +257,146 @@ class PreviewService:
         """Detect framework for a project directory (sync, runs in executor)."""
         return detect(project_path)
 
+    def detect_services(self, project_path: Path) -> list[DetectionResult]:
+        """Detect every runnable service, primary first (sync, runs in executor)."""
+        return detect_services(project_path)
+
     # ------------------------------------------------------------------
     # Start / Stop
     # ------------------------------------------------------------------
 
     async def start(
-        self, project_id: str, project_path: Path, slug: str,
+        self, project_id: str, project_path: Path, slug: str, mode: str = "dev",
     ) -> dict:
-        """Start a dev server for the given project.
+        """Start the dev servers for the given project.
 
-        Returns a dict suitable for ``PreviewInfo`` serialisation.
+        In ``production`` mode, services that can be built into a static
+        site are built (or found in the build cache) and served by Caddy.
+        Returns a dict suitable for ``PreviewInfo`` serialisation, with status
+        ``starting``: readiness is detected in the background, and callers
+        follow it through ``status()`` / ``wait_ready()``.
         """
+        requested = time.monotonic()
         async with self._lock:
-            if project_id in self._previews:
-                p = self._previews[project_id]
-                if p.process.returncode is None:  # still running
-                    raise PreviewAlreadyRunningError(
-                        f"Preview already running for project {project_id}"
-                    )
-                # Process died — clean up stale entry
-                await self._cleanup_preview(project_id)
+            stale = self._previews.get(project_id)
+        if stale:
+            if not stale.exited:  # still running
+                raise PreviewAlreadyRunningError(
+                    f"Preview already running for project {project_id}"
+                )
+            # Primary server died — stop whatever is left of the stale entry
+            await self.stop(project_id)
 
-        detection = detect(project_path)
-        if not detection.supported:
+        detections = detect_services(project_path)
+        if not detections:
             raise PreviewNotSupportedError(
                 "This project type is not supported for live preview"
             )
 
-        # For monorepo layouts, the dev server runs from the subdirectory
-        work_dir = project_path / detection.subdir if detection.subdir else project_path
-
-        port = await self._allocate_port(project_id)
-
-        # npm install if needed
-        if detection.needs_install and detection.install_cmd:
-            logger.info("Running install for %s: %s", project_id, detection.install_cmd)
-            try:
-                proc = await asyncio.create_subprocess_exec(
-                    *detection.install_cmd,
-                    cwd=str(work_dir),
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.STDOUT,
-                )
-                await asyncio.wait_for(proc.wait(), timeout=INSTALL_TIMEOUT)
-                if proc.returncode != 0:
-                    raise PreviewStartError("npm install failed")
-            except asyncio.TimeoutError:
-                raise PreviewStartError("npm install timed out")
-
-        # Build the actual command with port substituted
-        cmd = [arg.replace("{port}", str(port)) for arg in detection.start_cmd]
-
-        # Environment: inherit current env + set PORT for frameworks that use it
-        env = {**os.environ, "PORT": str(port), "BROWSER": "none"}
-        # Remove vars that shouldn't leak into user projects
+        # Ports first, so every server can be told where the others listen
+        names = [d.subdir or "" for d in detections]
+        static = [mode == "production" and d.build_output is not None for d in detections]
+        ports = [
+            None if static[i] else await self._ports.acquire(project_id, "" if i == 0 else name)
+            for i, name in enumerate(names)
+        ]
+        hosts = [slug if i == 0 else f"{name}.{slug}" for i, name in enumerate(names)]
+        # Environment: inherit current env, minus vars that shouldn't leak into user projects
+        env = {**os.environ, "BROWSER": "none"}
         env.pop("CLAUDECODE", None)
         env.pop("ANTHROPIC_API_KEY", None)
-
-        logger.info("Starting preview for %s: %s (port %d, cwd %s)", project_id, cmd, port, work_dir)
-
-        try:
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                cwd=str(work_dir),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.STDOUT,
-                env=env,
-            )
-        except Exception as exc:
-            await self._release_port(project_id, port)
-            raise PreviewStartError(f"Failed to start dev server: {exc}")
+        if len(detections) > 1:
+            for name, port, host in zip(names, ports, hosts):
+                var = re.sub(r"\W", "_", name).upper()
+                if port is not None:
+                    env[f"PREVIEW_{var}_PORT"] = str(port)
+                env[f"PREVIEW_{var}_URL"] = f"https://{host}.{settings.preview_domain}"
 
         preview = RunningPreview(
             project_id=project_id,
             slug=slug,
-            port=port,
-            framework=detection.framework or "unknown",
-            process=process,
+            mode=mode,
+            log_buffer=LogRingBuffer(
+                MAX_LOG_LINES,
+                archive=LogArchive(
+                    settings.preview_log_dir / f"{project_id}.log",
+                    settings.preview_log_file_bytes,
+                    settings.preview_log_file_backups,
+                ),
+            ),
         )
 
-        # Background reader for stdout
-        preview._reader_task = asyncio.create_task(
-            self._read_output(preview)
+        # Independent services install and spawn in parallel; the first
+        # failure cancels the rest. start() holds the log open meanwhile
+        preview._open_readers += 1
+        if any(static):
+            preview._open_readers += 1  # rebuilds log here until the preview stops
+        self._install_logs[project_id] = preview.log_buffer
+        multi = len(detections) > 1
+        tasks = [
+            asyncio.create_task(
+                self._build_site(preview, detection, name, i == 0, host, project_path, env, multi)
+                if static[i] else
+                self._start_server(preview, detection, name, i == 0, port, host, project_path, env, multi)
+            )
+            for i, (detection, name, port, host) in enumerate(zip(detections, names, ports, hosts))
+        ]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            self._install_logs.pop(project_id, None)
+            self._reader_done(preview)
+        preview.servers.sort(key=lambda s: names.index(s.name))
+        preview.sites.sort(key=lambda s: names.index(s.name))
+        failure = next(
+            (t.exception() for t in done if not t.cancelled() and t.exception()), None,
+        )
+        if failure is not None:
+            await asyncio.gather(*(self._kill_process(s) for s in preview.servers))
+            if any(static):
+                self._reader_done(preview)
+            await self._release(preview)
+            raise failure
+
+        # The readiness watch: every server's ready signal, or the first failure
+        preview._ready_task = asyncio.create_task(
+            self._await_ready(preview, requested)
         )
 
         async with self._lock:
             self._previews[project_id] = preview
 
-        # Persist to DB
-        await db.conn.execute(
-            """INSERT OR REPLACE INTO previews (project_id, port, framework, start_cmd)
-               VALUES (?, ?, ?, ?)""",
-            (project_id, port, detection.framework, json.dumps(cmd)),
-        )
-        await db.conn.commit()
-
-        # Register Caddy route
+        # Register Caddy routes (concurrent changes are flushed together)
         try:
-            await self._caddy.add_route(slug, port)
+            await asyncio.gather(
+                *(self._caddy.add_route(s.host, s.port) for s in preview.servers),
+                *(self._caddy.add_site(s.host, s.root) for s in preview.sites),
+            )
         except Exception as exc:
             logger.warning("Failed to configure Caddy route: %s", exc)
             # Don't fail the start — the server is running, Caddy can be retried
 
-        url = f"https://{slug}.{settings.preview_domain}"
-        return {
-            "project_id": project_id,
-            "port": port,
-            "framework": detection.framework,
-            "status": "running",
-            "url": url,
-            "started_at": preview.started_at.isoformat(),
-            "error": None,
-        }
+        return self._describe(preview)
 
     async def stop(self, project_id: str) -> None:
         """Stop the preview for a project. Idempotent — safe to call if already stopped."""
         async with self._lock:
             preview = self._previews.get(project_id)
         if not preview:
-            # Already stopped — clean up DB entry if it exists
-            await self._release_port_by_project(project_id)
-            return
-
-        await self._kill_process(preview)
-        await self._caddy.remove_route(preview.slug)
+            return  # already stopped
+
+        if preview._ready_task and not preview._ready_task.done():
+            preview._ready_task.cancel()
+        if preview._rebuild_task and not preview._rebuild_task.done():
+            preview._rebuild_task.cancel()
+            await asyncio.gather(preview._rebuild_task, return_exceptions=True)
+        await asyncio.gather(*(self._kill_process(s) for s in preview.servers))
+        await asyncio.gather(
+            *(self._caddy.remove_route(s.host) for s in (*preview.servers, *preview.sites))
+        )
         await self._cleanup_preview(project_id)
         logger.info("Preview stopped for %s", project_id)
 
@@ -223,21 +406,11 @@ class PreviewService:
             preview = self._previews.get(project_id)
 
         if preview:
-            running = preview.process.returncode is None
-            url = f"https://{preview.slug}.{settings.preview_domain}"
-            return {
-                "project_id": project_id,
-                "port": preview.port,
-                "framework": preview.framework,
-                "status": "running" if running else "stopped",
-                "url": url if running else None,
-                "started_at": preview.started_at.isoformat(),
-                "error": None,
-            }
+            return self._describe(preview)
 
-        # Check DB for persisted port allocation (server not running)
+        # Not running here — the project may still hold a port reservation
         async with db.conn.execute(
-            "SELECT port, framework FROM previews WHERE project_id = ?",
+            "SELECT port, framework FROM previews WHERE project_id = ? AND service = ''",
             (project_id,),
         ) as cur:
             row = await cur.fetchone()
@@ -245,7 +418,7 @@ class PreviewService:
             return {
                 "project_id": project_id,
                 "port": row["port"],
-                "framework": row["framework"],
+                "framework": row["framework"] or None,
                 "status": "stopped",
                 "url": None,
                 "started_at": None,
@@ -254,122 +427,532 @@ class PreviewService:
 
         return None
 
-    def get_logs(self, project_id: str, since_line: int = 0) -> tuple[list[str], int]:
-        """Return log lines from the buffer starting at *since_line*.
+    async def wait_ready(self, project_id: str, timeout: float) -> None:
+        """Wait up to *timeout* seconds for a starting preview to become ready or fail."""
+        preview = self._previews.get(project_id)
+        if preview is None or preview.settled.is_set():
+            return
+        try:
+            await asyncio.wait_for(preview.settled.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
 
-        Returns ``(lines, total_line_count)``.
+    def get_log(self, project_id: str) -> LogRingBuffer | None:
+        """The preview's log (install output, then dev server output), if any."""
+        preview = self._previews.get(project_id)
+        if preview:
+            return preview.log_buffer
+        return self._install_logs.get(project_id)
+
+    # ------------------------------------------------------------------
+    # Agent turns
+    # ------------------------------------------------------------------
+
+    def agent_turn_started(self, project_id: str) -> None:
+        """An agent turn began in *project_id*: pause its dev servers' file watching."""
+        self._agent_turns[project_id] = self._agent_turns.get(project_id, 0) + 1
+        preview = self._previews.get(project_id)
+        # Only with the wake loop: a request must be able to thaw it
+        if not preview or not settings.preview_pause_during_agent_turns or self._wake_task is None:
+            return
+        for server in preview.servers:
+            if (
+                server.framework in _WATCHING_FRAMEWORKS
+                and server.status == "ready"
+                and not server.frozen
+                and server.process.returncode is None
+                and signal_group(server.process.pid, signal.SIGSTOP)
+            ):
+                server.frozen = server.agent_paused = True
+                server.paused_at = time.monotonic()
+                _HIBERNATION.inc("agent_pause")
+                logger.debug("Paused preview %s for an agent turn", server.label)
+
+    def agent_turn_ended(self, project_id: str) -> None:
+        """An agent turn in *project_id* finished: once none remain, resume its dev
+        servers and rebuild its production sites if their sources changed.
         """
+        remaining = self._agent_turns.get(project_id, 0) - 1
+        if remaining > 0:
+            self._agent_turns[project_id] = remaining
+            return
+        self._agent_turns.pop(project_id, None)
         preview = self._previews.get(project_id)
         if not preview:
-            return [], 0
-        buf = list(preview.log_buffer)
-        total = len(buf)
-        return buf[since_line:], total
+            return
+        for server in preview.servers:
+            if server.agent_paused:
+                self._resume(server, "agent_resume")
+                logger.debug("Resumed preview %s after agent turn", server.label)
+        if any(site.key for site in preview.sites):
+            self._schedule_rebuild(preview)
 
     # ------------------------------------------------------------------
-    # Port allocation
+    # Internal helpers
     # ------------------------------------------------------------------
 
-    async def _allocate_port(self, project_id: str) -> int:
-        """Find the lowest unused port in the configured range."""
-        # Check if this project already has a port in DB
-        async with db.conn.execute(
-            "SELECT port FROM previews WHERE project_id = ?", (project_id,),
-        ) as cur:
-            row = await cur.fetchone()
-        if row:
-            self._allocated_ports.add(row["port"])
-            return row["port"]
-
-        # Find next free port
-        for port in range(settings.preview_port_start, settings.preview_port_end + 1):
-            if port not in self._allocated_ports:
-                self._allocated_ports.add(port)
-                return port
-
-        raise PreviewStartError("No available ports in preview range")
-
-    async def _release_port(self, project_id: str, port: int) -> None:
-        """Release a port back to the pool."""
-        self._allocated_ports.discard(port)
-        await db.conn.execute(
-            "DELETE FROM previews WHERE project_id = ?", (project_id,),
-        )
-        await db.conn.commit()
+    async def _start_server(
+        self,
+        preview: RunningPreview,
+        detection: DetectionResult,
+        name: str,
+        primary: bool,
+        port: int,
+        host: str,
+        project_path: Path,
+        env: dict[str, str],
+        multi: bool,
+    ) -> DevServer:
+        """Install one service's dependencies and spawn its dev server."""
+        project_id = preview.project_id
+        # For monorepo layouts, the dev server runs from the subdirectory
+        work_dir = project_path / detection.subdir if detection.subdir else project_path
+        log_prefix = f"[{name}] " if multi else ""
 
-    async def _release_port_by_project(self, project_id: str) -> None:
-        """Release a port by project ID (when we don't have the port number)."""
-        async with db.conn.execute(
-            "SELECT port FROM previews WHERE project_id = ?", (project_id,),
-        ) as cur:
-            row = await cur.fetchone()
-        if row:
-            self._allocated_ports.discard(row["port"])
-            await db.conn.execute(
-                "DELETE FROM previews WHERE project_id = ?", (project_id,),
+        await self._install(preview, detection, work_dir, log_prefix)
+
+        # Build the actual command with port substituted
+        cmd = [arg.replace("{port}", str(port)) for arg in detection.start_cmd]
+        # PORT for frameworks that read it instead of a CLI flag
+        env = {**env, "PORT": str(port)}
+
+        logger.info("Starting preview for %s: %s (port %d, cwd %s)", project_id, cmd, port, work_dir)
+
+        sandbox_name = f"preview-{project_id}" if primary else f"preview-{project_id}-{name}"
+        sandbox = ResourceSandbox(sandbox_name, preview_limits())
+        sandbox.setup()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                cwd=str(work_dir),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                env=env,
+                preexec_fn=sandbox.preexec_fn,
+                start_new_session=True,
             )
-            await db.conn.commit()
+        except Exception as exc:
+            sandbox.cleanup()
+            raise PreviewStartError(f"Failed to start dev server: {exc}")
 
-    # ------------------------------------------------------------------
-    # Internal helpers
-    # ------------------------------------------------------------------
+        server = DevServer(
+            project_id=project_id,
+            name=name,
+            primary=primary,
+            host=host,
+            port=port,
+            framework=detection.framework or "unknown",
+            process=process,
+            sandbox=sandbox,
+            log_prefix=log_prefix,
+        )
+        preview.servers.append(server)  # from here on, a failed start kills it
+        # Read stdout from the start: a sibling may still be installing
+        preview._open_readers += 1
+        server._reader_task = asyncio.create_task(
+            self._read_output(preview, server)
+        )
+        await self._process_reaper.register(process.pid, "preview", project_id, " ".join(cmd))
+        await self._ports.mark_running(
+            project_id, server.service, process.pid, server.framework, json.dumps(cmd),
+        )
+        return server
+
+    async def _build_site(
+        self,
+        preview: RunningPreview,
+        detection: DetectionResult,
+        name: str,
+        primary: bool,
+        host: str,
+        project_path: Path,
+        env: dict[str, str],
+        multi: bool,
+    ) -> StaticSite:
+        """Install one service's dependencies and build it into the build cache."""
+        work_dir = project_path / detection.subdir if detection.subdir else project_path
+        site = StaticSite(
+            project_id=preview.project_id,
+            name=name,
+            primary=primary,
+            host=host,
+            framework=detection.framework or "unknown",
+            work_dir=work_dir,
+            detection=detection,
+            root=work_dir / detection.build_output,  # plain static sites are served as they are
+            env=env,
+            log_prefix=f"[{name}] " if multi else "",
+        )
+        if detection.build_cmd:
+            await self._install(preview, detection, work_dir, site.log_prefix)
+            logger.info("Building production preview for %s in %s", site.label, work_dir)
+            started = time.monotonic()
+            site.root, site.key, site.build_cache = await self._build_cache.build(
+                work_dir, detection.build_cmd, detection.build_output, env,
+                preview.log_buffer, prefix=site.log_prefix,
+            )
+            site.build_ms = round((time.monotonic() - started) * 1000)
+        preview.sites.append(site)
+        return site
+
+    async def _install(
+        self, preview: RunningPreview, detection: DetectionResult, work_dir: Path, log_prefix: str,
+    ) -> None:
+        """Dependencies, from the shared install cache when the lockfile matches."""
+        if detection.needs_install and detection.install_cmd:
+            logger.info("Installing dependencies for %s in %s", preview.project_id, work_dir)
+            await self._install_cache.install(
+                work_dir, detection.install_cmd, preview.log_buffer, prefix=log_prefix,
+            )
+
+    def _schedule_rebuild(self, preview: RunningPreview) -> None:
+        if preview._rebuild_task and not preview._rebuild_task.done():
+            preview._rebuild_again = True  # picked up when the current pass ends
+            return
+        preview._rebuild_task = asyncio.create_task(self._rebuild_sites(preview))
 
-    async def _read_output(self, preview: RunningPreview) -> None:
-        """Continuously read subprocess stdout and append to the log buffer."""
-        assert preview.process.stdout
+    async def _rebuild_sites(self, preview: RunningPreview) -> None:
+        """Rebuild the production sites whose sources changed.
+
+        Each site keeps serving its current build until the new one is in
+        the cache; a failed build leaves it there.
+        """
+        while True:
+            preview._rebuild_again = False
+            for site in [s for s in preview.sites if s.key]:
+                detection = site.detection
+                started = time.monotonic()
+                try:
+                    key = await asyncio.to_thread(
+                        source_key, site.work_dir, detection.build_cmd, detection.build_output, site.env,
+                    )
+                    if key == site.key:
+                        continue
+                    root, key, result = await self._build_cache.build(
+                        site.work_dir, detection.build_cmd, detection.build_output, site.env,
+                        preview.log_buffer, prefix=site.log_prefix,
+                    )
+                except Exception as exc:
+                    preview.log_buffer.append(
+                        "build", f"{site.log_prefix}[build] {exc}; still serving the previous build",
+                    )
+                    logger.warning("Rebuild of preview %s failed: %s", site.label, exc)
+                    continue
+                old_key = site.key
+                site.root, site.key, site.build_cache = root, key, result
+                site.build_ms = round((time.monotonic() - started) * 1000)
+                self._build_cache.release(old_key)
+                try:
+                    await self._caddy.add_site(site.host, root)
+                except Exception as exc:
+                    logger.warning("Failed to configure Caddy route: %s", exc)
+            if not preview._rebuild_again:
+                return
+
+    def _describe(self, preview: RunningPreview) -> dict:
+        """``PreviewInfo`` fields for a preview; top-level ones describe the primary service."""
+        primary = preview.primary
+        running = not preview.exited
+        if running or preview.status == "error":
+            status = preview.status
+        else:
+            status = "stopped"  # exited after it was ready
+        services = []
+        for server in preview.servers:
+            alive = server.process.returncode is None
+            services.append({
+                "name": server.name,
+                "framework": server.framework,
+                "port": server.port,
+                "status": server.status if alive or server.status == "error" else "stopped",
+                "url": self._url(server) if alive else None,
+                "error": server.error,
+                "ready_ms": server.ready_ms,
+                "frozen": server.frozen,
+                "agent_paused": server.agent_paused,
+            })
+        for site in preview.sites:
+            services.append({
+                "name": site.name,
+                "framework": site.framework,
+                "port": None,
+                "status": "ready",
+                "url": self._url(site),
+                "error": None,
+                "ready_ms": None,
+                "build_cache": site.build_cache,
+                "build_ms": site.build_ms,
+            })
+        services.sort(key=lambda s: s["name"] != primary.name)  # primary first
+        server = primary if isinstance(primary, DevServer) else None
+        return {
+            "project_id": preview.project_id,
+            "mode": preview.mode,
+            "port": server and server.port,
+            "framework": primary.framework,
+            "status": status,
+            "url": self._url(primary) if running else None,
+            "started_at": preview.started_at.isoformat(),
+            "error": preview.error,
+            "ready_ms": preview.ready_ms,
+            "frozen": bool(server and server.frozen),
+            "idle_seconds": round(time.monotonic() - preview.last_active),
+            "resources": server.sandbox.read_usage() if server and server.sandbox else None,
+            "services": services,
+        }
+
+    @staticmethod
+    def _url(service: DevServer | StaticSite) -> str:
+        return f"https://{service.host}.{settings.preview_domain}"
+
+    async def _read_output(self, preview: RunningPreview, server: DevServer) -> None:
+        """Continuously read subprocess stdout and append to the shared log buffer."""
+        assert server.process.stdout
         try:
-            async for raw_line in preview.process.stdout:
+            async for raw_line in server.process.stdout:
                 line = raw_line.decode("utf-8", errors="replace").rstrip("\n")
-                preview.log_buffer.append(line)
+                preview.log_buffer.append("stdout", server.log_prefix + line)
+                if not server.log_ready.is_set() and readiness.is_ready_line(server.framework, line):
+                    server.log_ready.set()
         except Exception:
             pass  # Process exited
+        finally:
+            self._reader_done(preview)
 
-    async def _kill_process(self, preview: RunningPreview) -> None:
-        """Gracefully terminate a preview process."""
-        if preview._reader_task and not preview._reader_task.done():
-            preview._reader_task.cancel()
+    @staticmethod
+    def _reader_done(preview: RunningPreview) -> None:
+        """Close the shared log once nothing can write to it any more."""
+        preview._open_readers -= 1
+        if not preview._open_readers:
+            preview.log_buffer.close()
 
-        proc = preview.process
-        if proc.returncode is not None:
-            return  # Already exited
+    async def _await_ready(self, preview: RunningPreview, requested: float) -> None:
+        """Move a preview from ``starting`` to ``ready`` (or ``error``).
 
-        proc.terminate()
+        Ready once every dev server is (static sites are ready once built);
+        the first one to fail fails the preview without waiting for the rest.
+        """
+        pending = {asyncio.create_task(self._await_server_ready(s)) for s in preview.servers}
+        failed = None
         try:
-            await asyncio.wait_for(proc.wait(), timeout=5)
-        except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
+            while pending and failed is None:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                failed = next((s for s in preview.servers if s.status == "error"), None)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if failed is not None:
+            preview.status = "error"
+            preview.error = f"{failed.name}: {failed.error}" if len(preview.servers) > 1 else failed.error
+        else:
+            preview.status = "ready"
+            preview.ready_ms = max((s.ready_ms or 0 for s in preview.servers), default=None)
+            logger.info(
+                "Preview %s ready (%d server(s)) %.2fs after start request",
+                preview.project_id, len(preview.servers), time.monotonic() - requested,
+            )
+        preview.settled.set()
+
+    async def _await_server_ready(self, server: DevServer) -> None:
+        """Move one dev server from ``starting`` to ``ready`` (or ``error``).
+
+        Races the framework's ready banner, a TCP probe of its port and the
+        process exiting, bounded by ``settings.preview_ready_timeout_seconds``.
+        """
+        waiters = {
+            asyncio.create_task(server.log_ready.wait()): "log",
+            asyncio.create_task(readiness.wait_for_port(server.port)): "port",
+            asyncio.create_task(server.process.wait()): "exit",
+        }
+        try:
+            done, _ = await asyncio.wait(
+                waiters, timeout=settings.preview_ready_timeout_seconds,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+        signals = {waiters[t] for t in done}
+        if "exit" in signals:
+            server.status = "error"
+            server.error = (
+                f"Dev server exited with code {server.process.returncode} before it was ready"
+            )
+            logger.warning("Preview %s: %s", server.label, server.error)
+        elif not signals:
+            server.status = "error"
+            server.error = (
+                f"Dev server did not become ready within {settings.preview_ready_timeout_seconds}s"
+            )
+            logger.warning("Preview %s: %s", server.label, server.error)
+        else:
+            elapsed = time.monotonic() - server.spawned_at
+            server.status = "ready"
+            server.ready_signal = "log" if "log" in signals else "port"
+            server.ready_ms = round(elapsed * 1000)
+            _READY_SECONDS.observe(elapsed, server.framework, server.ready_signal)
+            logger.info(
+                "Preview %s ready (%s, %s) in %.2fs after spawn",
+                server.label, server.framework, server.ready_signal, elapsed,
+            )
+
+    async def _kill_process(self, server: DevServer) -> None:
+        """Gracefully terminate a dev server process."""
+        if server._reader_task and not server._reader_task.done():
+            server._reader_task.cancel()
+        if server.frozen:
+            self._thaw(server)  # a stopped process would hold SIGTERM until continued
+
+        # Signal the whole group so node/vite children don't keep the port
+        await terminate_group(server.process, grace_seconds=5.0)
 
     async def _cleanup_preview(self, project_id: str) -> None:
-        """Remove a preview from the in-memory registry and release its port."""
+        """Remove a preview from the in-memory registry and release its ports."""
         async with self._lock:
             preview = self._previews.pop(project_id, None)
         if preview:
-            await self._release_port(project_id, preview.port)
+            if preview.sites:
+                self._reader_done(preview)  # the hold start() took for rebuilds
+            await self._release(preview)
+
+    async def _release(self, preview: RunningPreview) -> None:
+        for server in preview.servers:
+            if server.process.returncode is not None:
+                await self._process_reaper.release(server.process.pid)
+            if server.sandbox:
+                server.sandbox.cleanup()
+        for site in preview.sites:
+            if site.key:
+                self._build_cache.release(site.key)
+        await self._ports.mark_stopped(preview.project_id)
+
+    def _freeze(self, server: DevServer) -> None:
+        if signal_group(server.process.pid, signal.SIGSTOP):
+            server.frozen = True
+            _HIBERNATION.inc("freeze")
+            logger.info("Froze idle preview %s", server.label)
+
+    def _thaw(self, server: DevServer) -> None:
+        signal_group(server.process.pid, signal.SIGCONT)
+        server.frozen = server.agent_paused = False
+        server.last_active = time.monotonic()
+        _HIBERNATION.inc("thaw")
+
+    def _resume(self, server: DevServer, action: str) -> None:
+        """End an agent-turn pause. Not activity: an idle preview can still freeze on schedule."""
+        signal_group(server.process.pid, signal.SIGCONT)
+        server.frozen = server.agent_paused = False
+        _HIBERNATION.inc(action)
+
+    async def _wake_loop(self) -> None:
+        """Thaw frozen dev servers as soon as a request for them is queued."""
+        while True:
+            try:
+                frozen = {
+                    s.port: s
+                    for p in list(self._previews.values())
+                    for s in p.servers if s.frozen
+                }
+                if not frozen:
+                    await asyncio.sleep(1)
+                    continue
+                now = time.monotonic()
+                for port, server in list(frozen.items()):
+                    if server.agent_paused and now - server.paused_at > settings.preview_agent_pause_max_seconds:
+                        self._resume(server, "agent_pause_expired")
+                        logger.info("Resumed preview %s: agent turn pause reached its cap", server.label)
+                        del frozen[port]
+                for port, usage in activity.sample(set(frozen)).items():
+                    if usage.pending:
+                        server = frozen[port]
+                        self._thaw(server)
+                        logger.info("Thawed preview %s on incoming request", server.label)
+                await asyncio.sleep(_WAKE_POLL_SECONDS)
+            except asyncio.CancelledError:
+                return
+            except Exception as exc:
+                logger.error("Error in preview wake loop: %s", exc)
+                await asyncio.sleep(1)
+
+    async def _enforce_memory_budget(self, previews: list[RunningPreview]) -> None:
+        """Stop least recently used previews until the rest fit the memory budget."""
+        budget = settings.preview_memory_budget_mb * 1024 * 1024
+        usage = {}
+        for p in previews:
+            usage[p.project_id] = sum([
+                await asyncio.to_thread(group_rss_bytes, s.process.pid) or 0
+                for s in p.servers
+            ])
+        total = sum(usage.values())
+        # Keep the most recently used one whatever it costs
+        for preview in sorted(previews, key=lambda p: p.last_active)[:-1]:
+            if total <= budget:
+                break
+            logger.info(
+                "Stopping preview %s: previews use %d MB, budget %d MB",
+                preview.project_id, total // 2**20, settings.preview_memory_budget_mb,
+            )
+            _HIBERNATION.inc("budget_stop")
+            await self.stop(preview.project_id)
+            total -= usage[preview.project_id]
 
     async def _auto_stop_loop(self) -> None:
-        """Periodically check for idle previews and stop them."""
+        """Periodically track preview traffic and freeze or stop idle previews."""
+        track_activity = activity.available()
         while True:
             try:
-                await asyncio.sleep(60)
-                now = datetime.now(timezone.utc)
+                await asyncio.sleep(_IDLE_CHECK_SECONDS)
                 async with self._lock:
                     project_ids = list(self._previews.keys())
                 for pid in project_ids:
                     preview = self._previews.get(pid)
                     if not preview:
                         continue
-                    # Stop if process already died
-                    if preview.process.returncode is not None:
-                        logger.info("Preview %s exited (code %s), cleaning up", pid, preview.process.returncode)
-                        await self._cleanup_preview(pid)
-                        await self._caddy.remove_route(preview.slug)
-                        continue
-                    # Auto-stop after configured idle time
-                    elapsed = (now - preview.started_at).total_seconds() / 60
-                    if elapsed > settings.preview_auto_stop_minutes:
-                        logger.info("Auto-stopping preview %s (running %.0f min)", pid, elapsed)
+                    # The preview is over once its primary server exits
+                    if preview.exited:
+                        logger.info(
+                            "Preview %s exited (code %s), cleaning up",
+                            pid, preview.primary.process.returncode,
+                        )
                         await self.stop(pid)
+
+                live = [p for p in list(self._previews.values()) if not p.exited]
+                servers = [s for p in live for s in p.servers if s.process.returncode is None]
+                now = time.monotonic()
+                if track_activity:
+                    ports = {s.port for s in servers if not s.frozen}
+                    traffic = activity.sample(ports)
+                    for server in servers:
+                        usage = traffic.get(server.port)
+                        if not server.frozen and usage and usage.connections:
+                            server.last_active = now
+
+                for preview in live:
+                    idle_minutes = (now - preview.last_active) / 60
+                    if idle_minutes > settings.preview_auto_stop_minutes:
+                        logger.info("Auto-stopping preview %s (idle %.0f min)", preview.project_id, idle_minutes)
+                        _HIBERNATION.inc("idle_stop")
+                        await self.stop(preview.project_id)
+                        continue
+                    if self._wake_task is None or not settings.preview_freeze_idle_minutes:
+                        continue
+                    # Each server freezes on its own: an API nobody calls
+                    # can sleep while its frontend is in use
+                    for server in preview.servers:
+                        if (
+                            not server.frozen
+                            and server.status == "ready"
+                            and server.process.returncode is None
+                            and (now - server.last_active) / 60 > settings.preview_freeze_idle_minutes
+                        ):
+                            self._freeze(server)
+
+                if settings.preview_memory_budget_mb:
+                    await self._enforce_memory_budget(
+                        [p for p in list(self._previews.values()) if not p.exited]
+                    )
             except asyncio.CancelledError:
                 return
             except Exception as exc:
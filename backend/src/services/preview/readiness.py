@@ -0,0 +1,64 @@
+"""Detect when a preview dev server is actually serving.
+
+Two signals, whichever comes first:
+
+- the framework's own "ready" log line (Vite's ``ready in``, Next's
+  ``Ready``…), matched as lines are read — no polling delay;
+- a TCP connect to the allocated port succeeding, polled with backoff —
+  works for any framework, including ones with no recognisable banner.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+
+# Printed once the server is listening (dev-server banners, ANSI codes stripped)
+READY_PATTERNS: dict[str, re.Pattern] = {
+    "vite": re.compile(r"ready in \d|Local:\s+https?://"),
+    "nextjs": re.compile(r"\bReady\b|ready - started server|started server on"),
+    "cra": re.compile(r"Compiled successfully|You can now view|webpack compiled"),
+    "fastapi": re.compile(r"Application startup complete|Uvicorn running on"),
+    "flask": re.compile(r"Running on https?://"),
+    "django": re.compile(r"Starting development server at"),
+    "static": re.compile(r"Serving HTTP on"),
+}
+
+_ANSI_RE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+# Both loopback families: some dev servers bind only ::1 when asked for "localhost"
+_PROBE_HOSTS = ("127.0.0.1", "::1")
+_PROBE_INITIAL_SECONDS = 0.05
+_PROBE_MAX_SECONDS = 1.0
+_PROBE_CONNECT_TIMEOUT = 0.5
+
+
+def is_ready_line(framework: str, line: str) -> bool:
+    pattern = READY_PATTERNS.get(framework)
+    return pattern is not None and pattern.search(_ANSI_RE.sub("", line)) is not None
+
+
+async def port_accepts(port: int) -> bool:
+    """Whether something accepts TCP connections on localhost:*port*."""
+    for host in _PROBE_HOSTS:
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), _PROBE_CONNECT_TIMEOUT,
+            )
+        except (OSError, asyncio.TimeoutError):
+            continue
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+    return False
+
+
+async def wait_for_port(port: int) -> None:
+    """Return once *port* accepts connections, polling with exponential backoff."""
+    delay = _PROBE_INITIAL_SECONDS
+    while not await port_accepts(port):
+        await asyncio.sleep(delay)
+        delay = min(delay * 1.5, _PROBE_MAX_SECONDS)
@@ -0,0 +1,250 @@
+"""Bounded, sequence-numbered log buffer for live subprocess diagnostics."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from itertools import islice
+from pathlib import Path
+
+MAX_LINE_CHARS = 4000
+
+
+class LogRingBuffer:
+    """Ring buffer of output lines with monotonically increasing sequence numbers.
+
+    Bounded by both line count and total characters, so a chatty process
+    can't grow memory. Readers poll with ``since(seq)`` and can ``wait()``
+    for new lines; a reader that falls behind the ring learns how many lines
+    it missed instead of silently re-reading shifted indices.
+    """
+
+    def __init__(
+        self,
+        max_lines: int = 2000,
+        max_chars: int = 512 * 1024,
+        archive: LogArchive | None = None,
+    ) -> None:
+        self._entries: deque[dict] = deque()
+        self._archive = archive  # every line is also written here, for history beyond the ring
+        self._max_lines = max_lines
+        self._max_chars = max_chars
+        self._chars = 0
+        self._next_seq = 0
+        self._waiter: asyncio.Event | None = None
+        self.counts: dict[str, int] = {}  # stream → lines ever appended
+        self.closed = False
+
+    @property
+    def next_seq(self) -> int:
+        return self._next_seq
+
+    @property
+    def first_seq(self) -> int:
+        return self._entries[0]["seq"] if self._entries else self._next_seq
+
+    def append(self, stream: str, line: str) -> None:
+        if self.closed:
+            return  # a straggling reader after the producer finished
+        if len(line) > MAX_LINE_CHARS:
+            line = line[:MAX_LINE_CHARS] + "…"
+        entry = {
+            "seq": self._next_seq,
+            "ts": time.time(),
+            "stream": stream,
+            "line": line,
+        }
+        self._entries.append(entry)
+        if self._archive is not None:
+            self._archive.write(entry)
+        self._next_seq += 1
+        self._chars += len(line)
+        self.counts[stream] = self.counts.get(stream, 0) + 1
+        while len(self._entries) > self._max_lines or (
+            self._chars > self._max_chars and len(self._entries) > 1
+        ):
+            self._chars -= len(self._entries.popleft()["line"])
+        self._notify()
+
+    def close(self) -> None:
+        """Mark the producer finished and wake any waiting readers."""
+        self.closed = True
+        if self._archive is not None:
+            self._archive.close()
+        self._notify()
+
+    def since(self, seq: int, limit: int | None = None) -> tuple[list[dict], int]:
+        """Return entries with ``seq >= seq`` and the number of lines already evicted."""
+        first = self.first_seq
+        dropped = max(0, first - seq)
+        if seq >= self._next_seq:
+            return [], dropped
+        # Entries are contiguous, so the offset into the deque is direct
+        start = max(0, seq - first)
+        stop = start + limit if limit is not None else None
+        return list(islice(self._entries, start, stop)), dropped
+
+    async def read(self, seq: int, limit: int | None = None) -> tuple[list[dict], int]:
+        """Like ``since()``, but lines already evicted are read back from the archive."""
+        first = self.first_seq
+        if self._archive is None or seq >= first:
+            return self.since(seq, limit)
+        await self._archive.flush()
+        entries = await asyncio.to_thread(self._archive.read, seq, first, limit)
+        dropped = (entries[0]["seq"] if entries else first) - seq
+        if limit is None or len(entries) < limit:
+            newer, _ = self.since(first, None if limit is None else limit - len(entries))
+            entries += newer
+        return entries, max(0, dropped)
+
+    def tail(self, n: int, stream: str | None = None) -> list[str]:
+        """Last *n* lines, optionally from a single stream (newest last)."""
+        lines: list[str] = []
+        for entry in reversed(self._entries):
+            if stream is None or entry["stream"] == stream:
+                lines.append(entry["line"])
+                if len(lines) >= n:
+                    break
+        lines.reverse()
+        return lines
+
+    async def wait(self, seq: int, timeout: float) -> bool:
+        """Wait until lines at or beyond *seq* exist or the buffer closes."""
+        if seq < self._next_seq or self.closed:
+            return True
+        if self._waiter is None:
+            self._waiter = asyncio.Event()
+        waiter = self._waiter
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _notify(self) -> None:
+        # Only pay for an Event when someone is actually waiting
+        if self._waiter is not None:
+            self._waiter.set()
+            self._waiter = None
+
+
+class LogArchive:
+    """Size-rotated JSON-lines file of log entries (``name``, ``name.1`` … ``name.N``).
+
+    ``write`` is called on the event loop for every line, so it only queues
+    the entry; a flusher task writes batches (and rotates) in a worker
+    thread ``FLUSH_DELAY`` seconds later. Readers ``await flush()`` first.
+    ``read`` opens its own handles, so it can run in a worker thread.
+    """
+
+    FLUSH_DELAY = 0.5  # seconds
+
+    def __init__(self, path: Path, max_bytes: int, backups: int) -> None:
+        self.path = path
+        self._max_bytes = max_bytes
+        self._backups = backups
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for old in self._files():
+            old.unlink(missing_ok=True)  # a new run starts a new history
+        self._file = open(path, "w", encoding="utf-8")
+        self._size = 0
+        self._pending: list[str] = []
+        self._lock = asyncio.Lock()  # one batch in a worker thread at a time
+        self._flusher: asyncio.Task | None = None
+        self._closing: asyncio.Task | None = None
+        self._closed = False
+
+    def write(self, entry: dict) -> None:
+        if self._closed:
+            return
+        self._pending.append(json.dumps(entry, ensure_ascii=False) + "\n")
+        if self._flusher is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._write_batch(self._take())
+                return
+            self._flusher = loop.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        """Write everything queued so far."""
+        async with self._lock:
+            batch = self._take()
+            if batch and not self._file.closed:
+                await asyncio.to_thread(self._write_batch, batch)
+
+    def close(self) -> None:
+        """Stop accepting entries; what is queued is still written, then the file closed."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_batch(self._take())
+            self._file.close()
+            return
+        self._closing = loop.create_task(self._close())
+
+    async def _flush_later(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.FLUSH_DELAY)
+            await self.flush()
+        self._flusher = None
+
+    async def _close(self) -> None:
+        await self.flush()
+        async with self._lock:
+            await asyncio.to_thread(self._file.close)
+
+    def _take(self) -> list[str]:
+        batch, self._pending = self._pending, []
+        return batch
+
+    def _write_batch(self, batch: list[str]) -> None:
+        for data in batch:
+            if self._size + len(data) > self._max_bytes and self._size:
+                self._rotate()
+            self._file.write(data)
+            self._size += len(data)
+        self._file.flush()
+
+    def read(self, seq: int, until: int, limit: int | None = None) -> list[dict]:
+        """Entries with ``seq <= entry seq < until``, oldest first."""
+        entries: list[dict] = []
+        for path in reversed(self._files()):  # oldest first
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for raw in f:
+                        try:
+                            entry = json.loads(raw)
+                        except json.JSONDecodeError:
+                            continue  # partly written line
+                        if entry["seq"] >= until:
+                            return entries
+                        if entry["seq"] >= seq:
+                            entries.append(entry)
+                            if limit is not None and len(entries) >= limit:
+                                return entries
+            except FileNotFoundError:
+                continue  # rotated away while reading
+        return entries
+
+    def _files(self) -> list[Path]:
+        """The current file and its backups, newest first."""
+        names = [self.path] + [
+            self.path.with_name(f"{self.path.name}.{i}") for i in range(1, self._backups + 1)
+        ]
+        return [p for p in names if p.exists()]
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for i in range(self._backups, 0, -1):
+            source = self.path if i == 1 else self.path.with_name(f"{self.path.name}.{i - 1}")
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{i}"))
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._size = 0
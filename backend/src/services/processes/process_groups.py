@@ -0,0 +1,66 @@
+"""Signal helpers for subprocesses spawned in their own session / process group.
+
+Children are started with ``start_new_session=True`` so the child's PID is also
+its process-group ID. Signalling the group reaches grandchildren (bash tools,
+node dev servers, file watchers) that would otherwise be orphaned.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import signal
+
+logger = logging.getLogger(__name__)
+
+
+def signal_group(pgid: int, sig: int) -> bool:
+    """Send *sig* to every process in group *pgid*. Returns False if none exist."""
+    try:
+        os.killpg(pgid, sig)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        logger.warning("Not permitted to signal process group %d", pgid)
+        return False
+
+
+async def terminate_group(
+    process: asyncio.subprocess.Process, grace_seconds: float = 5.0,
+) -> None:
+    """SIGTERM the process group led by *process*, then SIGKILL after a grace period."""
+    if process.returncode is not None:
+        return
+    # The leader hasn't been reaped yet, so its PID (== PGID) can't have been reused
+    if not signal_group(process.pid, signal.SIGTERM):
+        return
+    try:
+        await asyncio.wait_for(process.wait(), timeout=grace_seconds)
+    except asyncio.TimeoutError:
+        signal_group(process.pid, signal.SIGKILL)
+        await process.wait()
+
+
+def group_rss_bytes(pgid: int) -> int | None:
+    """Resident memory of every process in group *pgid*, or None without /proc."""
+    proc = "/proc"
+    if not os.path.isdir(proc):
+        return None
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for entry in os.listdir(proc):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"{proc}/{entry}/stat") as f:
+                # Fields after the parenthesised command: state ppid pgrp ...
+                fields = f.read().rpartition(")")[2].split()
+            if int(fields[2]) != pgid:
+                continue
+            with open(f"{proc}/{entry}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            continue  # exited while scanning
+    return total
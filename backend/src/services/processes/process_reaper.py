@@ -0,0 +1,236 @@
+"""Track spawned process groups and reap orphaned descendants.
+
+Every CLI task and preview dev server is spawned as the leader of its own
+process group and recorded in the ``process_groups`` table. When a leader
+exits, its group is swept so background children (``npm run dev &``, file
+watchers) don't linger. Rows left behind by a crashed backend are reaped on
+startup and by a periodic pass.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+import time
+from datetime import datetime, timezone
+
+from ...core.config import settings
+from ...core.database import db
+from ...core.worker import live_workers, worker_id
+from .process_groups import signal_group
+
+logger = logging.getLogger(__name__)
+
+# Max drift between the recorded spawn time and the leader's actual start time
+# before we assume the PID was reused by an unrelated process
+_START_TIME_TOLERANCE = 10.0
+
+
+class ProcessReaper:
+    """Registry of live process groups plus a periodic orphan reaper."""
+
+    def __init__(self) -> None:
+        self._live: set[int] = set()  # PGIDs owned by this backend instance
+        self._reaper_task: asyncio.Task | None = None
+        self.totals = {"groups": 0, "processes": 0, "rss_bytes": 0}
+        self.last_run: dict | None = None
+
+    # -- Lifecycle --
+
+    async def startup(self) -> None:
+        """Reap groups left over from a previous run and start the periodic pass."""
+        await self.reap()
+        self._reaper_task = asyncio.create_task(self._reaper_loop())
+
+    async def shutdown(self) -> None:
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            try:
+                await self._reaper_task
+            except asyncio.CancelledError:
+                pass
+
+    # -- Registration --
+
+    async def register(self, pgid: int, kind: str, owner_id: str, command: str = "") -> None:
+        """Record a freshly spawned group leader (``kind`` is "task" or "preview")."""
+        self._live.add(pgid)
+        try:
+            await db.conn.execute(
+                """INSERT OR REPLACE INTO process_groups
+                   (pgid, kind, owner_id, command, started_at, worker_id)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (
+                    pgid, kind, owner_id, command[:500],
+                    datetime.now(timezone.utc).isoformat(), worker_id(),
+                ),
+            )
+            await db.conn.commit()
+        except Exception:
+            logger.warning("Failed to record process group %d", pgid, exc_info=True)
+
+    async def release(self, pgid: int) -> None:
+        """Called once the group leader has exited: sweep stragglers and forget the group."""
+        self._live.discard(pgid)
+        if signal_group(pgid, 0):
+            members = await _list_processes()
+            stats = await self._kill_group(pgid, members)
+            if stats["processes"]:
+                logger.info(
+                    "Swept %d leftover process(es) from group %d", stats["processes"], pgid,
+                )
+                self._add_totals(stats)
+        try:
+            await db.conn.execute("DELETE FROM process_groups WHERE pgid = ?", (pgid,))
+            await db.conn.commit()
+        except Exception:
+            logger.warning("Failed to clear process group %d", pgid, exc_info=True)
+
+    # -- Reaping --
+
+    async def reap(self) -> dict:
+        """Kill recorded groups no live worker owns. Returns what was reclaimed."""
+        async with db.conn.execute(
+            "SELECT pgid, kind, owner_id, started_at, worker_id FROM process_groups"
+        ) as cur:
+            rows = [dict(r) for r in await cur.fetchall()]
+
+        stats = {"groups": 0, "processes": 0, "rss_bytes": 0}
+        me = worker_id()
+        alive = await live_workers()
+        # Another live worker's groups are its own business
+        orphans = [
+            r for r in rows
+            if r["pgid"] not in self._live
+            and (r["worker_id"] == me or r["worker_id"] not in alive)
+        ]
+        if orphans:
+            processes = await _list_processes()
+            stale: list[int] = []
+            for row in orphans:
+                pgid = row["pgid"]
+                members = [p for p in processes if p["pgid"] == pgid]
+                if members and self._is_same_group(row, members):
+                    logger.info(
+                        "Reaping orphaned %s process group %d (owner %s, %d process(es))",
+                        row["kind"], pgid, row["owner_id"], len(members),
+                    )
+                    group_stats = await self._kill_group(pgid, processes)
+                    stats["groups"] += 1
+                    stats["processes"] += group_stats["processes"]
+                    stats["rss_bytes"] += group_stats["rss_bytes"]
+                stale.append(pgid)
+            await db.conn.executemany(
+                "DELETE FROM process_groups WHERE pgid = ?", [(p,) for p in stale],
+            )
+            await db.conn.commit()
+
+        if stats["groups"]:
+            logger.info(
+                "Reaper reclaimed %d group(s), %d process(es), %.1f MB RSS",
+                stats["groups"], stats["processes"], stats["rss_bytes"] / 1_048_576,
+            )
+        self._add_totals(stats)
+        self.last_run = {**stats, "at": datetime.now(timezone.utc).isoformat()}
+        return stats
+
+    def get_stats(self) -> dict:
+        return {
+            "live_groups": len(self._live),
+            "totals": dict(self.totals),
+            "last_run": self.last_run,
+        }
+
+    # -- Internal helpers --
+
+    def _add_totals(self, stats: dict) -> None:
+        for key in self.totals:
+            self.totals[key] += stats.get(key, 0)
+
+    @staticmethod
+    def _is_same_group(row: dict, members: list[dict]) -> bool:
+        """Guard against PID reuse: a live leader must have started when we spawned it.
+
+        If the leader is gone but members remain, the kernel keeps the PGID
+        reserved, so the group is necessarily ours.
+        """
+        leader = next((p for p in members if p["pid"] == row["pgid"]), None)
+        if leader is None:
+            return True
+        try:
+            spawned = datetime.fromisoformat(row["started_at"]).timestamp()
+        except ValueError:
+            return False
+        return abs(leader["started_at"] - spawned) <= _START_TIME_TOLERANCE
+
+    @staticmethod
+    async def _kill_group(pgid: int, processes: list[dict], grace_seconds: float = 5.0) -> dict:
+        """SIGTERM a group, SIGKILL whatever survives the grace period."""
+        members = [p for p in processes if p["pgid"] == pgid]
+        stats = {
+            "processes": len(members),
+            "rss_bytes": sum(p["rss_bytes"] for p in members),
+        }
+        if not signal_group(pgid, signal.SIGTERM):
+            return stats
+        deadline = time.monotonic() + grace_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+            if not signal_group(pgid, 0):
+                return stats
+        signal_group(pgid, signal.SIGKILL)
+        return stats
+
+    async def _reaper_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.sleep(settings.process_reaper_interval_seconds)
+                await self.reap()
+            except asyncio.CancelledError:
+                break
+            except Exception:
+                logger.warning("Process reaper error", exc_info=True)
+
+
+async def _list_processes() -> list[dict]:
+    """Snapshot of host processes via ``ps`` (portable across Linux and macOS)."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "ps", "-A", "-o", "pid=,pgid=,rss=,etime=",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        stdout, _ = await proc.communicate()
+    except OSError:
+        logger.warning("Failed to list processes with ps", exc_info=True)
+        return []
+
+    now = time.time()
+    result: list[dict] = []
+    for line in stdout.decode(errors="replace").splitlines():
+        parts = line.split()
+        if len(parts) != 4:
+            continue
+        try:
+            result.append({
+                "pid": int(parts[0]),
+                "pgid": int(parts[1]),
+                "rss_bytes": int(parts[2]) * 1024,
+                "started_at": now - _parse_etime(parts[3]),
+            })
+        except ValueError:
+            continue
+    return result
+
+
+def _parse_etime(value: str) -> int:
+    """Parse ps ``etime`` (``[[dd-]hh:]mm:ss``) into seconds."""
+    days = 0
+    if "-" in value:
+        day_part, value = value.split("-", 1)
+        days = int(day_part)
+    seconds = 0
+    for part in value.split(":"):
+        seconds = seconds * 60 + int(part)
+    return days * 86400 + seconds
@@ -0,0 +1,249 @@
+"""Per-process resource limits and accounting for spawned subprocesses.
+
+Each CLI task or preview dev server can be confined to its own cgroup v2
+directory under ``settings.cgroup_root`` (memory.max, cpu.weight, pids.max).
+Where cgroups aren't available or writable — macOS, unprivileged containers —
+open files and CPU fall back to ``setrlimit``/``nice`` in the child, memory
+is not limited and accounting is skipped. (No rlimit approximates a memory
+cap: Node/V8 reserves large address ranges at startup, so RLIMIT_DATA or
+RLIMIT_AS low enough to matter stop node-based CLIs and dev servers from
+starting at all.)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # pragma: no cover — non-POSIX
+    resource = None  # type: ignore[assignment]
+
+from ...core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_CONTROLLERS = ("memory", "cpu", "pids")
+
+# None = not probed yet; probed lazily on first sandbox setup
+_cgroup_usable: bool | None = None
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    memory_max_mb: int = 0
+    cpu_weight: int = 0
+    pids_max: int = 0
+    open_files_max: int = 0
+
+    @property
+    def is_unlimited(self) -> bool:
+        return not (
+            self.memory_max_mb or self.cpu_weight or self.pids_max or self.open_files_max
+        )
+
+
+def task_limits() -> ResourceLimits:
+    """Limits applied to Claude CLI subprocesses."""
+    return ResourceLimits(
+        memory_max_mb=settings.task_memory_max_mb,
+        cpu_weight=settings.task_cpu_weight,
+        pids_max=settings.task_pids_max,
+        open_files_max=settings.task_open_files_max,
+    )
+
+
+def preview_limits() -> ResourceLimits:
+    """Limits applied to preview dev servers."""
+    return ResourceLimits(
+        memory_max_mb=settings.preview_memory_max_mb,
+        cpu_weight=settings.preview_cpu_weight,
+        pids_max=settings.preview_pids_max,
+        open_files_max=settings.preview_open_files_max,
+    )
+
+
+def _probe_cgroup_root() -> bool:
+    """Create the cgroup root and enable controllers for its children."""
+    root = settings.cgroup_root
+    if not Path("/sys/fs/cgroup/cgroup.controllers").exists():
+        logger.info("cgroup v2 not available — resource limits fall back to setrlimit")
+        return False
+    try:
+        root.mkdir(exist_ok=True)
+        available = (root / "cgroup.controllers").read_text().split()
+        wanted = " ".join(f"+{c}" for c in _CONTROLLERS if c in available)
+        if wanted:
+            (root / "cgroup.subtree_control").write_text(wanted)
+    except OSError as exc:
+        logger.info(
+            "cgroup root %s not writable (%s) — resource limits fall back to setrlimit",
+            root, exc,
+        )
+        return False
+    logger.info("Resource limits using cgroup v2 at %s", root)
+    return True
+
+
+def _cgroup_available() -> bool:
+    global _cgroup_usable
+    if _cgroup_usable is None:
+        _cgroup_usable = _probe_cgroup_root()
+    return _cgroup_usable
+
+
+class ResourceSandbox:
+    """Confines one subprocess (and its descendants) and reads back its usage.
+
+    Usage::
+
+        sandbox = ResourceSandbox("task-<session_id>", task_limits())
+        sandbox.setup()
+        proc = await asyncio.create_subprocess_exec(..., preexec_fn=sandbox.preexec_fn)
+        ...
+        usage = sandbox.read_usage()
+        sandbox.cleanup()
+    """
+
+    def __init__(self, name: str, limits: ResourceLimits) -> None:
+        self.name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+        self.limits = limits
+        self.cgroup_path: Path | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.resource_limits_enabled and not self.limits.is_unlimited
+
+    def setup(self) -> None:
+        """Create and configure the cgroup. Never raises — degrades to rlimits/nice."""
+        if not self.enabled or not _cgroup_available():
+            return
+        path = settings.cgroup_root / self.name
+        try:
+            path.mkdir(exist_ok=True)
+            if self.limits.memory_max_mb:
+                (path / "memory.max").write_text(str(self.limits.memory_max_mb * 1024 * 1024))
+                # Don't let the limit be dodged by swapping
+                swap_max = path / "memory.swap.max"
+                if swap_max.exists():
+                    swap_max.write_text("0")
+            if self.limits.cpu_weight:
+                (path / "cpu.weight").write_text(str(max(1, min(10000, self.limits.cpu_weight))))
+            if self.limits.pids_max:
+                (path / "pids.max").write_text(str(self.limits.pids_max))
+        except OSError as exc:
+            logger.warning("Failed to configure cgroup %s: %s", path, exc)
+            self._remove(path)
+            return
+        self.cgroup_path = path
+
+    def adopt(self) -> None:
+        """Pick up the cgroup of a run started by a previous backend process."""
+        if not self.enabled or not _cgroup_available():
+            return
+        path = settings.cgroup_root / self.name
+        if path.is_dir():
+            self.cgroup_path = path
+
+    @property
+    def preexec_fn(self):
+        """Callable for ``preexec_fn`` or None when nothing needs applying."""
+        return self._preexec if self.enabled else None
+
+    def _preexec(self) -> None:
+        """Runs in the forked child before exec — must not log or raise."""
+        if self.cgroup_path is not None:
+            try:
+                with open(self.cgroup_path / "cgroup.procs", "w") as f:
+                    f.write("0")  # "0" moves the writing process
+            except OSError:
+                pass
+        if resource is None:
+            return
+        if self.limits.open_files_max:
+            _set_rlimit(resource.RLIMIT_NOFILE, self.limits.open_files_max)
+        if self.cgroup_path is None:
+            # No cgroup — approximate the CPU limit; memory stays unlimited
+            if 0 < self.limits.cpu_weight < 100:
+                try:
+                    os.nice(round(19 * (1 - self.limits.cpu_weight / 100)))
+                except OSError:
+                    pass
+
+    def read_usage(self) -> dict | None:
+        """Read accounting from the cgroup, or None when not confined."""
+        path = self.cgroup_path
+        if path is None:
+            return None
+        usage: dict = {}
+        memory_peak = _read_int(path / "memory.peak")
+        if memory_peak is None:
+            memory_peak = _read_int(path / "memory.current")
+        if memory_peak is not None:
+            usage["memory_peak_bytes"] = memory_peak
+        cpu = _read_keyed(path / "cpu.stat")
+        if "usage_usec" in cpu:
+            usage["cpu_usage_usec"] = cpu["usage_usec"]
+            usage["cpu_user_usec"] = cpu.get("user_usec", 0)
+            usage["cpu_system_usec"] = cpu.get("system_usec", 0)
+        pids_peak = _read_int(path / "pids.peak")
+        if pids_peak is not None:
+            usage["pids_peak"] = pids_peak
+        events = _read_keyed(path / "memory.events")
+        if events.get("oom_kill"):
+            usage["oom_kills"] = events["oom_kill"]
+        return usage or None
+
+    def cleanup(self) -> None:
+        """Kill anything left in the cgroup and remove it."""
+        if self.cgroup_path is None:
+            return
+        kill_file = self.cgroup_path / "cgroup.kill"
+        if kill_file.exists():
+            try:
+                kill_file.write_text("1")
+            except OSError:
+                pass
+        self._remove(self.cgroup_path)
+        self.cgroup_path = None
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        try:
+            path.rmdir()
+        except OSError:
+            logger.debug("Could not remove cgroup %s", path, exc_info=True)
+
+
+def _set_rlimit(which: int, value: int) -> None:
+    try:
+        _soft, hard = resource.getrlimit(which)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        resource.setrlimit(which, (value, hard))
+    except (OSError, ValueError):
+        pass
+
+
+def _read_int(path: Path) -> int | None:
+    try:
+        return int(path.read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _read_keyed(path: Path) -> dict[str, int]:
+    """Parse a flat-keyed cgroup stat file (``key value`` per line)."""
+    result: dict[str, int] = {}
+    try:
+        for line in path.read_text().splitlines():
+            key, _, value = line.partition(" ")
+            if value.strip().isdigit():
+                result[key] = int(value)
+    except OSError:
+        pass
+    return result
@@ -9,7 +9,7 @@ from pathlib import Path
 from ...core.config import settings
 from ...core.database import db
 from ...core.exceptions import ProjectAlreadyExistsError, ProjectNotFoundError, SystemProjectError
-from ...services.preview.detector import detect as detect_preview
+from ...services.preview.detector import detect_services as detect_preview_services
 from ...utils.helpers import slugify
 
 logger = logging.getLogger(__name__)
@@ -317,12 +317,24 @@ class ProjectService:
                         git_branch = content.removeprefix("ref: refs/heads/")
             # Preview detection
             try:
-                detection = detect_preview(path)
+                services = detect_preview_services(path)
+                detection = services[0] if services else None
                 preview = {
-                    "supported": detection.supported,
-                    "framework": detection.framework,
-                    "needs_install": detection.needs_install,
-                    "subdir": detection.subdir,
+                    "supported": detection is not None,
+                    "framework": detection and detection.framework,
+                    "needs_install": any(s.needs_install for s in services),
+                    "subdir": detection and detection.subdir,
+                    "package_manager": detection and detection.package_manager,
+                    "services": [
+                        {
+                            "subdir": s.subdir,
+                            "framework": s.framework,
+                            "needs_install": s.needs_install,
+                            "package_manager": s.package_manager,
+                            "buildable": s.build_output is not None,
+                        }
+                        for s in services
+                    ],
                 }
             except Exception:
                 preview = None
@@ -0,0 +1,315 @@
+"""Task registry and event bus shared between backend workers.
+
+With a single uvicorn worker every task lives in this process and the
+:class:`TaskBus` base class is all that's needed: it only heartbeats, so
+other components (the process reaper) can tell live workers from dead ones.
+
+:class:`SqliteTaskBus` lets several workers share tasks through the
+database (WAL mode). The worker that spawns a task owns it: it claims the
+session in ``task_registry``, appends every broadcast event to
+``task_events`` and publishes status changes. Any other worker can replay
+and follow those events for its own WebSockets, and asks the owner to cancel
+by queueing a row in ``task_commands``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from ...core.config import settings
+from ...core.database import db
+from ...core.worker import heartbeat_cutoff, live_workers, worker_id
+
+logger = logging.getLogger(__name__)
+
+CommandHandler = Callable[[str, str], Awaitable[None]]  # (command, session_id)
+
+
+class TaskBus:
+    """Single-worker bus: this process owns every task, nothing is shared."""
+
+    shared = False
+
+    def __init__(self) -> None:
+        self.worker_id = worker_id()
+        self._on_command: CommandHandler | None = None
+        self._loop_task: asyncio.Task | None = None
+        self._last_heartbeat = 0.0
+
+    # -- Lifecycle --
+
+    async def startup(self, on_command: CommandHandler) -> None:
+        self._on_command = on_command
+        await self._heartbeat()
+        self._loop_task = asyncio.create_task(self._run_loop())
+
+    async def shutdown(self) -> None:
+        if self._loop_task:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+        await self._flush()
+        try:
+            # Going away cleanly — don't wait for the heartbeat to expire
+            await db.conn.execute(
+                "DELETE FROM task_workers WHERE worker_id = ?", (self.worker_id,)
+            )
+            await db.conn.commit()
+        except Exception:
+            logger.warning("Failed to deregister worker %s", self.worker_id, exc_info=True)
+
+    # -- Owner side --
+
+    async def claim(
+        self, session_id: str, project_id: str, started_at: datetime | None = None,
+    ) -> str | None:
+        """Take ownership of a session's next task.
+
+        *started_at* is the original start of a reattached run, kept so its
+        age survives restarts. Returns None when claimed, or the ID of the
+        live worker already running a task for this session.
+        """
+        return None
+
+    def publish(self, session_id: str, event: dict) -> None:
+        """Make a broadcast event visible to other workers (buffered, never blocks)."""
+
+    async def set_status(self, session_id: str, status: str) -> None:
+        """Record a task's status; pending events are flushed first."""
+
+    # -- Follower side --
+
+    async def lookup(self, session_id: str) -> dict | None:
+        """Registry row for a task owned by *another* worker, if any."""
+        return None
+
+    async def read_events(
+        self, session_id: str, after_seq: int = 0,
+    ) -> list[tuple[int, dict]]:
+        return []
+
+    async def request_cancel(self, session_id: str, owner: str) -> None:
+        """Ask the owning worker to cancel a task."""
+
+    async def list_remote(self) -> list[dict]:
+        """Registry rows for tasks owned by other workers."""
+        return []
+
+    # -- Internal --
+
+    async def _run_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.sleep(self._loop_interval())
+                await self._tick()
+            except asyncio.CancelledError:
+                break
+            except Exception:
+                logger.warning("Task bus error", exc_info=True)
+
+    def _loop_interval(self) -> float:
+        return settings.worker_heartbeat_seconds
+
+    async def _tick(self) -> None:
+        await self._heartbeat()
+
+    async def _heartbeat(self) -> None:
+        self._last_heartbeat = time.monotonic()
+        await db.conn.execute(
+            """INSERT INTO task_workers (worker_id, pid, heartbeat_at) VALUES (?, ?, ?)
+               ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at""",
+            (self.worker_id, os.getpid(), time.time()),
+        )
+        # Forget workers that stopped heartbeating long ago
+        await db.conn.execute(
+            "DELETE FROM task_workers WHERE heartbeat_at < ?",
+            (time.time() - 24 * 3600,),
+        )
+        await db.conn.commit()
+
+    async def _flush(self) -> None:
+        pass
+
+
+class SqliteTaskBus(TaskBus):
+    """Shares tasks between workers through the SQLite database."""
+
+    shared = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._pending: list[tuple[str, int, str]] = []  # (session_id, seq, event JSON)
+        self._seq: dict[str, int] = {}  # session_id → last seq published by this worker
+
+    async def claim(
+        self, session_id: str, project_id: str, started_at: datetime | None = None,
+    ) -> str | None:
+        started = (started_at or datetime.now(timezone.utc)).isoformat()
+        # One atomic upsert: take the row unless another live worker is running it
+        cursor = await db.conn.execute(
+            """INSERT INTO task_registry
+                   (session_id, project_id, owner_worker, status, started_at)
+               VALUES (?, ?, ?, 'running', ?)
+               ON CONFLICT(session_id) DO UPDATE SET
+                   project_id = excluded.project_id,
+                   owner_worker = excluded.owner_worker,
+                   status = 'running',
+                   started_at = excluded.started_at,
+                   completed_at = NULL
+               WHERE task_registry.status != 'running'
+                  OR task_registry.owner_worker = excluded.owner_worker
+                  OR task_registry.owner_worker NOT IN (
+                      SELECT worker_id FROM task_workers WHERE heartbeat_at > ?
+                  )""",
+            (session_id, project_id, self.worker_id, started, heartbeat_cutoff()),
+        )
+        if cursor.rowcount == 0:
+            await db.conn.commit()
+            async with db.conn.execute(
+                "SELECT owner_worker FROM task_registry WHERE session_id = ?", (session_id,)
+            ) as cur:
+                row = await cur.fetchone()
+            return row["owner_worker"] if row else None
+
+        # A new turn replaces the previous task's event log, as locally
+        self._pending = [p for p in self._pending if p[0] != session_id]
+        self._seq[session_id] = 0
+        await db.conn.execute("DELETE FROM task_events WHERE session_id = ?", (session_id,))
+        await db.conn.commit()
+        return None
+
+    def publish(self, session_id: str, event: dict) -> None:
+        seq = self._seq.get(session_id, 0) + 1
+        self._seq[session_id] = seq
+        self._pending.append((session_id, seq, json.dumps(event)))
+
+    async def set_status(self, session_id: str, status: str) -> None:
+        await self._flush()
+        completed_at = None if status == "running" else datetime.now(timezone.utc).isoformat()
+        await db.conn.execute(
+            """UPDATE task_registry SET status = ?, completed_at = ?
+               WHERE session_id = ? AND owner_worker = ?""",
+            (status, completed_at, session_id, self.worker_id),
+        )
+        await db.conn.commit()
+        if status != "running":
+            self._seq.pop(session_id, None)
+
+    async def lookup(self, session_id: str) -> dict | None:
+        async with db.conn.execute(
+            "SELECT * FROM task_registry WHERE session_id = ? AND owner_worker != ?",
+            (session_id, self.worker_id),
+        ) as cur:
+            row = await cur.fetchone()
+        if row is None:
+            return None
+        result = dict(row)
+        if result["status"] == "running" and result["owner_worker"] not in await live_workers():
+            result["status"] = "error"  # owner died mid-task
+            result["owner_dead"] = True
+        return result
+
+    async def read_events(
+        self, session_id: str, after_seq: int = 0,
+    ) -> list[tuple[int, dict]]:
+        async with db.conn.execute(
+            "SELECT seq, event FROM task_events WHERE session_id = ? AND seq > ? ORDER BY seq",
+            (session_id, after_seq),
+        ) as cur:
+            rows = await cur.fetchall()
+        return [(row["seq"], json.loads(row["event"])) for row in rows]
+
+    async def request_cancel(self, session_id: str, owner: str) -> None:
+        await db.conn.execute(
+            "INSERT INTO task_commands (worker_id, session_id, command) VALUES (?, ?, 'cancel')",
+            (owner, session_id),
+        )
+        await db.conn.commit()
+
+    async def list_remote(self) -> list[dict]:
+        async with db.conn.execute(
+            "SELECT * FROM task_registry WHERE owner_worker != ?", (self.worker_id,)
+        ) as cur:
+            return [dict(row) for row in await cur.fetchall()]
+
+    # -- Internal --
+
+    def _loop_interval(self) -> float:
+        return settings.task_bus_poll_seconds
+
+    async def _tick(self) -> None:
+        await self._flush()
+        await self._dispatch_commands()
+        if time.monotonic() - self._last_heartbeat >= settings.worker_heartbeat_seconds:
+            await self._heartbeat()
+            await self._prune()
+
+    async def _prune(self) -> None:
+        """Drop finished tasks' registry rows and event logs past the buffer TTL.
+
+        Matches how long ``TaskManager`` keeps a completed task's buffer for
+        replay; without this, every delta of every turn stays in the database.
+        """
+        cutoff = datetime.fromtimestamp(
+            time.time() - settings.task_buffer_ttl_seconds, timezone.utc,
+        ).isoformat()
+        await db.conn.execute(
+            """DELETE FROM task_events WHERE session_id IN (
+                   SELECT session_id FROM task_registry
+                   WHERE status != 'running' AND completed_at < ?
+               )""",
+            (cutoff,),
+        )
+        await db.conn.execute(
+            "DELETE FROM task_registry WHERE status != 'running' AND completed_at < ?",
+            (cutoff,),
+        )
+        await db.conn.commit()
+
+    async def _flush(self) -> None:
+        """Write buffered events in one transaction — one commit per tick, not per delta."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        await db.conn.executemany(
+            "INSERT OR REPLACE INTO task_events (session_id, seq, event) VALUES (?, ?, ?)",
+            pending,
+        )
+        await db.conn.commit()
+
+    async def _dispatch_commands(self) -> None:
+        async with db.conn.execute(
+            "SELECT id, session_id, command FROM task_commands WHERE worker_id = ?",
+            (self.worker_id,),
+        ) as cur:
+            rows = await cur.fetchall()
+        if not rows:
+            return
+        await db.conn.executemany(
+            "DELETE FROM task_commands WHERE id = ?", [(row["id"],) for row in rows],
+        )
+        await db.conn.commit()
+        for row in rows:
+            logger.info(
+                "Worker %s received %s for session %s",
+                self.worker_id, row["command"], row["session_id"],
+            )
+            if self._on_command:
+                await self._on_command(row["command"], row["session_id"])
+
+
+def create_task_bus() -> TaskBus:
+    """Build the bus selected by ``settings.task_bus``."""
+    if settings.task_bus == "sqlite":
+        return SqliteTaskBus()
+    if settings.task_bus != "local":
+        logger.warning("Unknown task_bus %r — using the local bus", settings.task_bus)
+    return TaskBus()
@@ -9,39 +9,164 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
+import uuid
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, AsyncIterator
 
 from ...core.config import settings
+from ...core.metrics import BYTES_BUCKETS, RATE_BUCKETS, metrics
+from ...core.tracing import tracer
+from ...core.worker import live_workers
+
+from ..chat.transport import EncodedEvent, EventStream, send_event
+from ..messages.message_service import summarize_tool_uses
 
 if TYPE_CHECKING:
     from fastapi import WebSocket
 
     from ..claude.process_manager import ProcessManager
+    from ..claude.stream_parser import ParsedEvent
     from ..messages.message_service import MessageService
+    from ..messages.tool_output_store import ToolOutputStore
+    from ..preview.preview_service import PreviewService
     from ..sessions.session_service import SessionService
+    from .task_bus import TaskBus
 
 logger = logging.getLogger(__name__)
 
+# Events that count as the first visible output for time-to-first-token
+_CONTENT_EVENTS = frozenset({"text_delta", "thinking_delta", "tool_use_start"})
+
+# How long a finished mirror keeps polling for the owner's trailing events
+_MIRROR_TAIL_SECONDS = 5
+
+# Observed only on tool results, first token, spawn and completion — never
+# per delta — so the streaming loop stays cheap
+_TOOL_DURATION = metrics.histogram(
+    "casperbot_tool_duration_seconds", "Tool call duration", labels=("tool",),
+)
+_TOOL_OUTPUT = metrics.histogram(
+    "casperbot_tool_output_bytes", "Tool result size", BYTES_BUCKETS, labels=("tool",),
+)
+_TOOL_CALLS = metrics.counter(
+    "casperbot_tool_calls_total", "Completed tool calls", labels=("tool", "outcome"),
+)
+_SPAWN = metrics.histogram(
+    "casperbot_cli_spawn_seconds", "Send received to CLI process spawned",
+    labels=("prepared",),
+)
+_TTFT = metrics.histogram(
+    "casperbot_time_to_first_token_seconds", "Send received to first streamed content",
+    labels=("prepared",),
+)
+_TOKENS_PER_SECOND = metrics.histogram(
+    "casperbot_output_tokens_per_second",
+    "Output tokens per second from first token to message_complete", RATE_BUCKETS,
+)
+_TASKS_STARTED = metrics.counter("casperbot_tasks_started_total", "Tasks started")
+
 
 @dataclass
 class BackgroundTask:
     session_id: str
     project_id: str
-    status: str = "running"  # running | completed | cancelled | error | waiting_for_input
+    # running | completed | cancelled | error | waiting_for_input | detached
+    status: str = "running"
     started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
     completed_at: datetime | None = None
     event_buffer: list[dict] = field(default_factory=list)
-    subscribers: set[WebSocket] = field(default_factory=set)
+    subscribers: set[WebSocket | EventStream] = field(default_factory=set)
     asyncio_task: asyncio.Task | None = None
-    # Accumulators for message persistence
-    full_content: str = ""
-    full_thinking: str = ""
-    tool_uses_acc: list[dict] = field(default_factory=list)
+    # Accumulators for message persistence — lists of chunks, joined on
+    # demand, so long outputs don't pay for quadratic string concatenation
+    content_parts: list[str] = field(default_factory=list)
+    thinking_parts: list[str] = field(default_factory=list)
+    # tool_id → persisted tool-use dict, in call order (dicts keep insertion
+    # order), so a tool_result finds its call in O(1)
+    tool_calls: dict[str, dict] = field(default_factory=dict)
+    tool_started: dict[str, float] = field(default_factory=dict)  # tool_id → monotonic start
     final_usage: dict | None = None
     final_cost: float | None = None
+    resource_usage: dict | None = None  # cgroup accounting for the CLI process
+    timeout_reason: str | None = None  # "timeout" | "idle_timeout" if the watchdog fired
+    # Latency tracking: when the send arrived (monotonic) and how long until
+    # the first streamed content, plus whether a "prepare" warm-up was used
+    requested_at: float | None = None
+    spawn_ms: float | None = None
+    first_token_ms: float | None = None
+    tokens_per_second: float | None = None
+    prepared: bool = False
+    # Resumed from a detached run's spool after a restart: its events were
+    # replayed in a burst, so latency/duration metrics would be meaningless
+    reattached: bool = False
+    # Checkpointing: the assistant row is upserted as "partial" while streaming
+    # and finalized on completion, so a crash loses at most one interval
+    message_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    message_created_at: str = field(
+        default_factory=lambda: datetime.now(timezone.utc).isoformat()
+    )
+    checkpointed: bool = False  # a partial row exists in the DB
+    dirty_bytes: int = 0  # accumulated since the last checkpoint
+    last_checkpoint_at: float = field(default_factory=time.monotonic)
+    checkpoint_task: asyncio.Task | None = None
+    checkpoint_timer: asyncio.TimerHandle | None = None  # armed while changes are unsaved
+    persisted: bool = False  # final write done
+    # Set on read-only mirrors of tasks owned by another worker (see TaskBus):
+    # the owner's worker ID and the last bus event applied
+    owner: str | None = None
+    bus_seq: int = 0
+
+    @property
+    def full_content(self) -> str:
+        return "".join(self.content_parts)
+
+    @property
+    def full_thinking(self) -> str:
+        return "".join(self.thinking_parts)
+
+    @property
+    def tool_uses_acc(self) -> list[dict]:
+        return list(self.tool_calls.values())
+
+    def start_tool(self, tool_id: str, tool_name: str, tool_input: dict) -> dict:
+        key = tool_id or f"_anonymous-{len(self.tool_calls)}"
+        call = {
+            "toolId": tool_id,
+            "toolName": tool_name,
+            "input": tool_input,
+            "isComplete": False,
+            "startedAt": datetime.now(timezone.utc).isoformat(),
+        }
+        self.tool_calls[key] = call
+        self.tool_started[key] = time.monotonic()
+        return call
+
+    def complete_tool(
+        self, tool_id: str, output: str, is_error: bool,
+        output_handle: str | None = None, output_size: int | None = None,
+    ) -> dict | None:
+        """Attach a result to its call and record the duration. None if unknown.
+
+        For an offloaded output, *output* is the preview and the handle and
+        full size are kept alongside it.
+        """
+        call = self.tool_calls.get(tool_id)
+        if call is None:
+            return None
+        call["output"] = output
+        if output_handle:
+            call["outputHandle"] = output_handle
+            call["outputSize"] = output_size
+        call["isError"] = is_error
+        call["isComplete"] = True
+        call["completedAt"] = datetime.now(timezone.utc).isoformat()
+        started = self.tool_started.pop(tool_id, None)
+        if started is not None:
+            call["durationMs"] = round((time.monotonic() - started) * 1000, 1)
+        return call
 
 
 def _event_to_json(event, session_id: str) -> dict | None:
@@ -81,32 +206,133 @@ class TaskManager:
         process_manager: ProcessManager,
         message_service: MessageService,
         session_service: SessionService,
+        task_bus: TaskBus,
+        tool_outputs: ToolOutputStore,
+        preview_service: PreviewService,
     ) -> None:
         self._tasks: dict[str, BackgroundTask] = {}
+        # Tasks owned by other workers that local WebSockets are following
+        self._mirrors: dict[str, BackgroundTask] = {}
         self._lock = asyncio.Lock()
         self._process_manager = process_manager
         self._message_service = message_service
         self._session_service = session_service
+        self._bus = task_bus
+        self._tool_outputs = tool_outputs
+        # Told when a turn starts and ends, to pause the project's preview meanwhile
+        self._preview_service = preview_service
+        # Replaced each time the task list changes, to wake /api/tasks long-polls
+        self._changed = asyncio.Event()
         self._cleanup_loop_task: asyncio.Task | None = None
+        self._mirror_loop_task: asyncio.Task | None = None
+        metrics.gauge(
+            "casperbot_tasks", "Tasks held by the task manager", self._count_by_status,
+            labels=("status",),
+        )
 
     # -- Lifecycle --
 
     async def startup(self) -> None:
+        await self._bus.startup(self._on_bus_command)
+        # Detached CLI runs survive restarts — pick them back up first so
+        # their checkpoints aren't flagged as interrupted
+        resumed: set[str] = set()
+        try:
+            resumed = await self._reattach_detached()
+        except Exception:
+            logger.warning("Failed to reattach detached tasks", exc_info=True)
+        # Checkpoints still marked partial belong to tasks that died with the
+        # previous backend process — keep their content, flag them interrupted
+        try:
+            recovered = await self._message_service.mark_interrupted(exclude=resumed)
+            if recovered:
+                logger.info("Recovered %d interrupted assistant message(s)", recovered)
+        except Exception:
+            logger.warning("Failed to recover interrupted messages", exc_info=True)
         self._cleanup_loop_task = asyncio.create_task(self._cleanup_loop())
+        if self._bus.shared:
+            self._mirror_loop_task = asyncio.create_task(self._mirror_loop())
 
     async def shutdown(self) -> None:
-        if self._cleanup_loop_task:
-            self._cleanup_loop_task.cancel()
-            try:
-                await self._cleanup_loop_task
-            except asyncio.CancelledError:
-                pass
+        for loop_task in (self._cleanup_loop_task, self._mirror_loop_task):
+            if loop_task:
+                loop_task.cancel()
+                try:
+                    await loop_task
+                except asyncio.CancelledError:
+                    pass
+
+        if settings.detached_tasks:
+            await self._detach_running()
 
         # Cancel all running tasks and persist what we can
         async with self._lock:
             session_ids = list(self._tasks.keys())
         for sid in session_ids:
             await self.cancel_task(sid)
+        await self._bus.shutdown()
+
+    # -- Detached runs --
+
+    async def _detach_running(self) -> None:
+        """Stop following running tasks but leave their CLIs running.
+
+        Each task's progress is checkpointed; the next backend process
+        rebuilds the full stream from the spool and carries on.
+        """
+        self._process_manager.detach_all()
+        running = [t for t in self._tasks.values() if t.status == "running"]
+        for task in running:
+            if task.asyncio_task and not task.asyncio_task.done():
+                task.asyncio_task.cancel()
+        await asyncio.gather(
+            *(t.asyncio_task for t in running if t.asyncio_task), return_exceptions=True,
+        )
+        for task in running:
+            task.status = "detached"
+            await self._write_checkpoint(
+                task,
+                content=task.full_content,
+                thinking=task.full_thinking,
+                tool_uses=[dict(tu) for tu in task.tool_uses_acc],
+            )
+        if running:
+            logger.info("Detached %d running task(s) for reattach after restart", len(running))
+
+    async def _reattach_detached(self) -> set[str]:
+        """Resume spooled runs no live worker is following. Returns their message IDs."""
+        alive = await live_workers()
+        resumed: set[str] = set()
+        for meta in self._process_manager.list_detached():
+            session_id = meta["session_id"]
+            owner = meta.get("worker_id")
+            if owner in alive and owner != self._bus.worker_id:
+                continue  # another live worker is streaming it
+            existing = self._tasks.get(session_id)
+            if existing and existing.status == "running":
+                continue
+            started_at = datetime.fromisoformat(meta["started_at"])
+            if await self._bus.claim(session_id, meta["project_id"], started_at) is not None:
+                continue
+            task = BackgroundTask(
+                session_id=session_id,
+                project_id=meta["project_id"],
+                started_at=started_at,
+                reattached=True,
+                checkpointed=True,
+            )
+            if meta.get("message_id"):
+                task.message_id = meta["message_id"]
+                task.message_created_at = meta.get("message_created_at", task.message_created_at)
+            self._tasks[session_id] = task
+            task.asyncio_task = asyncio.create_task(
+                self._run_task(task, self._process_manager.reattach(meta))
+            )
+            self._notify_change()
+            resumed.add(task.message_id)
+        if resumed:
+            logger.info("Reattached %d detached task(s)", len(resumed))
+        return resumed
 
     # -- Task creation --
 
@@ -119,8 +345,14 @@ class TaskManager:
         is_continuation: bool,
         model: str | None,
         max_budget_usd: float | None,
+        requested_at: float | None = None,
+        prepared: bool = False,
     ) -> BackgroundTask:
-        """Start a new background task. Returns the task immediately."""
+        """Start a new background task. Returns the task immediately.
+
+        ``requested_at`` is the ``time.monotonic()`` at which the send was
+        received, used to measure time-to-first-token.
+        """
         async with self._lock:
             running_count = sum(
                 1 for t in self._tasks.values() if t.status == "running"
@@ -138,40 +370,122 @@ class TaskManager:
             if existing:
                 del self._tasks[session_id]
 
+            owner = await self._bus.claim(session_id, project_id)
+            if owner is not None:
+                raise RuntimeError(
+                    "Session is busy on another worker. Cancel the current request first."
+                )
+
             task = BackgroundTask(
                 session_id=session_id,
                 project_id=project_id,
+                requested_at=requested_at or time.monotonic(),
+                prepared=prepared,
             )
+            # Sockets following the previous turn from another worker now
+            # follow this one directly
+            mirror = self._mirrors.pop(session_id, None)
+            if mirror:
+                task.subscribers |= mirror.subscribers
             self._tasks[session_id] = task
+        _TASKS_STARTED.inc()
+        self._notify_change()
 
         # Spawn the background coroutine
-        task.asyncio_task = asyncio.create_task(
-            self._run_task(
-                task=task,
-                project_path=project_path,
-                message=message,
-                is_continuation=is_continuation,
-                model=model,
-                max_budget_usd=max_budget_usd,
-            )
+        events = self._process_manager.run_prompt(
+            session_id=session_id,
+            project_id=project_id,
+            project_path=project_path,
+            message=message,
+            is_continuation=is_continuation,
+            model=model,
+            max_budget_usd=max_budget_usd,
+            spool_meta={
+                "message_id": task.message_id,
+                "message_created_at": task.message_created_at,
+            },
         )
+        task.asyncio_task = asyncio.create_task(self._run_task(task, events))
 
         return task
 
+    async def prepare_launch(self, project_id: str) -> None:
+        """Warm the launch profile for a project's next task (see ``prepare`` WS message)."""
+        await self._process_manager.prepare_launch(project_id)
+
     # -- Subscription --
 
     async def subscribe(self, session_id: str, websocket: WebSocket) -> bool:
-        """Subscribe a WebSocket to a task. Returns True if task exists."""
+        """Subscribe a WebSocket to a task. Returns True if task exists.
+
+        Tasks owned by another worker are followed through a local mirror.
+        """
         async with self._lock:
-            task = self._tasks.get(session_id)
+            task = self._tasks.get(session_id) or self._mirrors.get(session_id)
+            if not task:
+                task = await self._open_mirror(session_id)
             if not task:
                 return False
             task.subscribers.add(websocket)
             return True
 
+    async def follow(
+        self, session_id: str, stream: EventStream, last_event_id: str | None = None,
+    ) -> BackgroundTask | None:
+        """Subscribe an SSE stream, queueing buffered events after *last_event_id*.
+
+        IDs from a previous turn (or none) replay the whole buffer. Returns
+        the followed task, or None if there is none for the session.
+        """
+        async with self._lock:
+            task = self._tasks.get(session_id) or self._mirrors.get(session_id)
+            if not task:
+                task = await self._open_mirror(session_id)
+            if not task:
+                return None
+            stream.key = task.message_id[:8]
+            start = 0
+            if last_event_id:
+                key, _, seq = last_event_id.partition(".")
+                if key == stream.key and seq.isdigit():
+                    start = min(int(seq), len(task.event_buffer))
+            # Replay and subscription happen under the lock with no await in
+            # between, so nothing is missed or sent twice
+            for seq, event in enumerate(task.event_buffer[start:], start + 1):
+                stream.push(EncodedEvent(event, seq))
+            task.subscribers.add(stream)
+            return task
+
+    @staticmethod
+    def is_stream_finished(task: BackgroundTask) -> bool:
+        """Whether a followed task will broadcast nothing more worth waiting for."""
+        if task.status == "running":
+            return False
+        if task.owner is None or task.completed_at is None:
+            return True
+        # Mirrors keep reading the owner's trailing events for a few seconds
+        elapsed = (datetime.now(timezone.utc) - task.completed_at).total_seconds()
+        return elapsed >= _MIRROR_TAIL_SECONDS
+
+    @property
+    def shares_tasks(self) -> bool:
+        """Whether other workers' tasks are visible (and change without notice here)."""
+        return self._bus.shared
+
+    async def wait_for_change(self, timeout: float) -> None:
+        """Wait until a task starts, changes status or expires, or *timeout* passes."""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _notify_change(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
     def get_replay(self, session_id: str) -> tuple[list[dict], bool] | None:
         """Get buffered events for replay. Returns (events, is_complete) or None."""
-        task = self._tasks.get(session_id)
+        task = self._tasks.get(session_id) or self._mirrors.get(session_id)
         if not task:
             return None
         is_complete = task.status != "running"
@@ -180,24 +494,34 @@ class TaskManager:
     async def unsubscribe(self, session_id: str, websocket: WebSocket) -> None:
         """Remove a WebSocket from a task's subscriber list."""
         async with self._lock:
-            task = self._tasks.get(session_id)
+            task = self._tasks.get(session_id) or self._mirrors.get(session_id)
             if task:
                 task.subscribers.discard(websocket)
 
-    async def unsubscribe_all(self, websocket: WebSocket) -> None:
-        """Remove a WebSocket from ALL tasks. Called on disconnect."""
+    async def unsubscribe_all(self, websocket: WebSocket | EventStream) -> None:
+        """Remove a WebSocket (or SSE stream) from ALL tasks. Called on disconnect."""
         async with self._lock:
-            for task in self._tasks.values():
+            for task in (*self._tasks.values(), *self._mirrors.values()):
                 task.subscribers.discard(websocket)
 
     # -- Cancellation --
 
     async def cancel_task(self, session_id: str) -> bool:
-        """Cancel a running task. Broadcasts cancelled event to all subscribers."""
+        """Cancel a running task. Broadcasts cancelled event to all subscribers.
+
+        For a task owned by another worker, the owner is asked to cancel and
+        the cancelled event arrives through the bus.
+        """
         async with self._lock:
             task = self._tasks.get(session_id)
-            if not task or task.status != "running":
+        if not task:
+            remote = await self._bus.lookup(session_id)
+            if not remote or remote["status"] != "running":
                 return False
+            await self._bus.request_cancel(session_id, remote["owner_worker"])
+            return True
+        if task.status != "running":
+            return False
 
         # Kill the process
         cancelled = await self._process_manager.cancel(session_id)
@@ -211,26 +535,54 @@ class TaskManager:
 
         # Persist whatever we have so far
         await self._persist_assistant(task)
+        self._process_manager.discard_spool(session_id)
 
         # Broadcast cancellation to all subscribers
         cancel_event = {"type": "cancelled", "session_id": session_id}
         task.event_buffer.append(cancel_event)
         await self._broadcast(task, cancel_event)
+        await self._publish_status(task)
 
         return cancelled or True
 
     # -- Monitoring --
 
     def is_task_running(self, session_id: str) -> bool:
-        task = self._tasks.get(session_id)
+        task = self._tasks.get(session_id) or self._mirrors.get(session_id)
         return task is not None and task.status == "running"
 
+    def get_tool_calls(self, session_id: str) -> dict | None:
+        """Tool calls of a task with timings (outputs omitted), plus a per-tool summary."""
+        task = self._tasks.get(session_id)
+        if not task:
+            return None
+        now = time.monotonic()
+        calls = []
+        for key, call in task.tool_calls.items():
+            entry = {k: v for k, v in call.items() if k not in ("output", "input")}
+            started = task.tool_started.get(key)
+            if started is not None:
+                entry["elapsedMs"] = round((now - started) * 1000, 1)  # still running
+            calls.append(entry)
+        return {
+            "session_id": session_id,
+            "calls": calls,
+            "summary": summarize_tool_uses(task.tool_uses_acc),
+        }
+
+    def _count_by_status(self) -> dict[tuple[str, ...], float]:
+        counts: dict[tuple[str, ...], float] = {}
+        for task in self._tasks.values():
+            counts[(task.status,)] = counts.get((task.status,), 0) + 1
+        return counts
+
     def list_active(self) -> list[dict]:
         """Return summary of all tasks for REST endpoint."""
         now = datetime.now(timezone.utc)
         result = []
-        for task in self._tasks.values():
+        for task in (*self._tasks.values(), *self._mirrors.values()):
             elapsed = (now - task.started_at).total_seconds()
+            timing = self._process_manager.get_timing(task.session_id) or {}
             result.append({
                 "session_id": task.session_id,
                 "project_id": task.project_id,
@@ -240,6 +592,37 @@ class TaskManager:
                 "event_count": len(task.event_buffer),
                 "subscriber_count": len(task.subscribers),
                 "elapsed_seconds": round(elapsed, 1),
+                "resources": task.resource_usage,
+                "idle_seconds": timing.get("idle_seconds"),
+                "timeout_remaining_seconds": timing.get("timeout_remaining_seconds"),
+                "timeout_reason": task.timeout_reason,
+                "send_to_spawn_ms": task.spawn_ms,
+                "time_to_first_token_ms": task.first_token_ms,
+                "tokens_per_second": task.tokens_per_second,
+                "prepared": task.prepared,
+                "worker": task.owner or self._bus.worker_id,
+            })
+        return result
+
+    async def list_all(self) -> list[dict]:
+        """``list_active`` plus tasks other workers own that nobody here follows."""
+        result = self.list_active()
+        known = {t["session_id"] for t in result}
+        now = datetime.now(timezone.utc)
+        for row in await self._bus.list_remote():
+            if row["session_id"] in known:
+                continue
+            started = datetime.fromisoformat(row["started_at"])
+            result.append({
+                "session_id": row["session_id"],
+                "project_id": row["project_id"],
+                "status": row["status"],
+                "started_at": row["started_at"],
+                "completed_at": row["completed_at"],
+                "event_count": 0,
+                "subscriber_count": 0,
+                "elapsed_seconds": round((now - started).total_seconds(), 1),
+                "worker": row["owner_worker"],
             })
         return result
 
@@ -254,137 +637,394 @@ class TaskManager:
     async def _broadcast(self, task: BackgroundTask, event_json: dict) -> None:
         """Send an event to all subscribers, silently removing dead connections."""
         dead: list[WebSocket] = []
+        # Serialized once, not per subscriber; buffered events carry their
+        # position for SSE resume
+        buffered = bool(task.event_buffer) and task.event_buffer[-1] is event_json
+        encoded = EncodedEvent(event_json, len(task.event_buffer) if buffered else None)
         for ws in task.subscribers:
             try:
-                await ws.send_json(event_json)
+                await send_event(ws, encoded)
             except Exception:
                 dead.append(ws)
         for ws in dead:
             task.subscribers.discard(ws)
+        if task.owner is None:
+            self._bus.publish(task.session_id, event_json)
 
     # -- Core task runner --
 
     async def _run_task(
-        self,
-        task: BackgroundTask,
-        project_path: Path,
-        message: str,
-        is_continuation: bool,
-        model: str | None,
-        max_budget_usd: float | None,
+        self, task: BackgroundTask, events: AsyncIterator[ParsedEvent],
     ) -> None:
         """Background coroutine that consumes process events, buffers, and broadcasts."""
         session_id = task.session_id
+        self._preview_service.agent_turn_started(task.project_id)
 
-        try:
-            # Send message_start
-            start_event = {"type": "message_start", "session_id": session_id}
-            task.event_buffer.append(start_event)
-            await self._broadcast(task, start_event)
+        broadcast_seconds = 0.0
+        with tracer.span(
+            "task.run", session_id=session_id, prepared=task.prepared,
+        ) as run_span:
+            try:
+                # Send message_start
+                start_event = {"type": "message_start", "session_id": session_id}
+                task.event_buffer.append(start_event)
+                await self._broadcast(task, start_event)
 
-            async for event in self._process_manager.run_prompt(
-                session_id=session_id,
-                project_id=task.project_id,
-                project_path=project_path,
-                message=message,
-                is_continuation=is_continuation,
-                model=model,
-                max_budget_usd=max_budget_usd,
-            ):
-                outbound = _event_to_json(event, session_id)
-                if not outbound:
-                    continue
-
-                # Buffer the event
-                task.event_buffer.append(outbound)
-
-                # Broadcast to all subscribers
-                await self._broadcast(task, outbound)
-
-                # Accumulate for persistence
-                if event.type == "text_delta":
-                    task.full_content += event.data.get("text", "")
-                elif event.type == "thinking_delta":
-                    task.full_thinking += event.data.get("thinking", "")
-                elif event.type == "tool_use_start":
-                    task.tool_uses_acc.append({
-                        "toolId": event.data.get("tool_id", ""),
-                        "toolName": event.data.get("tool_name", ""),
-                        "input": event.data.get("input", {}),
-                        "isComplete": False,
-                    })
-                elif event.type == "tool_result":
-                    tool_id = event.data.get("tool_id", "")
-                    for tu in task.tool_uses_acc:
-                        if tu["toolId"] == tool_id:
-                            tu["output"] = event.data.get("output", "")
-                            tu["isError"] = event.data.get("is_error", False)
-                            tu["isComplete"] = True
-                            break
-                elif event.type == "message_complete":
-                    task.final_usage = event.data.get("usage")
-                    task.final_cost = event.data.get("cost_usd")
-
-                # AskUserQuestion: kill process, set waiting_for_input
-                if (
-                    event.type == "tool_use_start"
-                    and event.data.get("tool_name") == "AskUserQuestion"
-                ):
+                async for event in events:
+                    if event.type == "resource_usage":
+                        task.resource_usage = event.data
+                        continue
+                    if event.type == "process_spawned":
+                        if task.spawn_ms is None:
+                            task.spawn_ms = round(
+                                (event.data["spawned_at"] - task.requested_at) * 1000, 1
+                            )
+                            _SPAWN.observe(task.spawn_ms / 1000, str(task.prepared).lower())
+                            logger.info(
+                                "Send-to-spawn for session %s: %.0f ms (prepared=%s)",
+                                session_id, task.spawn_ms, task.prepared,
+                            )
+                        continue
+
+                    outbound = _event_to_json(event, session_id)
+                    if not outbound:
+                        continue
+                    if event.type == "tool_result":
+                        # Large outputs go to disk; subscribers get a preview + handle
+                        offloaded = await self._tool_outputs.offload(
+                            session_id, outbound["output"],
+                        )
+                        if offloaded:
+                            outbound.update(offloaded)
+
+                    if (
+                        task.first_token_ms is None
+                        and not task.reattached
+                        and event.type in _CONTENT_EVENTS
+                    ):
+                        task.first_token_ms = round(
+                            (time.monotonic() - task.requested_at) * 1000, 1
+                        )
+                        _TTFT.observe(task.first_token_ms / 1000, str(task.prepared).lower())
+                        logger.info(
+                            "Time to first token for session %s: %.0f ms (prepared=%s)",
+                            session_id, task.first_token_ms, task.prepared,
+                        )
+
+                    # Buffer the event
+                    task.event_buffer.append(outbound)
+
+                    # Broadcast to all subscribers
+                    sent_at = time.perf_counter()
+                    await self._broadcast(task, outbound)
+                    broadcast_seconds += time.perf_counter() - sent_at
+
+                    # Accumulate for persistence
+                    if event.type == "text_delta":
+                        text = event.data.get("text", "")
+                        task.content_parts.append(text)
+                        task.dirty_bytes += len(text)
+                    elif event.type == "thinking_delta":
+                        thinking = event.data.get("thinking", "")
+                        task.thinking_parts.append(thinking)
+                        task.dirty_bytes += len(thinking)
+                    elif event.type == "tool_use_start":
+                        task.dirty_bytes += 1
+                        task.start_tool(
+                            event.data.get("tool_id", ""),
+                            event.data.get("tool_name", ""),
+                            event.data.get("input", {}),
+                        )
+                    elif event.type == "tool_result":
+                        output = event.data.get("output", "")
+                        call = task.complete_tool(
+                            event.data.get("tool_id", ""),
+                            outbound["output"],
+                            event.data.get("is_error", False),
+                            outbound.get("output_handle"),
+                            outbound.get("output_size"),
+                        )
+                        task.dirty_bytes += 1 + len(outbound["output"])
+                        if call is not None and not task.reattached:
+                            self._record_tool_metrics(call, output)
+                    elif event.type == "message_complete":
+                        task.final_usage = event.data.get("usage")
+                        task.final_cost = event.data.get("cost_usd")
+                        self._record_token_rate(task)
+                    elif event.type == "error" and event.data.get("code") in ("timeout", "idle_timeout"):
+                        task.timeout_reason = event.data["code"]
+
+                    if task.dirty_bytes:
+                        due = (
+                            task.last_checkpoint_at + settings.message_checkpoint_seconds
+                            - time.monotonic()
+                        )
+                        if task.dirty_bytes >= settings.message_checkpoint_bytes or due <= 0:
+                            self._schedule_checkpoint(task)
+                        else:
+                            # No event may follow for a while (a long tool call)
+                            self._arm_checkpoint_timer(task, due)
+
+                    # AskUserQuestion: kill process, set waiting_for_input
+                    if (
+                        event.type == "tool_use_start"
+                        and event.data.get("tool_name") == "AskUserQuestion"
+                    ):
+                        await self._process_manager.cancel(session_id)
+                        task.status = "waiting_for_input"
+                        task.completed_at = datetime.now(timezone.utc)
+                        await self._persist_assistant(task)
+
+                        input_event = {"type": "input_required", "session_id": session_id}
+                        task.event_buffer.append(input_event)
+                        await self._broadcast(task, input_event)
+                        return
+
+                # Stream completed successfully
+                task.status = "completed"
+                task.completed_at = datetime.now(timezone.utc)
+                await self._persist_assistant(task)
+
+            except asyncio.CancelledError:
+                # Cancelled by cancel_task() — persistence handled there
+                pass
+            except Exception as exc:
+                logger.exception("Task error for session %s", session_id)
+                run_span.record_error(exc)
+                task.status = "error"
+                task.completed_at = datetime.now(timezone.utc)
+                await self._persist_assistant(task)
+
+                error_event = {
+                    "type": "error",
+                    "session_id": session_id,
+                    "error": "Something went wrong processing your message. Please try again.",
+                }
+                task.event_buffer.append(error_event)
+                await self._broadcast(task, error_event)
+            finally:
+                self._preview_service.agent_turn_ended(task.project_id)
+                # Ensure process is cleaned up
+                if self._process_manager.is_session_busy(session_id):
+                    logger.warning(
+                        "Force-cleaning busy session %s after task ended", session_id
+                    )
                     await self._process_manager.cancel(session_id)
-                    task.status = "waiting_for_input"
-                    task.completed_at = datetime.now(timezone.utc)
-                    await self._persist_assistant(task)
-
-                    input_event = {"type": "input_required", "session_id": session_id}
-                    task.event_buffer.append(input_event)
-                    await self._broadcast(task, input_event)
-                    return
-
-            # Stream completed successfully
-            task.status = "completed"
-            task.completed_at = datetime.now(timezone.utc)
-            await self._persist_assistant(task)
-
-        except asyncio.CancelledError:
-            # Cancelled by cancel_task() — persistence handled there
-            pass
+                if task.status != "running":
+                    self._process_manager.discard_spool(session_id)
+                await self._publish_status(task)
+                run_span.set_attribute("status", task.status)
+                run_span.set_attribute("events", len(task.event_buffer))
+                run_span.set_attribute("tool_calls", len(task.tool_calls))
+                run_span.set_attribute("broadcast_ms", round(broadcast_seconds * 1000, 3))
+                if task.spawn_ms is not None:
+                    run_span.set_attribute("send_to_spawn_ms", task.spawn_ms)
+                if task.first_token_ms is not None:
+                    run_span.set_attribute("time_to_first_token_ms", task.first_token_ms)
+
+    # -- Cross-worker bus --
+
+    async def _publish_status(self, task: BackgroundTask) -> None:
+        self._notify_change()
+        try:
+            await self._bus.set_status(task.session_id, task.status)
         except Exception:
-            logger.exception("Task error for session %s", session_id)
-            task.status = "error"
-            task.completed_at = datetime.now(timezone.utc)
-            await self._persist_assistant(task)
+            logger.warning(
+                "Failed to publish status for session %s", task.session_id, exc_info=True,
+            )
 
+    async def _on_bus_command(self, command: str, session_id: str) -> None:
+        if command == "cancel":
+            await self.cancel_task(session_id)
+
+    async def _open_mirror(self, session_id: str) -> BackgroundTask | None:
+        """Start following a task owned by another worker. Call with the lock held."""
+        if not self._bus.shared:
+            return None
+        row = await self._bus.lookup(session_id)
+        if row is None:
+            return None
+        mirror = BackgroundTask(
+            session_id=session_id,
+            project_id=row["project_id"],
+            status="running",
+            started_at=datetime.fromisoformat(row["started_at"]),
+            owner=row["owner_worker"],
+        )
+        self._mirrors[session_id] = mirror
+        await self._sync_mirror(mirror, broadcast=False)
+        return mirror
+
+    async def _sync_mirror(self, mirror: BackgroundTask, broadcast: bool = True) -> None:
+        """Apply new bus events and the owner's status to a mirror."""
+        # Status first: the owner flushes all events before publishing a final
+        # status, so events read afterwards are complete
+        row = await self._bus.lookup(mirror.session_id)
+        was_running = mirror.status == "running"
+        for seq, event in await self._bus.read_events(mirror.session_id, mirror.bus_seq):
+            mirror.bus_seq = seq
+            mirror.event_buffer.append(event)
+            if broadcast:
+                await self._broadcast(mirror, event)
+        if not was_running:
+            return
+        if row is None:
+            # Claimed by this worker, or the owner's row was replaced
+            status = "completed"
+        elif row.get("owner_dead"):
+            status = "error"
             error_event = {
                 "type": "error",
-                "session_id": session_id,
-                "error": "Something went wrong processing your message. Please try again.",
+                "session_id": mirror.session_id,
+                "error": "The worker running this task stopped unexpectedly.",
             }
-            task.event_buffer.append(error_event)
-            await self._broadcast(task, error_event)
-        finally:
-            # Ensure process is cleaned up
-            if self._process_manager.is_session_busy(session_id):
-                logger.warning(
-                    "Force-cleaning busy session %s after task ended", session_id
-                )
-                await self._process_manager.cancel(session_id)
+            mirror.event_buffer.append(error_event)
+            if broadcast:
+                await self._broadcast(mirror, error_event)
+        else:
+            status = row["status"]
+        if status != "running":
+            mirror.status = status
+            mirror.completed_at = datetime.now(timezone.utc)
+            self._notify_change()
+
+    async def _mirror_loop(self) -> None:
+        """Stream events of followed remote tasks to local subscribers."""
+        while True:
+            try:
+                await asyncio.sleep(settings.task_bus_poll_seconds)
+                now = datetime.now(timezone.utc)
+                for mirror in list(self._mirrors.values()):
+                    # Keep reading briefly after completion for trailing
+                    # events (e.g. "cancelled" follows the status change)
+                    if mirror.status == "running" or (
+                        mirror.completed_at
+                        and (now - mirror.completed_at).total_seconds() < _MIRROR_TAIL_SECONDS
+                    ):
+                        await self._sync_mirror(mirror)
+            except asyncio.CancelledError:
+                break
+            except Exception:
+                logger.warning("Mirror loop error", exc_info=True)
+
+    # -- Metrics --
+
+    @staticmethod
+    def _record_tool_metrics(call: dict, output: str) -> None:
+        tool = call["toolName"] or "unknown"
+        if "durationMs" in call:
+            _TOOL_DURATION.observe(call["durationMs"] / 1000, tool)
+        _TOOL_OUTPUT.observe(len(output.encode("utf-8", "replace")), tool)
+        _TOOL_CALLS.inc(tool, "error" if call["isError"] else "ok")
+
+    @staticmethod
+    def _record_token_rate(task: BackgroundTask) -> None:
+        """Output tokens over the generation window (first token → completion)."""
+        output_tokens = (task.final_usage or {}).get("output_tokens")
+        if not output_tokens or task.first_token_ms is None or task.requested_at is None:
+            return
+        generating = time.monotonic() - task.requested_at - task.first_token_ms / 1000
+        if generating <= 0:
+            return
+        task.tokens_per_second = round(output_tokens / generating, 1)
+        _TOKENS_PER_SECOND.observe(task.tokens_per_second)
 
     # -- Persistence --
 
-    async def _persist_assistant(self, task: BackgroundTask) -> None:
-        """Save accumulated assistant message to SQLite."""
-        if not (task.full_content or task.full_thinking or task.tool_uses_acc):
+    def _schedule_checkpoint(self, task: BackgroundTask) -> None:
+        """Upsert the in-flight assistant message as a partial row, off the hot path.
+
+        At most one checkpoint write is in flight per task; if the previous
+        one is still running, this interval's changes roll into the next.
+        """
+        if task.persisted:
             return
+        if task.checkpoint_task and not task.checkpoint_task.done():
+            self._arm_checkpoint_timer(task, settings.message_checkpoint_seconds)
+            return
+        if task.checkpoint_timer:
+            task.checkpoint_timer.cancel()
+            task.checkpoint_timer = None
+        task.dirty_bytes = 0
+        task.last_checkpoint_at = time.monotonic()
+        task.checkpoint_task = asyncio.create_task(
+            self._write_checkpoint(
+                task,
+                content=task.full_content,
+                thinking=task.full_thinking,
+                tool_uses=[dict(tu) for tu in task.tool_uses_acc],
+            )
+        )
+
+    def _arm_checkpoint_timer(self, task: BackgroundTask, delay: float) -> None:
+        """Flush unsaved changes after *delay* even if no further event arrives."""
+        if task.checkpoint_timer is None:
+            task.checkpoint_timer = asyncio.get_running_loop().call_later(
+                delay, self._checkpoint_due, task,
+            )
+
+    def _checkpoint_due(self, task: BackgroundTask) -> None:
+        task.checkpoint_timer = None
+        if task.dirty_bytes:
+            self._schedule_checkpoint(task)
+
+    async def _write_checkpoint(
+        self, task: BackgroundTask, content: str, thinking: str, tool_uses: list[dict],
+    ) -> None:
         try:
             await self._message_service.save_message(
                 session_id=task.session_id,
                 role="assistant",
-                content=task.full_content,
-                thinking=task.full_thinking,
-                tool_uses=task.tool_uses_acc,
-                usage=task.final_usage,
-                cost_usd=task.final_cost,
+                content=content,
+                thinking=thinking,
+                tool_uses=tool_uses,
+                message_id=task.message_id,
+                created_at=task.message_created_at,
+                status="partial",
             )
+            task.checkpointed = True
+        except Exception:
+            # The row (if any) holds an older checkpoint: have finalize rewrite
+            # it in full rather than just flip its status
+            task.checkpointed = False
+            logger.warning("Checkpoint failed for session %s", task.session_id, exc_info=True)
+
+    async def _persist_assistant(self, task: BackgroundTask) -> None:
+        """Finalize the accumulated assistant message in SQLite.
+
+        If the last checkpoint already holds the full content, this is a
+        single UPDATE of status/usage rather than a rewrite of the row.
+        """
+        if task.persisted:
+            return
+        if task.checkpoint_timer:
+            task.checkpoint_timer.cancel()
+            task.checkpoint_timer = None
+        if task.checkpoint_task:
+            await asyncio.gather(task.checkpoint_task, return_exceptions=True)
+        if not (task.content_parts or task.thinking_parts or task.tool_calls):
+            return
+        task.persisted = True
+        usage = task.final_usage
+        if task.resource_usage:
+            usage = {**(usage or {}), "resources": task.resource_usage}
+        try:
+            if task.checkpointed and not task.dirty_bytes:
+                await self._message_service.finalize_message(
+                    task.message_id, usage=usage, cost_usd=task.final_cost,
+                )
+            else:
+                await self._message_service.save_message(
+                    session_id=task.session_id,
+                    role="assistant",
+                    content=task.full_content,
+                    thinking=task.full_thinking,
+                    tool_uses=task.tool_uses_acc,
+                    usage=usage,
+                    cost_usd=task.final_cost,
+                    message_id=task.message_id,
+                    created_at=task.message_created_at,
+                )
         except Exception:
             logger.warning(
                 "Failed to persist assistant message for session %s",
@@ -400,6 +1040,8 @@ class TaskManager:
             try:
                 await asyncio.sleep(60)
                 await self._cleanup_expired()
+                # Pick up runs whose worker died since startup
+                await self._reattach_detached()
             except asyncio.CancelledError:
                 break
             except Exception:
@@ -416,6 +1058,13 @@ class TaskManager:
                 and task.completed_at
                 and (now - task.completed_at).total_seconds() > ttl
             ]
+            if expired:
+                self._notify_change()
             for sid in expired:
                 del self._tasks[sid]
+                self._process_manager.drop_log(sid)
                 logger.debug("Cleaned up expired task buffer for session %s", sid)
+            # Finished mirrors are only kept while someone is still watching
+            for sid, mirror in list(self._mirrors.items()):
+                if mirror.status != "running" and not mirror.subscribers:
+                    del self._mirrors[sid]
@@ -0,0 +1,11 @@
+"""Point settings at a throwaway data directory before ``src`` is imported."""
+
+import os
+import tempfile
+
+_data = tempfile.mkdtemp(prefix="casperbot-tests-")
+os.environ.setdefault("CASPERBOT_DATABASE_PATH", os.path.join(_data, "casperbot.db"))
+os.environ.setdefault("CASPERBOT_PROJECTS_DIR", os.path.join(_data, "projects"))
+os.environ.setdefault("CASPERBOT_PREVIEW_INSTALL_CACHE_DIR", os.path.join(_data, "install_cache"))
+os.environ.setdefault("CASPERBOT_PREVIEW_BUILD_CACHE_DIR", os.path.join(_data, "build_cache"))
+os.environ.setdefault("CASPERBOT_PREVIEW_LOG_DIR", os.path.join(_data, "preview_logs"))
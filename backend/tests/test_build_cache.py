@@ -0,0 +1,20 @@
+from src.services.preview import build_cache
+from src.services.preview.build_cache import source_key
+
+
+def test_file_digest_memo_keeps_only_the_most_recently_hashed_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_cache, "_DIGEST_DIRS", 2)
+    monkeypatch.setattr(build_cache, "_file_digests", build_cache.OrderedDict())
+    dirs = []
+    for name in ("a", "b", "c"):
+        work_dir = tmp_path / name
+        work_dir.mkdir()
+        (work_dir / "index.html").write_text(name)
+        dirs.append(work_dir)
+
+    keys = [source_key(d, ["npm", "run", "build"], "dist", {}) for d in dirs]
+    assert list(build_cache._file_digests) == [str(dirs[1]), str(dirs[2])]
+
+    # Hashing a directory again marks it most recently used, with the same key
+    assert source_key(dirs[1], ["npm", "run", "build"], "dist", {}) == keys[1]
+    assert list(build_cache._file_digests) == [str(dirs[2]), str(dirs[1])]
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+import time
+
+from src.core.config import settings
+from src.services.preview import install_cache
+from src.services.preview.install_cache import InstallCache
+from src.services.processes.log_buffer import LogRingBuffer
+
+
+def _project(tmp_path, lockfile: str):
+    (tmp_path / "package.json").write_text("{}")
+    (tmp_path / lockfile).write_text("# lockfile\n")
+    return tmp_path
+
+
+def test_missing_lockfile_tool_falls_back_to_npm_install(tmp_path, monkeypatch):
+    work_dir = _project(tmp_path, "yarn.lock")
+    ran: list[list[str]] = []
+
+    async def fake_run(cmd, work_dir, log, prefix):
+        ran.append(cmd)
+        (work_dir / "node_modules").mkdir()
+
+    monkeypatch.setattr(install_cache, "_run", fake_run)
+    monkeypatch.setattr(install_cache.shutil, "which", lambda name: None)
+
+    result = asyncio.run(
+        InstallCache().install(work_dir, ["yarn", "install"], LogRingBuffer(100))
+    )
+
+    assert result == "uncached"
+    assert ran == [install_cache._NPM_INSTALL]
+    # npm didn't resolve from yarn.lock, so nothing is stored under its hash
+    cache_dir = settings.preview_install_cache_dir
+    assert not cache_dir.exists() or not any(cache_dir.iterdir())
+
+
+def test_lockfile_tool_present_uses_frozen_install(tmp_path, monkeypatch):
+    work_dir = _project(tmp_path, "yarn.lock")
+    ran: list[list[str]] = []
+
+    async def fake_run(cmd, work_dir, log, prefix):
+        ran.append(cmd)
+
+    monkeypatch.setattr(install_cache, "_run", fake_run)
+    monkeypatch.setattr(install_cache.shutil, "which", lambda name: f"/usr/bin/{name}")
+
+    asyncio.run(InstallCache().install(work_dir, ["yarn", "install"], LogRingBuffer(100)))
+
+    assert ran[0][:3] == ["yarn", "install", "--frozen-lockfile"]
+
+
+def test_cancelled_install_terminates_its_process_group(tmp_path):
+    pid_file = tmp_path / "pid"
+    cmd = [
+        sys.executable, "-c",
+        f"import os, time; open({str(pid_file)!r}, 'w').write(str(os.getpid())); time.sleep(60)",
+    ]
+
+    async def run_and_cancel() -> None:
+        task = asyncio.create_task(install_cache._run(cmd, tmp_path, LogRingBuffer(100), ""))
+        while not pid_file.exists() or not pid_file.read_text():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run_and_cancel())
+
+    pid = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return
+        time.sleep(0.05)
+    raise AssertionError(f"install process {pid} outlived the cancelled start")
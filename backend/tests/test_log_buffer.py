@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+from src.services.processes.log_buffer import LogArchive, LogRingBuffer
+
+
+def test_archive_writes_off_the_event_loop_and_serves_evicted_lines(tmp_path):
+    async def test() -> None:
+        archive = LogArchive(tmp_path / "p.log", max_bytes=2000, backups=5)
+        writers: set[threading.Thread] = set()
+        write_batch = archive._write_batch
+
+        def recording(batch: list[str]) -> None:
+            writers.add(threading.current_thread())
+            write_batch(batch)
+
+        archive._write_batch = recording
+        log = LogRingBuffer(max_lines=10, archive=archive)
+        for i in range(100):
+            log.append("stdout", f"line {i}")
+        assert archive.path.stat().st_size == 0  # nothing written on append
+
+        entries, dropped = await log.read(0)
+        assert dropped == 0
+        assert [e["line"] for e in entries] == [f"line {i}" for i in range(100)]
+        assert writers and threading.main_thread() not in writers
+        assert (tmp_path / "p.log.1").exists()  # rotated, also off the loop
+
+    asyncio.run(test())
+
+
+def test_append_after_close_is_a_no_op(tmp_path):
+    async def test() -> None:
+        archive = LogArchive(tmp_path / "p.log", max_bytes=10_000, backups=1)
+        log = LogRingBuffer(archive=archive)
+        log.append("stdout", "before")
+        log.close()
+        log.append("stdout", "after")  # a reader that outlived the producer
+        await archive._closing
+
+        assert archive._file.closed
+        assert log.tail(5) == ["before"]
+        assert [e["line"] for e in archive.read(0, 10)] == ["before"]
+
+    asyncio.run(test())
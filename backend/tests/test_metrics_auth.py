@@ -0,0 +1,34 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.metrics.router import router
+from src.core.config import settings
+from src.core.security import create_access_token
+
+
+def _client(monkeypatch, token: str) -> TestClient:
+    monkeypatch.setattr(settings, "auth_enabled", True)
+    monkeypatch.setattr(settings, "auth_secret", "test-secret")
+    monkeypatch.setattr(settings, "metrics_token", token)
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def _get(client: TestClient, bearer: str | None) -> int:
+    headers = {"Authorization": f"Bearer {bearer}"} if bearer else {}
+    return client.get("/api/metrics", headers=headers).status_code
+
+
+def test_scrape_token_or_jwt_is_accepted(monkeypatch):
+    client = _client(monkeypatch, "scrape-me")
+    assert _get(client, "scrape-me") == 200
+    assert _get(client, create_access_token()) == 200
+    assert _get(client, "wrong") == 401
+    assert _get(client, None) == 401
+
+
+def test_without_a_scrape_token_only_jwt_is_accepted(monkeypatch):
+    client = _client(monkeypatch, "")
+    assert _get(client, "") == 401
+    assert _get(client, create_access_token()) == 200
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from src.core.config import settings
+from src.core.database import db
+from src.core.exceptions import PreviewStartError
+from src.services.preview.port_allocator import PortAllocator
+
+
+def _run(test, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "preview_port_start", 47100)
+    monkeypatch.setattr(settings, "preview_port_end", 47101)
+
+    async def wrapper() -> None:
+        await db.connect()
+        try:
+            await db.conn.execute("DELETE FROM previews")
+            for project_id in ("p1", "p2"):
+                await db.conn.execute(
+                    "INSERT OR IGNORE INTO projects (id, name, slug, path) VALUES (?, ?, ?, ?)",
+                    (project_id, project_id, project_id, f"/tmp/{project_id}"),
+                )
+            await db.conn.commit()
+            ports = PortAllocator()
+            await ports.startup()
+            await test(ports)
+        finally:
+            await db.disconnect()
+
+    asyncio.run(wrapper())
+
+
+def test_exhausted_range_never_takes_a_sibling_services_reservation(monkeypatch):
+    async def test(ports: PortAllocator) -> None:
+        web = await ports.acquire("p1", "")
+        api = await ports.acquire("p1", "api")
+        assert {web, api} == {47100, 47101}
+
+        # p1's services are reserved but not started yet (pid NULL)
+        with pytest.raises(PreviewStartError):
+            await ports.acquire("p1", "docs")
+        assert await ports.acquire("p1", "") == web
+        assert await ports.acquire("p1", "api") == api
+
+    _run(test, monkeypatch)
+
+
+def test_exhausted_range_takes_over_another_projects_idle_reservation(monkeypatch):
+    async def test(ports: PortAllocator) -> None:
+        other = await ports.acquire("p2", "")
+        await ports.acquire("p1", "")
+
+        assert await ports.acquire("p1", "api") == other
+
+    _run(test, monkeypatch)
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import sys
+import time
+
+from src.core.config import settings
+from src.services.claude.process_manager import ProcessManager
+
+
+class FakeReaper:
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.registered: list[int] = []
+
+    async def register(self, pid, kind, owner_id, command) -> None:
+        await asyncio.sleep(self.delay)
+        self.registered.append(pid)
+
+    async def release(self, pid) -> None:
+        pass
+
+
+def _sleeper() -> list[str]:
+    return [sys.executable, "-c", "import time; time.sleep(60)"]
+
+
+def _wait_gone(pid: int) -> bool:
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _stream(manager: ProcessManager, tmp_path):
+    return manager._run_cli(
+        cmd=_sleeper(),
+        session_id="s1",
+        project_id="p1",
+        project_path=tmp_path,
+        env=dict(os.environ),
+        is_continuation=False,
+        prompt="",
+        model=None,
+        max_budget_usd=None,
+    )
+
+
+def test_closing_the_stream_at_process_spawned_kills_the_cli(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "detached_tasks", False)
+    manager = ProcessManager(None, None, FakeReaper())
+
+    async def run() -> int:
+        events = _stream(manager, tmp_path)
+        spawned = await events.__anext__()
+        assert spawned.type == "process_spawned"
+        assert manager.is_session_busy("s1")  # cancel() can find it
+        await events.aclose()
+        return spawned.data["pid"]
+
+    pid = asyncio.run(run())
+    assert _wait_gone(pid)
+    assert not manager.is_session_busy("s1")
+
+
+def test_cancelling_during_reaper_registration_kills_the_cli(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "detached_tasks", False)
+    reaper = FakeReaper(delay=0.5)
+    manager = ProcessManager(None, None, reaper)
+
+    async def run() -> int:
+        async def consume() -> None:
+            async for _ in _stream(manager, tmp_path):
+                pass
+
+        task = asyncio.create_task(consume())
+        while not manager.is_session_busy("s1"):
+            await asyncio.sleep(0.01)
+        pid = manager._processes["s1"].process.pid
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return pid
+
+    pid = asyncio.run(run())
+    assert _wait_gone(pid)
+    assert not reaper.registered
+    assert not manager.is_session_busy("s1")
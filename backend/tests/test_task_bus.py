@@ -0,0 +1,116 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from src.core.config import settings
+from src.core.database import db
+from src.services.messages.message_service import MessageService
+from src.services.tasks.task_bus import SqliteTaskBus
+
+
+def _run(test) -> None:
+    async def wrapper() -> None:
+        await db.connect()
+        try:
+            for table in ("task_workers", "task_registry", "task_events", "task_commands",
+                          "messages", "sessions", "projects"):
+                await db.conn.execute(f"DELETE FROM {table}")
+            await db.conn.commit()
+            await test()
+        finally:
+            await db.disconnect()
+
+    asyncio.run(wrapper())
+
+
+async def _worker(wid: str, alive: bool) -> None:
+    seen = time.time() if alive else time.time() - 10 * settings.worker_heartbeat_seconds
+    await db.conn.execute(
+        "INSERT INTO task_workers (worker_id, pid, heartbeat_at) VALUES (?, 0, ?)", (wid, seen)
+    )
+    await db.conn.commit()
+
+
+async def _remote_claim(session_id: str, owner: str, status: str = "running",
+                        completed_at: str | None = None) -> None:
+    await db.conn.execute(
+        """INSERT INTO task_registry
+               (session_id, project_id, owner_worker, status, started_at, completed_at)
+           VALUES (?, 'p1', ?, ?, ?, ?)""",
+        (session_id, owner, status, datetime.now(timezone.utc).isoformat(), completed_at),
+    )
+    await db.conn.commit()
+
+
+def test_claim_defers_to_a_live_owner_and_takes_over_a_dead_one():
+    async def test() -> None:
+        bus = SqliteTaskBus()
+        await _worker("live", alive=True)
+        await _worker("dead", alive=False)
+        await _remote_claim("s-live", "live")
+        await _remote_claim("s-dead", "dead")
+
+        assert await bus.claim("s-live", "p1") == "live"
+        assert (await bus.lookup("s-live"))["status"] == "running"
+
+        assert (await bus.lookup("s-dead"))["owner_dead"] is True
+        assert await bus.claim("s-dead", "p1") is None
+        assert await bus.lookup("s-dead") is None  # ours now
+
+    _run(test)
+
+
+def test_prune_drops_finished_tasks_past_the_buffer_ttl():
+    async def test() -> None:
+        bus = SqliteTaskBus()
+        await _worker("other", alive=True)
+        expired = datetime.now(timezone.utc) - timedelta(seconds=settings.task_buffer_ttl_seconds + 60)
+        await _remote_claim("old", "other", "completed", expired.isoformat())
+        await _remote_claim("recent", "other", "completed", datetime.now(timezone.utc).isoformat())
+        await _remote_claim("running", "other")
+        for session_id in ("old", "recent", "running"):
+            await db.conn.execute(
+                "INSERT INTO task_events (session_id, seq, event) VALUES (?, 1, '{}')", (session_id,)
+            )
+        await db.conn.commit()
+
+        await bus._prune()
+
+        assert {row["session_id"] for row in await bus.list_remote()} == {"recent", "running"}
+        assert await bus.read_events("old") == []
+        assert len(await bus.read_events("recent")) == 1
+        assert len(await bus.read_events("running")) == 1
+
+    _run(test)
+
+
+def test_mark_interrupted_skips_sessions_another_live_worker_is_running():
+    async def test() -> None:
+        await _worker("live", alive=True)
+        await _worker("dead", alive=False)
+        await db.conn.execute(
+            "INSERT INTO projects (id, name, slug, path) VALUES ('p1', 'p1', 'p1', '/tmp/p1')"
+        )
+        for session_id, owner in (("s-live", "live"), ("s-dead", "dead"), ("s-none", None)):
+            await db.conn.execute(
+                "INSERT INTO sessions (id, project_id) VALUES (?, 'p1')", (session_id,)
+            )
+            await db.conn.execute(
+                """INSERT INTO messages (id, session_id, role, status)
+                   VALUES (?, ?, 'assistant', 'partial')""",
+                (f"m-{session_id}", session_id),
+            )
+            if owner:
+                await _remote_claim(session_id, owner)
+        await db.conn.commit()
+
+        assert await MessageService().mark_interrupted() == 2
+        async with db.conn.execute("SELECT id, status FROM messages") as cur:
+            statuses = {row["id"]: row["status"] for row in await cur.fetchall()}
+        assert statuses == {
+            "m-s-live": "partial",
+            "m-s-dead": "interrupted",
+            "m-s-none": "interrupted",
+        }
+
+    _run(test)
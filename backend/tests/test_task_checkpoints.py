@@ -0,0 +1,70 @@
+import asyncio
+
+from src.services.tasks.task_bus import TaskBus
+from src.services.tasks.task_manager import BackgroundTask, TaskManager
+
+
+class FakeMessages:
+    """Records writes; checkpoint writes fail once ``fail_after`` of them succeeded."""
+
+    def __init__(self, fail_after: int) -> None:
+        self.fail_after = fail_after
+        self.saved: list[dict] = []
+        self.finalized: list[str] = []
+
+    async def save_message(self, **kwargs) -> dict:
+        if kwargs.get("status") == "partial":
+            if self.fail_after == 0:
+                raise RuntimeError("database is locked")
+            self.fail_after -= 1
+        self.saved.append(kwargs)
+        return kwargs
+
+    async def finalize_message(self, message_id, usage=None, cost_usd=None) -> None:
+        self.finalized.append(message_id)
+
+
+def _manager(messages: FakeMessages) -> TaskManager:
+    return TaskManager(None, messages, None, TaskBus(), None, None)
+
+
+def _stream(task: BackgroundTask, manager: TaskManager, text: str) -> None:
+    task.content_parts.append(text)
+    task.dirty_bytes += len(text)
+    manager._schedule_checkpoint(task)
+
+
+def test_failed_checkpoint_makes_finalize_rewrite_the_message():
+    messages = FakeMessages(fail_after=1)
+    manager = _manager(messages)
+    task = BackgroundTask(session_id="s1", project_id="p1")
+
+    async def run() -> None:
+        _stream(task, manager, "first ")
+        await task.checkpoint_task  # checkpoint N succeeds
+        _stream(task, manager, "second")
+        await task.checkpoint_task  # checkpoint N+1 fails; no more output follows
+        await manager._persist_assistant(task)
+
+    asyncio.run(run())
+
+    assert not messages.finalized
+    final = messages.saved[-1]
+    assert final["content"] == "first second"
+    assert final.get("status", "complete") == "complete"
+
+
+def test_successful_checkpoint_is_finalized_in_place():
+    messages = FakeMessages(fail_after=10)
+    manager = _manager(messages)
+    task = BackgroundTask(session_id="s1", project_id="p1")
+
+    async def run() -> None:
+        _stream(task, manager, "all of it")
+        await task.checkpoint_task
+        await manager._persist_assistant(task)
+
+    asyncio.run(run())
+
+    assert messages.finalized == [task.message_id]
+    assert [m["content"] for m in messages.saved] == ["all of it"]
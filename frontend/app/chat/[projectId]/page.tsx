@@ -225,6 +225,7 @@ export default function ChatPage({
         onClose={togglePreview}
         url={preview?.url ?? null}
         framework={preview?.framework ?? null}
+        services={preview?.services ?? []}
         status={preview?.status ?? "stopped"}
         logs={previewLogs}
         starting={previewStarting}
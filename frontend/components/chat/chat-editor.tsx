@@ -51,10 +51,11 @@ interface ChatEditorProps {
   disabled?: boolean;
   placeholder?: string;
   onTextChange?: (text: string) => void;
+  onFocus?: () => void;
 }
 
 export const ChatEditor = forwardRef<ChatEditorRef, ChatEditorProps>(
-  ({ projectId, onSubmit, disabled, placeholder, onTextChange }, ref) => {
+  ({ projectId, onSubmit, disabled, placeholder, onTextChange, onFocus }, ref) => {
     const projectIdRef = useRef(projectId);
     useEffect(() => {
       projectIdRef.current = projectId;
@@ -65,6 +66,11 @@ export const ChatEditor = forwardRef<ChatEditorRef, ChatEditorProps>(
       onSubmitRef.current = onSubmit;
     }, [onSubmit]);
 
+    const onFocusRef = useRef(onFocus);
+    useEffect(() => {
+      onFocusRef.current = onFocus;
+    }, [onFocus]);
+
     // Track whether the suggestion popup is currently open
     const suggestionOpenRef = useRef(false);
 
@@ -226,6 +232,9 @@ export const ChatEditor = forwardRef<ChatEditorRef, ChatEditorProps>(
       onUpdate: ({ editor: ed }) => {
         onTextChange?.(ed.getText());
       },
+      onFocus: () => {
+        onFocusRef.current?.();
+      },
     });
     /* eslint-enable react-hooks/refs */
 
@@ -38,6 +38,7 @@ export function ChatInput({
   const [selectedCmdIndex, setSelectedCmdIndex] = useState(0);
   const editorRef = useRef<ChatEditorRef>(null);
   const commands = useSlashCommands();
+  const prepareSession = useStore((s) => s.prepareSession);
 
   const filteredCommands = useMemo(
     () => getFilteredCommands(commands, editorText),
@@ -172,6 +173,7 @@ export function ChatInput({
               setEditorText(text);
               setSelectedCmdIndex(0);
             }}
+            onFocus={() => prepareSession(projectId, sessionId)}
           />
 
           {/* Mic button — inside input, only shown when browser supports Speech Recognition */}
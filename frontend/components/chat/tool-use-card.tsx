@@ -14,6 +14,8 @@ import {
   Loader2,
 } from "lucide-react";
 import { Badge } from "@/components/ui/badge";
+import { api } from "@/lib/api";
+import { useStore } from "@/lib/store";
 import { cn, truncate } from "@/lib/utils";
 import type { ToolUse } from "@/types/chat";
 
@@ -34,11 +36,27 @@ interface ToolUseCardProps {
 
 export function ToolUseCard({ tool }: ToolUseCardProps) {
   const [expanded, setExpanded] = useState(false);
+  const [fullOutput, setFullOutput] = useState<string | null>(null);
+  const [loadingOutput, setLoadingOutput] = useState(false);
+  const activeSessionId = useStore((s) => s.activeSessionId);
   const Icon = TOOL_ICONS[tool.toolName] || Terminal;
 
   const inputSummary = getInputSummary(tool);
   const hasOutput = tool.output && tool.output.length > 0;
 
+  // Large outputs arrive as a preview; the full text is fetched on demand
+  const loadFullOutput = async () => {
+    if (!tool.outputHandle || !activeSessionId) return;
+    setLoadingOutput(true);
+    try {
+      setFullOutput(await api.getToolOutput(activeSessionId, tool.outputHandle));
+    } catch {
+      // keep showing the preview
+    } finally {
+      setLoadingOutput(false);
+    }
+  };
+
   return (
     <motion.div
       className="my-2 rounded-lg border border-border bg-tool-bg overflow-hidden"
@@ -102,8 +120,19 @@ export function ToolUseCard({ tool }: ToolUseCardProps) {
                   tool.isError ? "text-error" : "text-text-secondary"
                 )}
               >
-                {tool.output}
+                {fullOutput ?? tool.output}
               </pre>
+              {tool.outputHandle && fullOutput === null && (
+                <button
+                  className="mt-1 text-[11px] text-accent hover:underline cursor-pointer disabled:opacity-50"
+                  onClick={loadFullOutput}
+                  disabled={loadingOutput}
+                >
+                  {loadingOutput
+                    ? "Loading…"
+                    : `Show full output (${formatSize(tool.outputSize ?? 0)})`}
+                </button>
+              )}
             </div>
           )}
         </div>
@@ -112,6 +141,11 @@ export function ToolUseCard({ tool }: ToolUseCardProps) {
   );
 }
 
+function formatSize(bytes: number): string {
+  if (bytes >= 1024 * 1024) return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+  return `${Math.round(bytes / 1024)} KB`;
+}
+
 function getInputSummary(tool: ToolUse): string {
   const input = tool.input;
   if (tool.toolName === "Bash" && typeof input.command === "string") {
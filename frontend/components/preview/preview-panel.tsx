@@ -3,12 +3,14 @@
 import { useEffect, useRef } from "react";
 import { X, ExternalLink, Square, Loader2 } from "lucide-react";
 import { cn } from "@/lib/utils";
+import type { PreviewServiceInfo } from "@/types/api";
 
 interface PreviewPanelProps {
   open: boolean;
   onClose: () => void;
   url: string | null;
   framework: string | null;
+  services: PreviewServiceInfo[];
   status: string;
   logs: string[];
   starting: boolean;
@@ -23,6 +25,7 @@ const frameworkLabels: Record<string, string> = {
   cra: "React (CRA)",
   fastapi: "FastAPI",
   flask: "Flask",
+  django: "Django",
   static: "Static",
   node: "Node.js",
 };
@@ -32,6 +35,7 @@ export function PreviewPanel({
   onClose,
   url,
   framework,
+  services,
   status,
   logs,
   starting,
@@ -48,8 +52,10 @@ export function PreviewPanel({
 
   if (!open) return null;
 
-  const isRunning = status === "running";
+  const isRunning = status === "ready";
   const frameworkLabel = framework ? (frameworkLabels[framework] || framework) : "Unknown";
+  // Monorepo previews: the other services' URLs, below the primary one
+  const otherServices = services.slice(1).filter((s) => s.url);
 
   return (
     <>
@@ -138,6 +144,18 @@ export function PreviewPanel({
             >
               {url}
             </a>
+            {otherServices.map((service) => (
+              <a
+                key={service.name}
+                href={service.url!}
+                target="_blank"
+                rel="noopener noreferrer"
+                className="text-sm sm:text-xs text-accent hover:underline truncate block"
+              >
+                <span className="text-text-tertiary">{service.name}: </span>
+                {service.url}
+              </a>
+            ))}
           </div>
         )}
 
@@ -2,10 +2,15 @@
 
 import { useEffect, useState, useCallback, useRef } from "react";
 import { api } from "@/lib/api";
-import type { PreviewInfo } from "@/types/api";
+import type { PreviewInfo, PreviewMode } from "@/types/api";
 
-const LOG_POLL_INTERVAL = 2_000;
-const STATUS_POLL_INTERVAL = 5_000;
+// Logs are long-polled from the last sequence number seen
+const LOG_WAIT_SECONDS = 25;
+const LOG_RETRY_DELAY = 2_000;
+const MAX_LOG_LINES = 2_000;
+// Long-poll window while a preview starts: the backend answers as soon as
+// the dev server is ready or fails
+const READY_WAIT_SECONDS = 25;
 
 export function usePreview(projectId: string | undefined) {
   const [preview, setPreview] = useState<PreviewInfo | null>(null);
@@ -13,9 +18,9 @@ export function usePreview(projectId: string | undefined) {
   const [starting, setStarting] = useState(false);
   const [stopping, setStopping] = useState(false);
   const [error, setError] = useState<string | null>(null);
-  const logLineRef = useRef(0);
+  const logSeqRef = useRef(0);
 
-  const isRunning = preview?.status === "running";
+  const isRunning = preview?.status === "ready";
 
   // Fetch initial status
   useEffect(() => {
@@ -24,7 +29,9 @@ export function usePreview(projectId: string | undefined) {
     (async () => {
       try {
         const status = await api.getPreviewStatus(projectId);
-        if (!cancelled) setPreview(status);
+        if (cancelled) return;
+        setPreview(status);
+        if (status?.status === "starting") setStarting(true);
       } catch {
         // Not running or not supported — that's fine
       }
@@ -32,51 +39,67 @@ export function usePreview(projectId: string | undefined) {
     return () => { cancelled = true; };
   }, [projectId]);
 
-  // Poll logs while running
+  // Tail logs while starting or running
   useEffect(() => {
-    if (!projectId || !isRunning) return;
-    const interval = setInterval(async () => {
-      try {
-        const data = await api.getPreviewLogs(projectId, logLineRef.current);
-        if (data.logs.length > 0) {
-          setLogs((prev) => [...prev, ...data.logs]);
-          logLineRef.current = data.total_lines;
+    if (!projectId || !(isRunning || starting)) return;
+    let cancelled = false;
+    const sleep = (ms: number) => new Promise((r) => setTimeout(r, ms));
+    (async () => {
+      while (!cancelled) {
+        try {
+          const data = await api.getPreviewLogs(projectId, logSeqRef.current, LOG_WAIT_SECONDS);
+          if (cancelled) return;
+          const lines = data.entries.map((e) => e.line);
+          if (data.dropped > 0) lines.unshift(`… ${data.dropped} lines skipped`);
+          if (lines.length > 0) {
+            setLogs((prev) => [...prev, ...lines].slice(-MAX_LOG_LINES));
+          }
+          logSeqRef.current = data.next_seq;
+          // No log yet (start request still in flight) or the server exited
+          if (!data.running && data.entries.length === 0) await sleep(LOG_RETRY_DELAY);
+        } catch {
+          await sleep(LOG_RETRY_DELAY);
         }
-      } catch {
-        // Ignore polling errors
       }
-    }, LOG_POLL_INTERVAL);
-    return () => clearInterval(interval);
-  }, [projectId, isRunning]);
+    })();
+    return () => { cancelled = true; };
+  }, [projectId, isRunning, starting]);
 
-  // Poll status while starting (to detect when it becomes running or errors)
+  // Long-poll status while starting, until the dev server is ready or fails
   useEffect(() => {
     if (!projectId || !starting) return;
-    const interval = setInterval(async () => {
-      try {
-        const status = await api.getPreviewStatus(projectId);
-        if (status) {
-          setPreview(status);
-          if (status.status !== "running") return;
-          setStarting(false);
+    let cancelled = false;
+    (async () => {
+      while (!cancelled) {
+        let status: PreviewInfo | null = null;
+        try {
+          status = await api.getPreviewStatus(projectId, READY_WAIT_SECONDS);
+        } catch {
+          await new Promise((r) => setTimeout(r, 2_000));
+          continue;
         }
-      } catch {
-        // Ignore
+        if (cancelled) return;
+        setPreview(status);
+        if (status?.status === "starting") continue;
+        if (status?.status === "error") setError(status.error || "Preview failed to start");
+        setStarting(false);
+        return;
       }
-    }, STATUS_POLL_INTERVAL);
-    return () => clearInterval(interval);
+    })();
+    return () => { cancelled = true; };
   }, [projectId, starting]);
 
-  const start = useCallback(async () => {
+  const start = useCallback(async (mode: PreviewMode = "dev") => {
     if (!projectId) return;
     setStarting(true);
     setError(null);
     setLogs([]);
-    logLineRef.current = 0;
+    logSeqRef.current = 0;
     try {
-      const info = await api.startPreview(projectId);
+      const info = await api.startPreview(projectId, mode);
       setPreview(info);
-      setStarting(false);
+      // Still "starting": the long-poll above takes it from here
+      if (info.status !== "starting") setStarting(false);
     } catch (err) {
       setError(err instanceof Error ? err.message : "Failed to start preview");
       setStarting(false);
@@ -94,7 +117,7 @@ export function usePreview(projectId: string | undefined) {
     } finally {
       setPreview(null);
       setLogs([]);
-      logLineRef.current = 0;
+      logSeqRef.current = 0;
       setStopping(false);
     }
   }, [projectId, stopping]);
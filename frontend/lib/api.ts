@@ -49,6 +49,7 @@ import type {
   TaskListResponse,
   PreviewInfo,
   PreviewLogsResponse,
+  PreviewMode,
 } from "@/types/api";
 
 class ApiClient {
@@ -335,6 +336,15 @@ class ApiClient {
     );
   }
 
+  async getToolOutput(sessionId: string, handle: string): Promise<string> {
+    const response = await fetch(
+      `${this.baseUrl}/api/messages/tool-outputs/${handle}?session_id=${sessionId}`,
+      { headers: this.authHeaders() }
+    );
+    if (!response.ok) throw new Error(`Request failed: ${response.status}`);
+    return response.text();
+  }
+
   async pushToGitHub(projectId: string, branch?: string): Promise<GitHubPushResponse> {
     return this.request<GitHubPushResponse>(`/api/github/projects/${projectId}/push`, {
       method: "POST",
@@ -474,8 +484,9 @@ class ApiClient {
   }
 
   // Live Preview
-  async startPreview(projectId: string): Promise<PreviewInfo> {
-    return this.request<PreviewInfo>(`/api/preview/${projectId}/start`, {
+  async startPreview(projectId: string, mode: PreviewMode = "dev"): Promise<PreviewInfo> {
+    const query = mode === "production" ? "?mode=production" : "";
+    return this.request<PreviewInfo>(`/api/preview/${projectId}/start${query}`, {
       method: "POST",
     });
   }
@@ -484,8 +495,9 @@ class ApiClient {
     await this.request(`/api/preview/${projectId}/stop`, { method: "POST" });
   }
 
-  async getPreviewStatus(projectId: string): Promise<PreviewInfo | null> {
-    const response = await fetch(`${this.baseUrl}/api/preview/${projectId}/status`, {
+  async getPreviewStatus(projectId: string, wait: number = 0): Promise<PreviewInfo | null> {
+    const query = wait ? `?wait=${wait}` : "";
+    const response = await fetch(`${this.baseUrl}/api/preview/${projectId}/status${query}`, {
       headers: this.authHeaders(),
     });
     if (!response.ok) return null;
@@ -493,9 +505,9 @@ class ApiClient {
     return body.data ?? null;
   }
 
-  async getPreviewLogs(projectId: string, sinceLine: number = 0): Promise<PreviewLogsResponse> {
+  async getPreviewLogs(projectId: string, since: number = 0, wait: number = 0): Promise<PreviewLogsResponse> {
     return this.request<PreviewLogsResponse>(
-      `/api/preview/${projectId}/logs?since_line=${sinceLine}`
+      `/api/preview/${projectId}/logs?since=${since}${wait ? `&wait=${wait}` : ""}`
     );
   }
 }
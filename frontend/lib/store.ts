@@ -49,6 +49,7 @@ interface AppState {
   fetchMessages: (sessionId: string) => Promise<void>;
   setSelectedModel: (model: string) => void;
   sendMessage: (text: string, projectId: string, sessionId: string, displayText?: string) => void;
+  prepareSession: (projectId: string, sessionId: string | null) => void;
   cancelRequest: (sessionId: string) => void;
   handleWsEvent: (event: OutboundEvent) => void;
 }
@@ -56,6 +57,10 @@ interface AppState {
 // Cancel timeout tracking (outside store — not serializable)
 const cancelTimeouts: Record<string, ReturnType<typeof setTimeout>> = {};
 
+// Last "prepare" sent per project/session, to avoid re-sending on every focus
+const PREPARE_THROTTLE_MS = 20_000;
+const lastPrepareAt: Record<string, number> = {};
+
 function forceCancelSession(sessionId: string) {
   // Clear any pending cancel timeout
   if (cancelTimeouts[sessionId]) {
@@ -255,6 +260,8 @@ export const useStore = create<AppState>()(
                 toolName: t.toolName,
                 input: t.input,
                 output: t.output,
+                outputHandle: t.outputHandle,
+                outputSize: t.outputSize,
                 isError: t.isError,
                 isComplete: true,
               })),
@@ -346,6 +353,18 @@ export const useStore = create<AppState>()(
       });
     },
 
+    prepareSession: (projectId: string, sessionId: string | null) => {
+      const key = `${projectId}:${sessionId ?? ""}`;
+      const now = Date.now();
+      if (now - (lastPrepareAt[key] ?? 0) < PREPARE_THROTTLE_MS) return;
+      const sent = wsManager.send({
+        type: "prepare",
+        project_id: projectId,
+        ...(sessionId ? { session_id: sessionId } : {}),
+      });
+      if (sent) lastPrepareAt[key] = now;
+    },
+
     cancelRequest: (sessionId: string) => {
       const sent = wsManager.send({ type: "cancel", session_id: sessionId });
 
@@ -510,6 +529,8 @@ export const useStore = create<AppState>()(
               );
               if (tool) {
                 tool.output = event.output;
+                tool.outputHandle = event.output_handle;
+                tool.outputSize = event.output_size;
                 tool.isError = event.is_error;
                 tool.isComplete = true;
               }
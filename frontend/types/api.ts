@@ -4,26 +4,67 @@ export interface APIResponse<T> {
   error: string | null;
 }
 
+export interface PreviewServiceDetection {
+  subdir: string | null;
+  framework: string | null;
+  needs_install: boolean;
+  package_manager?: string | null;
+  buildable?: boolean;
+}
+
+export type PreviewMode = "dev" | "production";
+
 export interface PreviewDetection {
   supported: boolean;
   framework: string | null;
   needs_install: boolean;
   subdir: string | null;
+  package_manager?: string | null;
+  services?: PreviewServiceDetection[];
+}
+
+export interface PreviewServiceInfo {
+  name: string;
+  framework: string | null;
+  port: number | null;
+  status: "starting" | "ready" | "stopped" | "error";
+  url: string | null;
+  error: string | null;
+  ready_ms?: number | null;
+  frozen?: boolean;
+  agent_paused?: boolean;
+  build_cache?: "hit" | "miss" | null;
+  build_ms?: number | null;
 }
 
 export interface PreviewInfo {
   project_id: string;
-  port: number;
+  mode?: PreviewMode;
+  port: number | null;
   framework: string | null;
-  status: "running" | "stopped" | "error";
+  status: "starting" | "ready" | "stopped" | "error";
   url: string | null;
   started_at: string | null;
   error: string | null;
+  ready_ms?: number | null;
+  frozen?: boolean;
+  idle_seconds?: number | null;
+  services?: PreviewServiceInfo[];
+}
+
+export interface PreviewLogEntry {
+  seq: number;
+  ts: number;
+  stream: "install" | "build" | "stdout";
+  line: string;
+  level: "info" | "warn" | "error";
 }
 
 export interface PreviewLogsResponse {
-  logs: string[];
-  total_lines: number;
+  entries: PreviewLogEntry[];
+  next_seq: number;
+  dropped: number;
+  running: boolean;
 }
 
 export interface ProjectInfo {
@@ -369,6 +410,8 @@ export interface MessageInfo {
     toolName: string;
     input: Record<string, unknown>;
     output?: string;
+    outputHandle?: string;
+    outputSize?: number;
     isError?: boolean;
     isComplete?: boolean;
   }[];
@@ -2,6 +2,7 @@
 
 export type InboundMessage =
   | SendMessagePayload
+  | PreparePayload
   | CancelPayload
   | PingPayload
   | SubscribePayload
@@ -16,6 +17,12 @@ export interface SendMessagePayload {
   max_budget_usd?: number;
 }
 
+export interface PreparePayload {
+  type: "prepare";
+  project_id: string;
+  session_id?: string;
+}
+
 export interface CancelPayload {
   type: "cancel";
   session_id: string;
@@ -83,6 +90,10 @@ export interface ToolResultEvent {
   tool_id: string;
   output: string;
   is_error: boolean;
+  // Set when the output was too large to stream: `output` is then a
+  // head/tail preview and the full text is fetched by handle
+  output_handle?: string;
+  output_size?: number;
 }
 
 export interface MessageCompleteEvent {
@@ -155,6 +166,8 @@ export interface ToolUse {
   toolName: string;
   input: Record<string, unknown>;
   output?: string;
+  outputHandle?: string;
+  outputSize?: number;
   isError?: boolean;
   isComplete: boolean;
 }
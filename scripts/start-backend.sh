@@ -24,7 +24,9 @@ STALE=$(lsof -ti:8000 2>/dev/null || true)
 
 cd "$REPO_DIR/backend"
 source venv/bin/activate
-uvicorn src.main:app --host 0.0.0.0 --port 8000 >> "$LOG_DIR/backend.log" 2>&1 &
+# permessage-deflate (uvicorn's default, kept explicit) compresses the chat
+# socket ~4x — see backend/benchmarks/ws_bytes.py
+uvicorn src.main:app --host 0.0.0.0 --port 8000 --ws-per-message-deflate true >> "$LOG_DIR/backend.log" 2>&1 &
 echo $! > "$PID_FILE"
 
 # Wait for healthy (up to 20s)